@@ -10,8 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -52,6 +56,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "website.metrics.MetricsMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -60,6 +65,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "website.profiling.RequestProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "amma.urls"
@@ -134,6 +140,151 @@ STATIC_URL = "static/"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Store each unique uploaded file once, keyed by its SHA-256
+STORAGES = {
+    "default": {
+        "BACKEND": "website.storage.ContentAddressedStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
+
+# Uploads
+# Largest file accepted for membership documents, payment proofs and
+# guideline files. Checked while the upload streams in, by the API views
+# that accept these files (UploadValidationMixin); other endpoints, such as
+# the admin, use Django's default upload handlers.
+UPLOAD_MAX_FILE_SIZE = 10 * 1024 * 1024
+
+# Multipart requests to those views with a larger Content-Length are
+# rejected before the body is read (leaves room for a few files plus form
+# fields).
+UPLOAD_MAX_REQUEST_SIZE = 25 * 1024 * 1024
+
+# Resumable uploads: chunk size advertised to clients, the block size used
+# when streaming a chunk to disk, and where partial files are kept (relative
+# to MEDIA_ROOT, so completed uploads can be moved into place without a copy).
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_STREAM_BLOCK_SIZE = 64 * 1024
+UPLOAD_SESSION_DIR = "upload_sessions/"
+
+# Worker processes for background jobs such as preview rendering
+BACKGROUND_WORKERS = 2
+
+# Document previews (relative to MEDIA_ROOT): longest side in pixels of the
+# first-page preview and of the thumbnail shown in review lists
+PREVIEW_DIR = "previews/"
+PREVIEW_SIZE = 1024
+THUMBNAIL_SIZE = 200
+
+# Rendered quotation PDFs (relative to MEDIA_ROOT), one directory per quotation
+QUOTATION_PDF_DIR = "quotation_pdfs/"
+
+# Prometheus metrics (website/metrics.py), served at /metrics to requests
+# with "Authorization: Bearer <METRICS_TOKEN>" (nobody while it is None).
+# METRICS_ALLOWED_IPS also admits these client addresses without a token;
+# it is checked against REMOTE_ADDR, which behind a reverse proxy is the
+# proxy's own address, so only list addresses when Django is reached
+# directly, or block /metrics at the proxy. Each process writes its totals
+# to METRICS_DIR every METRICS_FLUSH_SECONDS and /metrics adds up all of
+# them, so the directory must be shared by the Gunicorn workers (and local
+# to the host).
+METRICS_ENABLED = True
+METRICS_DIR = os.path.join(tempfile.gettempdir(), "amma_metrics")
+METRICS_FLUSH_SECONDS = 5
+METRICS_TOKEN = None
+METRICS_ALLOWED_IPS = []
+
+# Staff can profile a single request by sending "X-Profile: 1" (see
+# website/profiling.py). Reports are kept in REQUEST_PROFILE_DIR (relative to
+# MEDIA_ROOT, downloaded through the API only), the newest
+# REQUEST_PROFILE_KEEP of them. Set REQUEST_PROFILING = False to remove the
+# middleware entirely.
+REQUEST_PROFILING = True
+REQUEST_PROFILE_DIR = "request_profiles/"
+REQUEST_PROFILE_KEEP = 200
+
+# Media optimization (manage.py optimize_media): images are downscaled to
+# this many pixels on the longest side and re-encoded, and the optimized copy
+# replaces the original only if it is at least MIN_SAVING smaller.
+MEDIA_OPTIMIZE_MAX_DIMENSION = 2000
+MEDIA_OPTIMIZE_JPEG_QUALITY = 82
+MEDIA_OPTIMIZE_MIN_SAVING = 0.05
+
+# Upload directories whose untouched originals must be kept alongside the
+# optimized copy (e.g. "membership_documents/" if originals are needed for
+# legal review)
+MEDIA_KEEP_ORIGINALS = []
+
+# Signed download URLs for uploaded files. Sign with the key named by
+# FILE_URL_SIGNING_KEY_ID; older keys stay valid while listed (rotate by
+# adding a key, switching the id, and removing the old key after
+# FILE_URL_MAX_AGE). Expiry is rounded up to FILE_URL_EXPIRY_GRANULARITY
+# seconds so URLs stay stable (and cacheable) for a while.
+FILE_URL_SIGNING_KEYS = {
+    "default": SECRET_KEY,
+}
+FILE_URL_SIGNING_KEY_ID = "default"
+FILE_URL_MAX_AGE = 60 * 60
+FILE_URL_EXPIRY_GRANULARITY = 5 * 60
+
+# When set (e.g. "/protected-media/", an nginx ``internal`` location aliased
+# to MEDIA_ROOT), verified downloads are handed to the web server with
+# X-Accel-Redirect instead of being streamed by Django.
+FILE_SERVE_ACCEL_REDIRECT = None
+
+# Currency totals are reported in FX_REPORTING_CURRENCY unless a request asks
+# for another one. Python-side conversions (the grand total of quotation
+# PDFs) keep the FX rate table in memory for FX_RATE_CACHE_SECONDS (changes
+# made in this process apply at once).
+FX_REPORTING_CURRENCY = "INR"
+FX_RATE_CACHE_SECONDS = 5 * 60
+
+# Price suggestions read an in-process index of past quoted prices. It picks
+# up new and edited quotations every PRICE_INDEX_REFRESH_SECONDS and is
+# rebuilt (dropping deleted quotations) every PRICE_INDEX_REBUILD_SECONDS.
+PRICE_INDEX_REFRESH_SECONDS = 15
+PRICE_INDEX_REBUILD_SECONDS = 60 * 60
+
+# Application logs are JSON lines on stdout, written by a background thread
+# from a bounded in-memory queue (see website/logconfig.py), so a slow log
+# pipe never blocks a request; records are dropped, and counted, when more
+# than LOG_QUEUE_SIZE are waiting. LOG_SAMPLING keeps a fraction of a
+# logger's records below WARNING, e.g. {"website.views": 0.1}. Values of
+# LOG_REDACT_FIELDS keys in structured fields are masked.
+LOG_LEVEL = "DEBUG" if DEBUG else "INFO"
+LOG_QUEUE_SIZE = 10000
+LOG_SAMPLING = {}
+LOG_REDACT_FIELDS = [
+    "password", "confirm_password", "old_password", "new_password",
+    "token", "key", "secret", "authorization", "otp",
+]
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "json": {"()": "website.logconfig.JsonFormatter"},
+    },
+    "filters": {
+        "sampling": {"()": "website.logconfig.SamplingFilter", "rates": LOG_SAMPLING},
+        "redacting": {"()": "website.logconfig.RedactingFilter", "fields": LOG_REDACT_FIELDS},
+    },
+    "handlers": {
+        "queue": {
+            "()": "website.logconfig.QueueHandler",
+            "stream": "ext://sys.stdout",
+            "capacity": LOG_QUEUE_SIZE,
+            "formatter": "json",
+            "filters": ["sampling", "redacting"],
+        },
+    },
+    "loggers": {
+        "website": {"handlers": ["queue"], "level": LOG_LEVEL, "propagate": False},
+    },
+}
+
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -142,6 +293,11 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'website.upload_handlers.UploadValidatingMultiPartParser',
+    ],
 }
 
 # CORS Configuration
@@ -162,4 +318,8 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Resumable uploads send and read the current byte offset in a header
+CORS_ALLOW_HEADERS = (*default_headers, "upload-offset")
+CORS_EXPOSE_HEADERS = ["Upload-Offset"]
+
 CORS_ALLOW_ALL_ORIGINS = True  # Set to True only for development
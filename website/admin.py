@@ -1,14 +1,300 @@
-from django.contrib import admin
-from .models import Registration, Product, ProductRegistration, ProductDocument, Membership, MembershipDocument, MembershipPayment, Quotation, QuotationItem, QuotationGuidelineFile
-
-# Register your models here.
-admin.site.register(Registration)
-admin.site.register(Product)
-admin.site.register(ProductRegistration)
-admin.site.register(ProductDocument)
-admin.site.register(Membership)
-admin.site.register(MembershipDocument)
-admin.site.register(MembershipPayment)
-admin.site.register(Quotation)
-admin.site.register(QuotationItem)
-admin.site.register(QuotationGuidelineFile)
+from django import forms
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections
+from django.http import HttpResponseRedirect
+from django.utils import timezone
+from django.utils.functional import cached_property
+from .models import Registration, Product, ProductRegistration, ProductDocument, Membership, MembershipDocument, MembershipPayment, Quotation, QuotationItem, QuotationGuidelineFile, RenewalReminder, BatchJobCheckpoint, MediaOptimization, FxRate, StaleVersionError, QuotedPriceRollup
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that avoids a full COUNT(*) on large tables.
+
+    Unfiltered changelists on PostgreSQL use the planner's row estimate;
+    everything else counts at most ``max_count`` rows. ``is_estimate`` and
+    ``is_capped`` tell which of the two happened, so the admin can say that
+    the count shown isn't exact.
+    """
+    max_count = 100_000
+    estimate_threshold = 100_000
+
+    is_estimate = False
+    is_capped = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+
+        if connection.vendor == "postgresql" and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] > self.estimate_threshold:
+                self.is_estimate = True
+                return row[0]
+
+        count = queryset.order_by()[:self.max_count].count()
+        self.is_capped = count >= self.max_count
+        return count
+
+
+class PerformanceModelAdmin(admin.ModelAdmin):
+    """
+    Base admin for tables expected to grow to millions of rows.
+
+    ``search_fields`` use case-insensitive ``istartswith`` / ``iexact``
+    lookups, i.e. a search matches the start of a value rather than any
+    part of it (Django's default ``icontains`` can't use an index). The
+    searched columns get matching case-insensitive indexes in migration
+    0025, and a purely numeric search term also matches the row with that
+    primary key. Approximate or capped row counts are flagged with a message.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+    ordering = ("-pk",)
+
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(
+            request, queryset, search_term)
+        term = search_term.strip()
+        if term.isdigit():
+            # Numeric values (payment or registration numbers) still match
+            results |= queryset.filter(pk=int(term))
+        return results, may_have_duplicates
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        changelist = getattr(response, "context_data", {}).get("cl")
+        paginator = getattr(changelist, "paginator", None)
+        if getattr(paginator, "is_estimate", False):
+            self.message_user(
+                request, f"About {paginator.count:,} rows (an estimate, not an exact count).",
+                messages.INFO)
+        elif getattr(paginator, "is_capped", False):
+            self.message_user(
+                request, f"More than {paginator.max_count:,} rows match; only the "
+                f"first {paginator.max_count:,} are counted and paged. Narrow the "
+                "search or filters to see the rest.", messages.WARNING)
+        return response
+
+
+@admin.register(Registration)
+class RegistrationAdmin(PerformanceModelAdmin):
+    list_display = ("id", "user", "user_type", "institution_name",
+                    "country", "is_verified", "created_at")
+    list_select_related = ("user",)
+    list_filter = ("user_type", "is_verified")
+    search_fields = ("user__username__istartswith",)
+    autocomplete_fields = ("user",)
+
+
+@admin.register(Product)
+class ProductAdmin(PerformanceModelAdmin):
+    list_display = ("id", "product_name", "category",
+                    "formulation", "updated_at")
+    list_filter = ("category", "formulation")
+    search_fields = ("product_name__istartswith",)
+
+
+@admin.register(ProductRegistration)
+class ProductRegistrationAdmin(PerformanceModelAdmin):
+    list_display = ("id", "product", "country", "registration_status",
+                    "registration_number", "expiry_date")
+    list_select_related = ("product",)
+    list_filter = ("registration_status",)
+    search_fields = ("product__product_name__istartswith",
+                     "registration_number__istartswith")
+    autocomplete_fields = ("product",)
+
+
+@admin.register(ProductDocument)
+class ProductDocumentAdmin(PerformanceModelAdmin):
+    list_display = ("id", "document_name", "product", "uploaded_at")
+    list_select_related = ("product",)
+    search_fields = ("product__product_name__istartswith",)
+    autocomplete_fields = ("product",)
+
+
+@admin.register(Membership)
+class MembershipAdmin(PerformanceModelAdmin):
+    list_display = ("id", "company_name", "email", "membership_type",
+                    "payment_status", "membership_status", "end_date")
+    list_filter = ("membership_status", "payment_status", "membership_type")
+    search_fields = ("company_name__istartswith", "email__iexact")
+    autocomplete_fields = ("registration",)
+
+
+@admin.register(MembershipDocument)
+class MembershipDocumentAdmin(PerformanceModelAdmin):
+    list_display = ("id", "membership", "document_type", "document_name",
+                    "verification_status", "verified_by", "uploaded_at")
+    list_select_related = ("membership", "verified_by")
+    list_filter = ("verification_status", "document_type")
+    search_fields = ("membership__company_name__istartswith",)
+    autocomplete_fields = ("membership", "verified_by")
+
+
+@admin.register(MembershipPayment)
+class MembershipPaymentAdmin(PerformanceModelAdmin):
+    list_display = ("id", "membership", "amount", "currency", "method",
+                    "status", "verification_status", "payment_date")
+    list_select_related = ("membership", "verified_by")
+    list_filter = ("status", "verification_status", "currency", "method")
+    search_fields = ("membership__company_name__istartswith",
+                     "payment_reference__istartswith")
+    autocomplete_fields = ("membership", "verified_by")
+
+
+class QuotationItemInline(admin.TabularInline):
+    model = QuotationItem
+    extra = 0
+    autocomplete_fields = ("product", "quoted_by")
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("product", "quoted_by")
+
+
+class QuotationGuidelineFileInline(admin.TabularInline):
+    model = QuotationGuidelineFile
+    extra = 0
+
+
+class QuotationAdminForm(forms.ModelForm):
+    """Carries the version the editor loaded and enforces the status state machine."""
+
+    class Meta:
+        model = Quotation
+        fields = "__all__"
+        widgets = {"version": forms.HiddenInput}
+
+    def clean(self):
+        cleaned_data = super().clean()
+        instance = self.instance
+        if instance.pk is None:
+            return cleaned_data
+
+        current = Quotation.objects.filter(pk=instance.pk).values_list(
+            "version", flat=True).first()
+        if cleaned_data.get("version") != current:
+            raise forms.ValidationError(
+                "This quotation was changed by someone else while you were "
+                "editing it. Please reload the page and apply your changes again.")
+
+        new_status = cleaned_data.get("status")
+        if (new_status and new_status != instance.status
+                and new_status not in instance.STATUS_TRANSITIONS.get(instance.status, ())):
+            allowed = ", ".join(instance.STATUS_TRANSITIONS.get(instance.status, ())) or "none"
+            self.add_error("status", f"Can't change status from {instance.status} to "
+                                     f"{new_status} (allowed: {allowed}).")
+        return cleaned_data
+
+
+@admin.register(Quotation)
+class QuotationAdmin(PerformanceModelAdmin):
+    form = QuotationAdminForm
+    list_display = ("id", "title", "membership", "country",
+                    "currency", "status", "updated_at")
+    list_select_related = ("membership",)
+    list_filter = ("status", "currency")
+    search_fields = ("membership__company_name__istartswith",
+                     "title__istartswith")
+    autocomplete_fields = ("membership",)
+    inlines = (QuotationItemInline, QuotationGuidelineFileInline)
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            return super().save_model(request, obj, form, change)
+        # Conditional UPDATE on the version the form was loaded with
+        obj.compare_and_save(
+            form.cleaned_data["version"],
+            fields=[name for name in form.changed_data if name != "version"])
+
+    def changeform_view(self, request, object_id=None, form_url="", extra_context=None):
+        try:
+            return super().changeform_view(request, object_id, form_url, extra_context)
+        except StaleVersionError:
+            # Someone saved in between the form check and our UPDATE; the
+            # admin's transaction (inlines included) has been rolled back
+            self.message_user(
+                request, "This quotation was changed by someone else. "
+                         "Your changes were not saved; please apply them again.",
+                messages.ERROR)
+            return HttpResponseRedirect(request.path)
+
+
+class QuotationChildAdmin(PerformanceModelAdmin):
+    """
+    Admin for rows that belong to a quotation. Saving or deleting one
+    bumps the quotation's ``updated_at`` (see the models), which also
+    invalidates its cached PDF; bulk deletes do the same here.
+    """
+
+    def delete_queryset(self, request, queryset):
+        quotation_ids = set(queryset.values_list("quotation_id", flat=True))
+        super().delete_queryset(request, queryset)
+        Quotation.objects.filter(pk__in=quotation_ids).update(updated_at=timezone.now())
+
+
+@admin.register(QuotationItem)
+class QuotationItemAdmin(QuotationChildAdmin):
+    list_display = ("id", "product", "quotation", "currency",
+                    "quoted_price", "quoted_by")
+    list_select_related = ("product", "quotation", "quoted_by")
+    list_filter = ("currency",)
+    search_fields = ("product__product_name__istartswith",
+                     "quotation__title__istartswith")
+    autocomplete_fields = ("quotation", "product", "quoted_by")
+
+
+@admin.register(QuotationGuidelineFile)
+class QuotationGuidelineFileAdmin(QuotationChildAdmin):
+    list_display = ("id", "file_name", "quotation", "uploaded_at")
+    list_select_related = ("quotation",)
+    search_fields = ("file_name__istartswith",)
+    autocomplete_fields = ("quotation",)
+
+
+@admin.register(RenewalReminder)
+class RenewalReminderAdmin(PerformanceModelAdmin):
+    list_display = ("id", "membership", "reminder_type",
+                    "end_date", "sent_at")
+    list_select_related = ("membership",)
+    list_filter = ("reminder_type",)
+    search_fields = ("membership__company_name__istartswith",)
+    autocomplete_fields = ("membership",)
+
+
+@admin.register(BatchJobCheckpoint)
+class BatchJobCheckpointAdmin(admin.ModelAdmin):
+    list_display = ("name", "run_date", "cursor", "updated_at")
+
+
+@admin.register(MediaOptimization)
+class MediaOptimizationAdmin(PerformanceModelAdmin):
+    list_display = ("id", "original_name", "category", "status",
+                    "original_size", "optimized_size", "processed_at")
+    list_filter = ("status", "category")
+
+
+@admin.register(FxRate)
+class FxRateAdmin(PerformanceModelAdmin):
+    list_display = ("id", "base_currency", "quote_currency",
+                    "effective_date", "rate", "source")
+    list_filter = ("base_currency", "quote_currency")
+    date_hierarchy = "effective_date"
+
+
+@admin.register(QuotedPriceRollup)
+class QuotedPriceRollupAdmin(PerformanceModelAdmin):
+    list_display = ("id", "product", "country", "currency", "month",
+                    "count", "median_price", "updated_at")
+    list_select_related = ("product",)
+    list_filter = ("currency",)
+    search_fields = ("product__product_name__istartswith", "country__istartswith")
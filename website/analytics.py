@@ -0,0 +1,318 @@
+"""
+Quoted price analytics.
+
+``QuotedPriceRollup`` holds the count, min, max, mean and percentiles of
+``QuotationItem.quoted_price`` per product, country, currency and month, so
+dashboards read a few indexed rows instead of scanning items.
+
+Rollups are refreshed by slice: a slice is every quotation of one country
+created in one month. ``manage.py refresh_price_rollups`` finds the slices
+touched since its last run (new items, and quotations saved since then,
+which covers edited and removed items because every API or admin edit
+bumps the quotation's ``updated_at``), recomputes each one from its raw
+items and swaps its rollup rows. Deleted quotations and quotations moved to
+another country are only picked up by ``--rebuild``.
+
+Statistics are computed with NumPy over a whole slice at once when it is
+installed, otherwise in plain Python with the same (linear interpolation)
+percentiles.
+
+Price suggestions for new quotation items come from ``price_index``, an
+in-process copy of every quoted price kept as sorted lists per product, so
+a suggestion is a dictionary lookup and two list reads. The index is
+refreshed incrementally (new items, and quotations saved since the last
+refresh) at most every ``PRICE_INDEX_REFRESH_SECONDS`` and rebuilt every
+``PRICE_INDEX_REBUILD_SECONDS`` to drop deleted quotations.
+"""
+import bisect
+import heapq
+import math
+import threading
+import time as monotonic_time
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DateField, Q
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from .metrics import record_cache
+
+PERCENTILES = {"p25_price": 25, "median_price": 50, "p75_price": 75, "p90_price": 90}
+CENT = Decimal("0.01")
+
+
+def month_bounds(month):
+    """Aware datetimes of the start of ``month`` and of the next month."""
+    following = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+    return (timezone.make_aware(datetime.combine(month, time.min)),
+            timezone.make_aware(datetime.combine(following, time.min)))
+
+
+def quotation_slices(quotations):
+    """Distinct ``(country, month)`` of ``quotations``."""
+    return set(
+        quotations.annotate(
+            month=TruncMonth("created_at", output_field=DateField()))
+        .values_list("country", "month").distinct()
+    )
+
+
+def dirty_slices(item_cursor, since):
+    """Slices with items after ``item_cursor`` or quotations saved since ``since``."""
+    from .models import Quotation
+
+    return quotation_slices(
+        Quotation.objects.filter(items__id__gt=item_cursor)
+    ) | quotation_slices(Quotation.objects.filter(updated_at__gte=since))
+
+
+def slice_prices(country, month):
+    """``[(product_id, currency, price), ...]`` of the slice's priced items."""
+    from .models import QuotationItem
+
+    start, end = month_bounds(month)
+    return list(
+        QuotationItem.objects.filter(
+            quotation__country=country,
+            quotation__created_at__gte=start,
+            quotation__created_at__lt=end,
+            quoted_price__isnull=False,
+        )
+        .annotate(item_currency=Coalesce("currency", "quotation__currency"))
+        .values_list("product_id", "item_currency", "quoted_price")
+    )
+
+
+def refresh_slice(country, month):
+    """Recompute the rollups of one slice; returns the number of groups."""
+    from .models import QuotedPriceRollup
+
+    rollups = [
+        QuotedPriceRollup(product_id=product_id, currency=currency,
+                          country=country, month=month, **stats)
+        for (product_id, currency), stats in summarize(slice_prices(country, month))
+    ]
+    with transaction.atomic():
+        QuotedPriceRollup.objects.filter(country=country, month=month).delete()
+        QuotedPriceRollup.objects.bulk_create(rollups, batch_size=1000)
+    return len(rollups)
+
+
+def summarize(rows):
+    """
+    ``[((product_id, currency), stats), ...]`` for ``(product_id, currency,
+    price)`` rows, where ``stats`` has the rollup's count and price fields.
+    """
+    if not rows:
+        return []
+    try:
+        import numpy
+    except ImportError:
+        return summarize_python(rows)
+    return summarize_numpy(numpy, rows)
+
+
+def summarize_numpy(np, rows):
+    keys = sorted({(product_id, currency) for product_id, currency, _ in rows})
+    index = {key: i for i, key in enumerate(keys)}
+    groups = np.fromiter((index[(product_id, currency)] for product_id, currency, _ in rows),
+                         dtype=np.int64, count=len(rows))
+    prices = np.fromiter((price for _, _, price in rows), dtype=np.float64, count=len(rows))
+
+    # Sort by group, then price: each group is a sorted run
+    order = np.lexsort((prices, groups))
+    groups, prices = groups[order], prices[order]
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    counts = np.diff(np.r_[starts, len(prices)])
+
+    columns = {
+        "min_price": prices[starts],
+        "max_price": prices[starts + counts - 1],
+        "mean_price": np.add.reduceat(prices, starts) / counts,
+    }
+    for field, percentile in PERCENTILES.items():
+        # Position within each group, interpolated like summarize_python
+        position = (counts - 1) * (percentile / 100)
+        low = np.floor(position)
+        high = starts + np.ceil(position).astype(np.int64)
+        lower = prices[starts + low.astype(np.int64)]
+        columns[field] = lower + (prices[high] - lower) * (position - low)
+
+    return [
+        (keys[groups[start]], {
+            "count": int(counts[i]),
+            **{field: to_money(values[i]) for field, values in columns.items()},
+        })
+        for i, start in enumerate(starts)
+    ]
+
+
+def summarize_python(rows):
+    groups = {}
+    for product_id, currency, price in rows:
+        groups.setdefault((product_id, currency), []).append(float(price))
+
+    result = []
+    for key in sorted(groups):
+        prices = sorted(groups[key])
+        count = len(prices)
+        stats = {
+            "count": count,
+            "min_price": to_money(prices[0]),
+            "max_price": to_money(prices[-1]),
+            "mean_price": to_money(math.fsum(prices) / count),
+        }
+        for field, percentile in PERCENTILES.items():
+            stats[field] = to_money(percentile_of(prices, percentile))
+        result.append((key, stats))
+    return result
+
+
+def percentile_of(prices, percentile):
+    """Linearly interpolated ``percentile`` of the sorted, non-empty ``prices``."""
+    position = (len(prices) - 1) * (percentile / 100)
+    low, high = math.floor(position), math.ceil(position)
+    return prices[low] + (prices[high] - prices[low]) * (position - low)
+
+
+def to_money(value):
+    return Decimal(repr(float(value))).quantize(CENT)
+
+
+# --- Price suggestions -----------------------------------------------------
+
+class PriceIndex:
+    """
+    Quoted prices as ``{product_id: {(country, currency): [prices...]}}``
+    with every list sorted, plus enough bookkeeping to replace the prices of
+    a quotation when it changes.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.products = {}
+        self.items = {}  # item id -> (quotation id, product id, country, currency, price)
+        self.quotation_items = {}  # quotation id -> {item ids}
+        self.item_cursor = 0
+        self.since = None
+        self.refreshed_at = None
+        self.built_at = None
+
+    def refresh_if_stale(self):
+        now = monotonic_time.monotonic()
+        if (self.built_at is None
+                or now - self.built_at > settings.PRICE_INDEX_REBUILD_SECONDS):
+            record_cache("price_index", False)
+            self.rebuild()
+        elif now - self.refreshed_at > settings.PRICE_INDEX_REFRESH_SECONDS:
+            record_cache("price_index", False)
+            self.refresh()
+        else:
+            record_cache("price_index", True)
+
+    def rebuild(self):
+        from .models import QuotationItem
+
+        started, checked_at = timezone.now(), monotonic_time.monotonic()
+        rows = self.price_rows(QuotationItem.objects.all())
+        with self.lock:
+            self.products, self.items, self.quotation_items = {}, {}, {}
+            for row in rows:
+                self.add(row, keep_sorted=False)
+            for groups in self.products.values():
+                for prices in groups.values():
+                    prices.sort()
+            self.item_cursor = max(self.items, default=0)
+            self.since = started
+            self.refreshed_at = self.built_at = checked_at
+
+    def refresh(self):
+        """Pick up new items and re-read the items of quotations saved since the last refresh."""
+        from .models import Quotation, QuotationItem
+
+        started, checked_at = timezone.now(), monotonic_time.monotonic()
+        changed = set(
+            Quotation.objects.filter(updated_at__gte=self.since).values_list("id", flat=True))
+        rows = self.price_rows(QuotationItem.objects.filter(
+            Q(id__gt=self.item_cursor) | Q(quotation_id__in=changed)))
+        with self.lock:
+            for quotation_id in changed:
+                for item_id in list(self.quotation_items.get(quotation_id, ())):
+                    self.discard(item_id)
+            for row in rows:
+                self.discard(row[0])
+                self.add(row)
+            self.item_cursor = max(self.item_cursor, max(self.items, default=0))
+            self.since = started
+            self.refreshed_at = checked_at
+
+    @staticmethod
+    def price_rows(items):
+        return list(
+            items.filter(quoted_price__isnull=False)
+            .annotate(item_currency=Coalesce("currency", "quotation__currency"))
+            .values_list("id", "quotation_id", "product_id", "quotation__country",
+                         "item_currency", "quoted_price")
+        )
+
+    def add(self, row, keep_sorted=True):
+        item_id, quotation_id, product_id, country, currency, price = row
+        price = float(price)
+        prices = self.products.setdefault(product_id, {}).setdefault((country, currency), [])
+        if keep_sorted:
+            bisect.insort(prices, price)
+        else:
+            prices.append(price)
+        self.items[item_id] = (quotation_id, product_id, country, currency, price)
+        self.quotation_items.setdefault(quotation_id, set()).add(item_id)
+
+    def discard(self, item_id):
+        entry = self.items.pop(item_id, None)
+        if entry is None:
+            return
+        quotation_id, product_id, country, currency, price = entry
+        self.quotation_items[quotation_id].discard(item_id)
+        groups = self.products[product_id]
+        prices = groups[(country, currency)]
+        del prices[bisect.bisect_left(prices, price)]
+        if not prices:
+            del groups[(country, currency)]
+
+    def suggest(self, product_id, currency, country=None):
+        """
+        Suggested price (median) with a p25-p75 band for ``product_id`` in
+        ``currency``, from past quotes in ``country`` or, if there are none
+        there (or no country is given), in every country.
+        """
+        with self.lock:
+            groups = self.products.get(product_id, {})
+            prices, scope = groups.get((country, currency)), "country"
+            if not prices:
+                prices = list(heapq.merge(*(
+                    group_prices for (_, group_currency), group_prices in groups.items()
+                    if group_currency == currency)))
+                scope = "all_countries"
+            if not prices:
+                return {"count": 0, "scope": None, "suggested_price": None,
+                        "low_price": None, "high_price": None,
+                        "min_price": None, "max_price": None}
+            return {
+                "count": len(prices),
+                "scope": scope,
+                "suggested_price": to_money(percentile_of(prices, 50)),
+                "low_price": to_money(percentile_of(prices, 25)),
+                "high_price": to_money(percentile_of(prices, 75)),
+                "min_price": to_money(prices[0]),
+                "max_price": to_money(prices[-1]),
+            }
+
+
+price_index = PriceIndex()
+
+
+def suggest_price(product_id, currency, country=None):
+    price_index.refresh_if_stale()
+    return price_index.suggest(product_id, currency, country)
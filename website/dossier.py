@@ -0,0 +1,144 @@
+"""
+Streamed ZIP dossier of a membership's documents and payment proofs.
+
+The archive is written by ``zipfile`` into an unseekable buffer that is
+drained after every block, so the response streams as it is built: no
+temporary files, and memory use stays at one read block regardless of how
+large the dossier is. Entries use data descriptors (sizes and CRCs follow
+the data), which every ZIP reader supports.
+"""
+import io
+import json
+import os
+import zipfile
+
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .models import MembershipDocument, MembershipPayment
+from .storage import blob_sha256, file_extension
+
+BLOCK_SIZE = 64 * 1024
+
+# Already compressed formats are stored as-is instead of deflated again
+STORED_EXTENSIONS = {".pdf", ".jpg", ".jpeg", ".png", ".gif", ".docx", ".zip"}
+
+
+class StreamSink(io.RawIOBase):
+    """Write-only, unseekable file object that hands back what was written."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def dossier_entries(membership):
+    """
+    Return ``(arcname, storage name, manifest entry)`` for every file of
+    ``membership``. Only metadata is loaded; file contents are read while
+    streaming.
+    """
+    entries = []
+    documents = (
+        MembershipDocument.objects.filter(membership=membership)
+        .exclude(file="")
+        .only("id", "document_type", "document_name", "file",
+              "verification_status", "uploaded_at")
+        .order_by("id")
+    )
+    for document in documents:
+        name = document.file.name
+        entries.append((
+            f"documents/{document.id}_{document.document_type}{file_extension(name)}",
+            name,
+            {
+                "type": "membership_document",
+                "id": document.id,
+                "document_type": document.document_type,
+                "document_name": document.document_name,
+                "verification_status": document.verification_status,
+                "uploaded_at": document.uploaded_at.isoformat(),
+            },
+        ))
+
+    payments = (
+        MembershipPayment.objects.filter(membership=membership)
+        .exclude(payment_proof="").exclude(payment_proof__isnull=True)
+        .only("id", "payment_proof", "payment_date", "payment_reference",
+              "amount", "currency", "status", "verification_status")
+        .order_by("id")
+    )
+    for payment in payments:
+        name = payment.payment_proof.name
+        entries.append((
+            f"payments/{payment.id}_{payment.payment_date}{file_extension(name)}",
+            name,
+            {
+                "type": "membership_payment",
+                "id": payment.id,
+                "payment_date": str(payment.payment_date),
+                "payment_reference": payment.payment_reference,
+                "amount": str(payment.amount),
+                "currency": payment.currency,
+                "status": payment.status,
+                "verification_status": payment.verification_status,
+            },
+        ))
+    return entries
+
+
+def stream_dossier(membership, entries):
+    """Yield the bytes of the ZIP archive for ``entries``."""
+    sink = StreamSink()
+    manifest = []
+    now = timezone.localtime()
+
+    with zipfile.ZipFile(sink, "w") as archive:
+        for arcname, name, details in entries:
+            entry = {"path": arcname, **details}
+            manifest.append(entry)
+            try:
+                source = open(default_storage.path(name), "rb")
+            except FileNotFoundError:
+                entry["missing"] = True
+                continue
+
+            with source:
+                size = os.fstat(source.fileno()).st_size
+                info = zipfile.ZipInfo(arcname, date_time=now.timetuple()[:6])
+                info.file_size = size
+                info.compress_type = (
+                    zipfile.ZIP_STORED
+                    if file_extension(name) in STORED_EXTENSIONS
+                    else zipfile.ZIP_DEFLATED
+                )
+                with archive.open(info, "w") as target:
+                    for block in iter(lambda: source.read(BLOCK_SIZE), b""):
+                        target.write(block)
+                        # Deflate may hold data back; skip empty chunks
+                        data = sink.drain()
+                        if data:
+                            yield data
+            entry["size"] = size
+            entry["sha256"] = blob_sha256(name)
+            yield sink.drain()
+
+        archive.writestr("manifest.json", json.dumps({
+            "membership_id": membership.id,
+            "company_name": membership.company_name,
+            "generated_at": now.isoformat(),
+            "files": manifest,
+        }, indent=2), compress_type=zipfile.ZIP_DEFLATED)
+
+    yield sink.drain()
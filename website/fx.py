@@ -0,0 +1,175 @@
+"""
+Currency conversion with the local FX rate table.
+
+``FxRate`` rows hold the rate from one currency to another, in force from
+``effective_date`` until the pair's next row. ``manage.py load_fx_rates``
+fills the table from CSV and stores the inverse of every rate as well, so a
+conversion is always a single lookup.
+
+Totals are converted inside SQL: ``with_quotation_totals`` and
+``with_membership_totals`` annotate querysets with correlated subqueries,
+so listing any number of rows costs no extra queries. Amounts are converted
+at the rate in force on the quotation's creation date or the payment date.
+``convert`` does the same for single amounts in Python, from an in-process
+copy of the table; quotation PDFs use it for their grand total, so
+rendering many of them reads the rates once.
+"""
+import bisect
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import (Case, DecimalField, Exists, F, OuterRef, Q,
+                              Subquery, Sum, Value, When)
+from django.db.models.functions import Coalesce, TruncDate
+
+from .metrics import record_cache
+
+RATE_FIELD = DecimalField(max_digits=20, decimal_places=8)
+TOTAL_FIELD = DecimalField(max_digits=20, decimal_places=2)
+
+_rate_table = None
+_rate_table_loaded_at = 0.0
+
+
+def currency_codes():
+    from .models import Quotation
+
+    return [code for code, _ in Quotation.CURRENCY_CHOICES]
+
+
+def clear_rate_cache():
+    global _rate_table
+    _rate_table = None
+
+
+def rate_table():
+    """
+    ``{(base, quote): ([dates...], [rates...])}`` with dates ascending,
+    reloaded after ``FX_RATE_CACHE_SECONDS`` or when a rate changes.
+    """
+    global _rate_table, _rate_table_loaded_at
+    from .models import FxRate
+
+    stale = (_rate_table is None
+             or time.monotonic() - _rate_table_loaded_at > settings.FX_RATE_CACHE_SECONDS)
+    record_cache("fx_rates", not stale)
+    if stale:
+        table = {}
+        rates = FxRate.objects.order_by(
+            "base_currency", "quote_currency", "effective_date"
+        ).values_list("base_currency", "quote_currency", "effective_date", "rate")
+        for base, quote, effective_date, rate in rates:
+            dates, values = table.setdefault((base, quote), ([], []))
+            dates.append(effective_date)
+            values.append(rate)
+        _rate_table = table
+        _rate_table_loaded_at = time.monotonic()
+    return _rate_table
+
+
+def get_rate(base_currency, quote_currency, on_date):
+    """Rate in force on ``on_date``, or None if the table has none."""
+    if base_currency == quote_currency:
+        return Decimal(1)
+    pair = rate_table().get((base_currency, quote_currency))
+    if pair is None:
+        return None
+    dates, rates = pair
+    index = bisect.bisect_right(dates, on_date)
+    return rates[index - 1] if index else None
+
+
+def convert(amount, from_currency, to_currency, on_date):
+    """``amount`` in ``to_currency`` (2 places), or None if no rate applies."""
+    if amount is None:
+        return None
+    rate = get_rate(from_currency, to_currency, on_date)
+    if rate is None:
+        return None
+    return (amount * rate).quantize(Decimal("0.01"))
+
+
+# --- SQL -------------------------------------------------------------------
+
+def rate_expression(currency, on_date, target):
+    """
+    Rate from the ``currency`` expression to ``target`` in force on the
+    ``on_date`` expression, for use in an annotation (NULL if unknown).
+    """
+    from .models import FxRate
+
+    latest = FxRate.objects.filter(
+        base_currency=OuterRef(currency),
+        quote_currency=target,
+        effective_date__lte=OuterRef(on_date),
+    ).order_by("-effective_date").values("rate")[:1]
+    return Case(
+        When(**{currency: target}, then=Value(Decimal(1))),
+        default=Subquery(latest),
+        output_field=RATE_FIELD,
+    )
+
+
+def converted_sum(rows, group_by, amount, target):
+    """
+    ``(total, incomplete)`` subqueries for ``rows``, which must be annotated
+    with ``fx_currency`` and ``fx_date``: the sum of ``amount`` converted to
+    ``target``, and whether any amount had no rate (and was left out).
+    """
+    rows = rows.annotate(fx_rate=rate_expression("fx_currency", "fx_date", target))
+    total = (
+        rows.values(group_by)
+        .annotate(total=Sum(F(amount) * F("fx_rate"), output_field=TOTAL_FIELD))
+        .values("total")
+    )
+    incomplete = rows.filter(
+        Q(**{f"{amount}__isnull": False}), fx_rate__isnull=True)
+    total = Coalesce(Subquery(total, output_field=TOTAL_FIELD),
+                     Value(Decimal(0)), output_field=TOTAL_FIELD)
+    return total, Exists(incomplete)
+
+
+def quotation_items(**filters):
+    from .models import QuotationItem
+
+    # Items without their own currency are priced in the quotation's
+    return QuotationItem.objects.filter(**filters).annotate(
+        fx_currency=Coalesce("currency", "quotation__currency"),
+        fx_date=TruncDate("quotation__created_at"),
+    )
+
+
+def with_quotation_totals(queryset, currency):
+    """Annotate quotations with ``total_amount`` and ``total_complete``."""
+    total, incomplete = converted_sum(
+        quotation_items(quotation=OuterRef("pk")),
+        "quotation", "quoted_price", currency)
+    return queryset.annotate(
+        total_amount=total,
+        total_complete=~incomplete,
+        total_currency=Value(currency),
+    )
+
+
+def with_membership_totals(queryset, currency):
+    """
+    Annotate memberships with ``quoted_total`` (all quotation items) and
+    ``paid_total`` (successful payments), plus ``totals_complete``.
+    """
+    from .models import MembershipPayment
+
+    quoted, quoted_incomplete = converted_sum(
+        quotation_items(quotation__membership=OuterRef("pk")),
+        "quotation__membership", "quoted_price", currency)
+    payments = MembershipPayment.objects.filter(
+        membership=OuterRef("pk"), status="success"
+    ).annotate(fx_currency=F("currency"), fx_date=F("payment_date"))
+    paid, paid_incomplete = converted_sum(
+        payments, "membership", "amount", currency)
+    return queryset.annotate(
+        quoted_total=quoted,
+        paid_total=paid,
+        totals_complete=~(quoted_incomplete | paid_incomplete),
+        totals_currency=Value(currency),
+    )
@@ -0,0 +1,186 @@
+"""
+Structured, non-blocking logging.
+
+Code logs through ``logging`` as usual. ``QueueHandler`` only puts each
+record on a bounded in-memory queue; a listener thread formats it as one
+JSON line and writes it, so a slow log pipe never blocks a request. When the
+queue is full, records are dropped instead of waiting, and the number of
+drops is attached to the next record that gets through.
+
+Two filters run on the request thread before a record is queued:
+``SamplingFilter`` keeps only a fraction of a logger's records below
+WARNING (``LOG_SAMPLING``), and ``RedactingFilter`` masks the values of
+sensitive keys (``LOG_REDACT_FIELDS``) in the record's structured fields,
+i.e. anything passed with ``extra=``.
+
+Everything is configured in ``settings.LOGGING``.
+"""
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from logging.handlers import QueueListener
+
+# Attributes every LogRecord has; anything else came in through ``extra``
+RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message", "asctime", "taskName"}
+REDACTED = "********"
+
+# JsonFormatter doesn't print the caller, thread or process, so don't work
+# them out for every record (see "Optimization" in the logging docs)
+logging._srcfile = None
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+
+
+def record_fields(record):
+    """The structured fields (``extra``) of ``record``."""
+    attrs = vars(record)
+    return {key: attrs[key] for key in attrs.keys() - RECORD_ATTRS}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, fields."""
+
+    def format(self, record):
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+            + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(record_fields(record))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps the given fraction of records below WARNING, per logger name:
+    ``{"website.views": 0.1}`` keeps one in ten records of ``website.views``
+    and its children. Loggers without a rate keep everything.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = dict(rates or {})
+        self.resolved = {}
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.resolved.get(record.name)
+        if rate is None:
+            rate = self.resolved[record.name] = self.rate_for(record.name)
+        return rate >= 1 or random.random() < rate
+
+    def rate_for(self, name):
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return self.rates.get("", 1.0)
+
+
+class RedactingFilter(logging.Filter):
+    """Masks the values of sensitive keys in structured fields, at any depth."""
+
+    def __init__(self, fields=()):
+        super().__init__()
+        self.fields = frozenset(field.lower() for field in fields)
+
+    def filter(self, record):
+        for key, value in record_fields(record).items():
+            if key in self.fields or key.lower() in self.fields:
+                setattr(record, key, REDACTED)
+            elif isinstance(value, (dict, list, tuple)):
+                setattr(record, key, self.redact(value))
+        return True
+
+    def redact(self, value):
+        # Copies, so the caller's data is left alone
+        if isinstance(value, dict):
+            return {key: REDACTED if str(key).lower() in self.fields else self.redact(item)
+                    for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self.redact(item) for item in value]
+        return value
+
+
+class QueueHandler(logging.Handler):
+    """
+    Queues records for a listener thread that hands them to a
+    ``StreamHandler`` with this handler's formatter.
+
+    The listener is started by the first record of each process, so worker
+    processes forked after logging was configured get their own.
+    """
+
+    def __init__(self, stream=None, capacity=10000):
+        super().__init__()
+        self.target = logging.StreamHandler(stream or sys.stdout)
+        self.capacity = capacity
+        self.queue = None
+        self.listener = None
+        self.pid = None
+        self.dropped = 0
+        self.start_lock = threading.Lock()
+
+    def setFormatter(self, fmt):
+        self.target.setFormatter(fmt)
+
+    def start(self):
+        with self.start_lock:
+            if self.pid == os.getpid():
+                return
+            self.queue = queue.Queue(self.capacity)
+            self.listener = QueueListener(self.queue, self.target)
+            self.listener.start()
+            self.pid = os.getpid()
+
+    def prepare(self, record):
+        """
+        Makes ``record`` safe to format on another thread: the message is
+        merged with its arguments and the traceback rendered.
+        """
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record):
+        try:
+            if self.pid != os.getpid():
+                self.start()
+            record = self.prepare(record)
+            dropped = self.dropped
+            if dropped:
+                record.dropped_records = dropped
+            self.queue.put_nowait(record)
+            self.dropped -= dropped
+        except queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        # Called by logging.shutdown() at exit: write out what's queued
+        if self.listener is not None and self.pid == os.getpid():
+            try:
+                self.listener.stop()
+            except queue.Full:
+                pass
+            self.listener = self.pid = None
+        self.target.close()
+        super().close()
@@ -0,0 +1,744 @@
+import base64
+import io
+import json
+import logging
+import os
+import queue
+import random
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.test.utils import (override_settings, setup_databases,
+                               setup_test_environment, teardown_databases,
+                               teardown_test_environment)
+from django.urls import resolve
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework.authtoken.models import Token
+
+from website import urls as website_urls
+from website.analytics import percentile_of
+from website.metrics import QueryCounter, flusher
+from website.models import (GuidelineText, GuidelineTextPage, Membership,
+                            MembershipDocument, MembershipPayment, Product,
+                            ProductDocument, ProductRegistration, Quotation,
+                            QuotationGuidelineFile, QuotationItem, Registration)
+from website.signing import signed_file_url
+from website.storage import blob_sha256
+
+DEFAULT_BASELINE = Path(website_urls.__file__).resolve().parent / "bench_api_baseline.json"
+
+PASSWORD = "Bench-password-1"
+METRICS_TOKEN = "bench-metrics-token"
+COUNTRIES = ["India", "Kenya", "Brazil", "Vietnam", "Indonesia", "Mexico", "Egypt", "Peru"]
+GUIDELINE_WORDS = [
+    "registration", "biopesticide", "trichoderma", "bacillus", "efficacy",
+    "toxicology", "label", "residue", "import", "permit", "strain", "dossier",
+    "formulation", "shelf", "life", "field", "trial", "authority", "fee", "renewal",
+]
+SEARCH_TERMS = ["trichoderma efficacy", "import permit", "residue", "shelf life"]
+
+# 1x1 PNG; each upload appends a counter after it so no two files share a blob
+PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg==")
+
+
+def docx_bytes(text):
+    """A minimal DOCX whose only paragraph is ``text``."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as docx:
+        docx.writestr("word/document.xml", (
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/'
+            'wordprocessingml/2006/main"><w:body><w:p><w:r><w:t>'
+            f"{text}</w:t></w:r></w:p></w:body></w:document>"))
+    return buffer.getvalue()
+
+
+class Recorder:
+    """Latency, CPU time and query count of every request, by method and URL name."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.enabled = False
+        self.samples = {}  # "GET product-list" -> [(seconds, cpu seconds, queries), ...]
+        self.errors = {}  # same keys -> unexpected responses
+        self.failures = []  # a few unexpected responses / scenario errors, for the report
+
+    def add(self, label, elapsed, cpu, queries, response, expected):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.samples.setdefault(label, []).append((elapsed, cpu, queries))
+            if response.status_code not in expected:
+                self.errors[label] = self.errors.get(label, 0) + 1
+                if len(self.failures) < 10:
+                    body = b"" if response.streaming else response.content[:300]
+                    self.failures.append(
+                        f"{label}: {response.status_code} {body.decode(errors='replace')}")
+
+    def scenario_failed(self, name, error):
+        if not self.enabled:
+            return
+        with self.lock:
+            label = f"scenario {name}"
+            self.errors[label] = self.errors.get(label, 0) + 1
+            if len(self.failures) < 10:
+                self.failures.append(f"{label}: {error!r}")
+
+
+class Session:
+    """One thread's test client; every request it sends is timed and recorded."""
+
+    def __init__(self, recorder):
+        self.client = Client()
+        self.recorder = recorder
+
+    def call(self, method, path, expect=200, token=None, label=None, **kwargs):
+        if token is not None:
+            kwargs["HTTP_AUTHORIZATION"] = f"Token {token}"
+        if label is None:
+            label = f"{method} {resolve(urlsplit(path).path).url_name}"
+        send = getattr(self.client, method.lower())
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            started, cpu_started = time.perf_counter(), time.thread_time()
+            response = send(path, **kwargs)
+            if response.streaming:
+                # Files and dossiers are produced while they are read
+                for _ in response.streaming_content:
+                    pass
+            elapsed = time.perf_counter() - started
+            cpu = time.thread_time() - cpu_started
+        self.recorder.add(label, elapsed, cpu, queries.count, response,
+                          expect if isinstance(expect, tuple) else (expect,))
+        return response
+
+
+class Workload:
+    """
+    Sample data and the scenarios that use it. Scenario ``i`` only writes
+    to objects reserved for ``i`` (its member, its quotations, its users),
+    so rounds can run in any order and in parallel without conflicting.
+    """
+
+    SCENARIOS = [
+        "login_logout", "registration", "profile", "change_password",
+        "password_reset", "product_reads", "membership_reads", "membership_writes",
+        "document_reads", "document_uploads", "payment_reads", "payment_uploads",
+        "resumable_upload", "bulk_verify", "files", "quotation_reads",
+        "quotation_create", "quotation_fan_out", "quotation_update",
+        "quotation_status", "quotation_pdf", "guideline_search", "analytics",
+        "profiling", "metrics",
+    ]
+
+    def __init__(self, rounds, members, products, quotations, items, seed):
+        self.rounds = rounds
+        self.member_count = max(members, rounds)
+        self.product_count = max(products, 1)
+        self.quotation_count = max(quotations, 3)
+        self.item_count = max(items, 1)
+        self.random = random.Random(seed)
+        self.uploads = 0
+        self.upload_lock = threading.Lock()
+
+    # --- Sample data ---------------------------------------------------
+
+    def seed(self):
+        rng = self.random
+        password = make_password(PASSWORD)
+        today = date.today()
+
+        def users(prefix, count, **fields):
+            return User.objects.bulk_create(
+                User(username=f"bench-{prefix}-{n}", email=f"bench-{prefix}-{n}@example.com",
+                     first_name="Bench", last_name=prefix.title(), password=password, **fields)
+                for n in range(count))
+
+        self.staff = users("staff", 1, is_staff=True)[0]
+        member_users = users("member", self.member_count)
+        # Users that log in and out, change or reset their password, one per round
+        self.login_users = users("login", self.rounds)
+        self.password_users = users("password", self.rounds)
+        self.reset_users = users("reset", self.rounds)
+
+        tokens = Token.objects.bulk_create(
+            Token(key=Token.generate_key(), user=user)
+            for user in [self.staff] + member_users + self.password_users)
+        self.staff_token = tokens[0].key
+        self.member_tokens = [token.key for token in tokens[1:1 + self.member_count]]
+        self.password_tokens = [token.key for token in tokens[1 + self.member_count:]]
+
+        user_types = [choice for choice, _ in Registration.USER_TYPES]
+        registrations = Registration.objects.bulk_create(
+            Registration(user=user, user_type=rng.choice(user_types),
+                         contact_number=f"98{rng.randrange(10 ** 8):08d}",
+                         country=rng.choice(COUNTRIES), state="Bench", city="Bench",
+                         pincode=f"{rng.randrange(100000, 999999)}")
+            for user in member_users + self.login_users)
+        self.spare_registrations = [registration.id for registration in
+                                    registrations[self.member_count:]]
+        self.members = Membership.objects.bulk_create(
+            Membership(registration=registration, company_name=f"Bench Company {n}",
+                       email=f"bench-member-{n}@example.com", phone="9876543210",
+                       country=registration.country, state="Bench", city="Bench",
+                       pincode=registration.pincode, start_date=today - timedelta(days=n),
+                       end_date=today + timedelta(days=365 - n))
+            for n, registration in enumerate(registrations[:self.member_count]))
+
+        self.seed_products(rng)
+        self.seed_documents(rng)
+        self.seed_quotations(rng)
+        call_command("refresh_price_rollups", stdout=io.StringIO())
+
+    def seed_products(self, rng):
+        categories = [choice for choice, _ in Product.CATEGORY_CHOICES]
+        formulations = [choice for choice, _ in Product.FORMULATION_CHOICES]
+        statuses = [choice for choice, _ in ProductRegistration.REGISTRATION_STATUS_CHOICES]
+        self.products = Product.objects.bulk_create(
+            Product(product_name=f"Bench product {n}",
+                    biocontrol_agent_name=rng.choice(["Trichoderma", "Bacillus", "Beauveria"]),
+                    biocontrol_agent_strain=f"BS-{rng.randrange(1000)}",
+                    category=rng.choice(categories), formulation=rng.choice(formulations),
+                    cfu=f"{rng.randrange(1, 9)}x10^8")
+            for n in range(self.product_count))
+        ProductRegistration.objects.bulk_create(
+            ProductRegistration(product=product, country=country,
+                                registration_status=rng.choice(statuses),
+                                registration_number=f"REG-{product.id}-{country[:2].upper()}")
+            for product in self.products
+            for country in rng.sample(COUNTRIES, rng.randrange(0, 4)))
+        documents = []
+        for product in self.products[::10]:
+            document = ProductDocument(product=product, document_name="Technical data sheet")
+            document.file.save("datasheet.png", ContentFile(self.png()), save=False)
+            documents.append(document)
+        ProductDocument.objects.bulk_create(documents)
+
+    def seed_documents(self, rng):
+        document_types = [choice for choice, _ in MembershipDocument.DOCUMENT_TYPES]
+        # The other types are left for the upload scenarios
+        self.upload_types = document_types[3:6]
+        methods = [choice for choice, _ in MembershipPayment.PAYMENT_METHOD_CHOICES]
+        documents, payments = [], []
+        for membership in self.members:
+            for document_type in document_types[:3]:
+                document = MembershipDocument(membership=membership, document_type=document_type,
+                                              document_name=document_type.replace("_", " "))
+                document.file.save("document.png", ContentFile(self.png()), save=False)
+                documents.append(document)
+            for _ in range(2):
+                payment = MembershipPayment(
+                    membership=membership, amount=Decimal(rng.randrange(1000, 50000)),
+                    currency=rng.choice(["INR", "USD"]), method=rng.choice(methods),
+                    payment_reference=f"TXN{rng.randrange(10 ** 9)}")
+                payment.payment_proof.save("proof.png", ContentFile(self.png()), save=False)
+                payments.append(payment)
+        documents = MembershipDocument.objects.bulk_create(documents)
+        payments = MembershipPayment.objects.bulk_create(payments)
+        self.documents = [documents[n * 3:n * 3 + 3] for n in range(self.member_count)]
+        self.payments = [payments[n * 2:n * 2 + 2] for n in range(self.member_count)]
+
+    def seed_quotations(self, rng):
+        quotations = Quotation.objects.bulk_create(
+            Quotation(membership=membership, country=rng.choice(COUNTRIES),
+                      currency=rng.choice(["INR", "USD"]),
+                      title=f"Registration quote {n + 1} for {membership.company_name}",
+                      authority_department="Plant Protection Directorate",
+                      authority_website="https://example.com")
+            for membership in self.members
+            for n in range(self.quotation_count))
+        items = QuotationItem.objects.bulk_create(
+            (QuotationItem(quotation=quotation, product=product,
+                           quoted_price=Decimal(rng.randrange(5000, 500000)) / 100)
+             for quotation in quotations
+             for product in rng.sample(self.products, min(self.item_count, len(self.products)))),
+            batch_size=1000)
+        self.quotations = [quotations[n * self.quotation_count:(n + 1) * self.quotation_count]
+                           for n in range(self.member_count)]
+        self.quotation_items = {}
+        for item in items:
+            self.quotation_items.setdefault(item.quotation_id, []).append(item)
+
+        # Guideline files on every other quotation, with their text already indexed
+        files, texts = [], {}
+        for quotation in quotations[::2]:
+            text = " ".join(rng.choice(GUIDELINE_WORDS) for _ in range(80))
+            guideline = QuotationGuidelineFile(quotation=quotation, file_name="guidelines.docx")
+            guideline.file.save("guidelines.docx", ContentFile(docx_bytes(text)), save=False)
+            files.append(guideline)
+            texts[blob_sha256(guideline.file.name)] = (guideline.file.name, text)
+        QuotationGuidelineFile.objects.bulk_create(files)
+        GuidelineText.objects.bulk_create(
+            GuidelineText(sha256=sha256, file_name=name, status="indexed", page_count=1)
+            for sha256, (name, _) in texts.items())
+        GuidelineTextPage.objects.bulk_create(
+            GuidelineTextPage(document_id=sha256, page=1, text=text)
+            for sha256, (_, text) in texts.items())
+
+    def png(self):
+        with self.upload_lock:
+            self.uploads += 1
+            return PNG + f"bench-{self.uploads}".encode()
+
+    def upload(self, name):
+        return SimpleUploadedFile(name, self.png(), content_type="image/png")
+
+    # --- Scenarios -------------------------------------------------------
+
+    def login_logout(self, s, i):
+        user = self.login_users[i]
+        response = s.call("POST", "/api/auth/login/", content_type="application/json",
+                          data={"username": user.username, "password": PASSWORD})
+        s.call("POST", "/api/auth/logout/", token=response.json()["token"])
+
+    def registration(self, s, i):
+        s.call("POST", "/api/auth/registration/", expect=201, content_type="application/json", data={
+            "user": {"username": f"bench-new-{i}", "email": f"bench-new-{i}@example.com",
+                     "first_name": "Bench", "last_name": "New",
+                     "password": PASSWORD, "confirm_password": PASSWORD},
+            "user_type": "company", "contact_number": "9876543210", "country": "India",
+            "state": "Karnataka", "city": "Bengaluru", "pincode": "560001",
+        })
+
+    def profile(self, s, i):
+        token = self.member_tokens[i]
+        s.call("GET", "/api/auth/profile/", token=token)
+        s.call("PUT", "/api/auth/profile/", token=token, content_type="application/json",
+               data={"designation": f"Regulatory lead {i}"})
+
+    def change_password(self, s, i):
+        s.call("POST", "/api/auth/change-password/", token=self.password_tokens[i],
+               content_type="application/json", data={
+                   "old_password": PASSWORD, "new_password": f"{PASSWORD}-changed",
+                   "confirm_password": f"{PASSWORD}-changed"})
+
+    def password_reset(self, s, i):
+        user = self.reset_users[i]
+        s.call("POST", "/api/auth/forgot-password/", content_type="application/json",
+               data={"email": user.email})
+        s.call("POST", "/api/auth/reset-password/", content_type="application/json", data={
+            "token": default_token_generator.make_token(user),
+            "uidb64": urlsafe_base64_encode(force_bytes(user.pk)),
+            "new_password": f"{PASSWORD}-reset", "confirm_password": f"{PASSWORD}-reset"})
+
+    def product_reads(self, s, i):
+        product = self.products[i * 7 % len(self.products)]
+        s.call("GET", "/api/products/")
+        s.call("GET", f"/api/products/{product.id}/")
+        s.call("GET", f"/api/products/{product.id}/documents/")
+        s.call("GET", f"/api/products/{product.id}/registrations/")
+
+    def membership_reads(self, s, i):
+        membership, token = self.members[i], self.member_tokens[i]
+        s.call("GET", "/api/memberships/", token=token)
+        s.call("GET", f"/api/memberships/{membership.id}/", token=token)
+        s.call("GET", f"/api/memberships/{membership.id}/dossier/", token=token)
+
+    def membership_writes(self, s, i):
+        s.call("POST", "/api/memberships/", expect=201, token=self.member_tokens[i],
+               content_type="application/json", data={
+                   "registration": self.spare_registrations[i],
+                   "company_name": f"Bench Startup {i}", "email": f"bench-startup-{i}@example.com",
+                   "phone": "9876543210", "country": "Kenya", "state": "Nairobi",
+                   "city": "Nairobi", "pincode": "00100"})
+        s.call("PUT", f"/api/memberships/{self.members[i].id}/", token=self.member_tokens[i],
+               content_type="application/json", data={"remarks": f"Updated in round {i}"})
+
+    def document_reads(self, s, i):
+        membership, token = self.members[i], self.member_tokens[i]
+        s.call("GET", f"/api/memberships/{membership.id}/documents/", token=token)
+        s.call("GET", "/api/membership-documents/", token=token)
+        s.call("GET", f"/api/membership-documents/{self.documents[i][0].id}/", token=token)
+        s.call("GET", f"/api/membership-documents/by-membership/{membership.id}/", token=token)
+
+    def document_uploads(self, s, i):
+        membership, token = self.members[i], self.member_tokens[i]
+        s.call("POST", f"/api/memberships/{membership.id}/documents/", expect=201, token=token,
+               data={"document_type": self.upload_types[0], "document_name": "Address proof",
+                     "file": self.upload("address.png")})
+        s.call("POST", "/api/membership-documents/", expect=201, token=token,
+               data={"document_type": self.upload_types[1], "document_name": "Bank proof",
+                     "file": self.upload("bank.png")})
+        # The test client only encodes multipart bodies for POST
+        s.call("PUT", f"/api/membership-documents/{self.documents[i][1].id}/", token=token,
+               content_type=MULTIPART_CONTENT, data=encode_multipart(BOUNDARY, {
+                   "remarks": "Re-uploaded with a clearer scan",
+                   "file": self.upload("replacement.png")}))
+
+    def payment_reads(self, s, i):
+        membership, token = self.members[i], self.member_tokens[i]
+        s.call("GET", f"/api/memberships/{membership.id}/payments/", token=token)
+        s.call("GET", "/api/membership-payments/", token=token)
+        s.call("GET", f"/api/membership-payments/{self.payments[i][0].id}/", token=token)
+        s.call("GET", f"/api/membership-payments/by-membership/{membership.id}/", token=token)
+
+    def payment_uploads(self, s, i):
+        membership, token = self.members[i], self.member_tokens[i]
+        payment = {"amount": "2500.00", "currency": "INR", "method": "upi",
+                   "payment_reference": f"UPI{i:08d}"}
+        s.call("POST", f"/api/memberships/{membership.id}/payments/", expect=201, token=token,
+               data={**payment, "payment_proof": self.upload("proof.png")})
+        s.call("POST", "/api/membership-payments/", expect=201, token=token,
+               data={**payment, "payment_proof": self.upload("proof.png")})
+        s.call("PUT", f"/api/membership-payments/{self.payments[i][1].id}/", token=token,
+               content_type="application/json", data={"remarks": "Paid in two instalments"})
+
+    def resumable_upload(self, s, i):
+        token = self.member_tokens[i]
+        content = self.png()
+        response = s.call("POST", "/api/uploads/", expect=201, token=token,
+                          content_type="application/json", data={
+                              "target": "membership_document", "file_name": "incorporation.png",
+                              "total_size": len(content), "metadata": {
+                                  "document_type": self.upload_types[2],
+                                  "document_name": "Certificate of incorporation"}})
+        session = f"/api/uploads/{response.json()['data']['id']}/"
+        s.call("GET", session, token=token)
+        s.call("PATCH", session, token=token, data=content,
+               content_type="application/offset+octet-stream", HTTP_UPLOAD_OFFSET="0")
+        s.call("POST", f"{session}complete/", expect=201, token=token)
+
+        # A second upload that is given up on
+        response = s.call("POST", "/api/uploads/", expect=201, token=token,
+                          content_type="application/json", data={
+                              "target": "membership_payment", "file_name": "receipt.png",
+                              "total_size": len(content), "metadata": {
+                                  "amount": "100.00", "currency": "USD", "method": "paypal"}})
+        s.call("DELETE", f"/api/uploads/{response.json()['data']['id']}/", token=token)
+
+    def bulk_verify(self, s, i):
+        s.call("POST", "/api/membership-documents/bulk-verify/", token=self.staff_token,
+               content_type="application/json", data={"items": [
+                   {"id": document.id, "verification_status": "verified"}
+                   for document in self.documents[i]]})
+        s.call("POST", "/api/membership-payments/bulk-verify/", token=self.staff_token,
+               content_type="application/json", data={"items": [
+                   {"id": payment.id, "verification_status": "verified"}
+                   for payment in self.payments[i]]})
+
+    def files(self, s, i):
+        s.call("GET", signed_file_url(self.documents[i][2].file.name))
+
+    def quotation_reads(self, s, i):
+        token = self.member_tokens[i]
+        s.call("GET", "/api/quotations/", token=token)
+        s.call("GET", f"/api/quotations/{self.quotations[i][0].id}/", token=token)
+        s.call("GET", f"/api/quotations/by-membership/{self.members[i].id}/", token=token)
+
+    def quotation_payload(self, i):
+        return {
+            "currency": "USD", "title": f"Bench registration quote {i}",
+            "authority_department": "Plant Protection Directorate",
+            "items": [{"product": product.id, "quoted_price": f"{120 + n * 5}.00"}
+                      for n, product in enumerate(
+                          self.products[i % len(self.products):][:self.item_count])],
+        }
+
+    def quotation_create(self, s, i):
+        s.call("POST", "/api/quotations/", expect=201, token=self.member_tokens[i],
+               content_type="application/json", data={**self.quotation_payload(i), "country": "Peru"})
+
+    def quotation_fan_out(self, s, i):
+        s.call("POST", "/api/quotations/fan-out/", expect=201, token=self.member_tokens[i],
+               content_type="application/json",
+               data={**self.quotation_payload(i), "countries": COUNTRIES[:5]})
+
+    def quotation_update(self, s, i):
+        quotation = self.quotations[i][0]
+        items = self.quotation_items[quotation.id]
+        s.call("PUT", f"/api/quotations/{quotation.id}/", token=self.member_tokens[i],
+               content_type="application/json", data={
+                   "version": quotation.version,
+                   "description": "Prices revised after the field trials",
+                   "items": [{"id": item.id, "product": item.product_id,
+                              "quoted_price": str(item.quoted_price + 1)} for item in items]})
+
+    def quotation_status(self, s, i):
+        quotation = self.quotations[i][1]
+        s.call("POST", f"/api/quotations/{quotation.id}/status/", token=self.staff_token,
+               content_type="application/json",
+               data={"status": "under_review", "version": quotation.version})
+
+    def quotation_pdf(self, s, i):
+        # 202 while the PDF is rendered in the background, then the file
+        s.call("GET", f"/api/quotations/{self.quotations[i][2].id}/pdf/",
+               expect=(200, 202), token=self.member_tokens[i])
+
+    def guideline_search(self, s, i):
+        s.call("GET", "/api/quotations/guidelines/search/", token=self.member_tokens[i],
+               data={"q": SEARCH_TERMS[i % len(SEARCH_TERMS)]})
+
+    def analytics(self, s, i):
+        product = self.products[i % len(self.products)]
+        s.call("GET", "/api/analytics/quoted-prices/", token=self.staff_token,
+               data={"product": product.id})
+        s.call("GET", "/api/analytics/price-suggestion/", token=self.staff_token,
+               data={"product": product.id, "country": COUNTRIES[i % len(COUNTRIES)]})
+
+    def profiling(self, s, i):
+        response = s.call("GET", "/api/products/", token=self.staff_token,
+                          label="GET product-list (profiled)", HTTP_X_PROFILE="1")
+        s.call("GET", response["X-Profile-URL"], token=self.staff_token)
+
+    def metrics(self, s, i):
+        s.call("GET", "/metrics", HTTP_AUTHORIZATION=f"Bearer {METRICS_TOKEN}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the REST API end to end. A throwaway database is seeded "
+        "with sample members, products, documents, payments and quotations, "
+        "then every endpoint is driven from --concurrency threads through the "
+        "full middleware stack. Reports p50/p95/p99 latency, CPU time and "
+        "queries per endpoint and overall throughput, and fails if any "
+        "endpoint answers unexpectedly or has regressed against the baseline "
+        "file in queries or CPU time per request, or in throughput (record "
+        "one with --save-baseline on the machine that runs the comparison)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=20,
+                            help="Rounds of every scenario (default 20).")
+        parser.add_argument("--warmup", type=int, default=1,
+                            help="Untimed rounds run first, one at a time (default 1).")
+        parser.add_argument("--concurrency", type=int, default=8,
+                            help="Threads sending requests (default 8).")
+        parser.add_argument("--members", type=int, default=50,
+                            help="Sample members, at least one per round (default 50).")
+        parser.add_argument("--products", type=int, default=200,
+                            help="Sample products (default 200).")
+        parser.add_argument("--quotations", type=int, default=4,
+                            help="Quotations per member, at least 3 (default 4).")
+        parser.add_argument("--items", type=int, default=8,
+                            help="Items per quotation (default 8).")
+        parser.add_argument("--seed", type=int, default=1,
+                            help="Random seed for the sample data and request order (default 1).")
+        parser.add_argument("--baseline", default=str(DEFAULT_BASELINE),
+                            help="Baseline JSON file (default website/bench_api_baseline.json).")
+        parser.add_argument("--save-baseline", action="store_true",
+                            help="Write the results to --baseline instead of comparing.")
+        parser.add_argument("--tolerance", type=float, default=0.25,
+                            help="Allowed increase in CPU time per request and drop "
+                                 "in throughput, as a fraction (default 0.25).")
+        parser.add_argument("--slack-ms", type=float, default=2.0,
+                            help="CPU time increases below this are never regressions "
+                                 "(default 2).")
+
+    def handle(self, *args, **options):
+        requests, warmup = max(1, options["requests"]), max(0, options["warmup"])
+        workload = Workload(
+            warmup + requests, options["members"], options["products"],
+            options["quotations"], options["items"], options["seed"])
+        run_options = {
+            "requests": requests, "warmup": warmup,
+            "concurrency": max(1, options["concurrency"]),
+            "members": workload.member_count, "products": workload.product_count,
+            "quotations": workload.quotation_count, "items": workload.item_count,
+            "seed": options["seed"],
+        }
+
+        directory = tempfile.mkdtemp(prefix="bench_api_")
+        if connection.vendor == "sqlite":
+            # A file, not the shared in-memory database, so threads can write
+            # at once; transactions wait for the write lock when they start
+            # instead of failing with "database is locked" when they write
+            connection.settings_dict["TEST"]["NAME"] = os.path.join(directory, "bench.sqlite3")
+            connection.settings_dict["OPTIONS"].setdefault("transaction_mode", "IMMEDIATE")
+        website_logger = logging.getLogger("website")
+        log_level = website_logger.level
+        setup_test_environment(debug=False)
+        try:
+            with override_settings(MEDIA_ROOT=os.path.join(directory, "media"),
+                                   METRICS_DIR=os.path.join(directory, "metrics"),
+                                   METRICS_TOKEN=METRICS_TOKEN):
+                old_config = setup_databases(verbosity=0, interactive=False)
+                try:
+                    # Request logs would bury the report
+                    website_logger.setLevel(logging.WARNING)
+                    self.stdout.write("Seeding sample data...")
+                    workload.seed()
+                    self.stdout.write(
+                        f"Running {len(Workload.SCENARIOS)} scenarios x {requests} rounds "
+                        f"on {run_options['concurrency']} threads...")
+                    recorder, wall_time = self.run(workload, run_options)
+                finally:
+                    website_logger.setLevel(log_level)
+                    # The benchmark's requests stay out of the real /metrics
+                    flusher.stop()
+                    connections.close_all()
+                    teardown_databases(old_config, verbosity=0)
+        finally:
+            teardown_test_environment()
+            shutil.rmtree(directory, ignore_errors=True)
+
+        results = self.summarize(recorder, wall_time, run_options)
+        self.report(results, recorder)
+        self.check_coverage(results)
+
+        problems = [f"{label}: {count} unexpected responses"
+                    for label, count in sorted(recorder.errors.items())]
+        baseline_path = Path(options["baseline"])
+        if options["save_baseline"]:
+            if problems:
+                raise CommandError("Not saving a baseline from a run with errors:\n  "
+                                   + "\n  ".join(problems))
+            baseline_path.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+            self.stdout.write(self.style.SUCCESS(f"Baseline saved to {baseline_path}"))
+            return
+        compared = baseline_path.exists()
+        if compared:
+            baseline = json.loads(baseline_path.read_text())
+            problems += self.compare(results, baseline, options["tolerance"], options["slack_ms"])
+        else:
+            self.stdout.write(self.style.WARNING(
+                f"No baseline at {baseline_path}; record one with --save-baseline."))
+
+        if problems:
+            raise CommandError(f"{len(problems)} problems:\n  " + "\n  ".join(problems))
+        self.stdout.write(self.style.SUCCESS(
+            "No regressions against the baseline." if compared else "No errors."))
+
+    def run(self, workload, run_options):
+        """Warm up one round at a time, then run the timed rounds in a shuffled order."""
+        recorder = Recorder()
+        session = Session(recorder)
+        for i in range(run_options["warmup"]):
+            for name in Workload.SCENARIOS:
+                self.run_scenario(workload, session, name, i)
+
+        tasks = [(name, i) for name in Workload.SCENARIOS
+                 for i in range(run_options["warmup"], workload.rounds)]
+        random.Random(run_options["seed"]).shuffle(tasks)
+        pending = queue.SimpleQueue()
+        for task in tasks:
+            pending.put(task)
+
+        def worker():
+            thread_session = Session(recorder)
+            try:
+                while True:
+                    try:
+                        name, i = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    self.run_scenario(workload, thread_session, name, i)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, name=f"bench-{n}")
+                   for n in range(run_options["concurrency"])]
+        recorder.enabled = True
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return recorder, time.perf_counter() - started
+
+    @staticmethod
+    def run_scenario(workload, session, name, i):
+        try:
+            getattr(workload, name)(session, i)
+        except Exception as e:
+            # e.g. a step needed the body of a response that failed
+            session.recorder.scenario_failed(name, e)
+
+    @staticmethod
+    def summarize(recorder, wall_time, run_options):
+        endpoints = {}
+        for label, samples in recorder.samples.items():
+            latencies = sorted(elapsed * 1000 for elapsed, _, _ in samples)
+            cpu = sorted(cpu * 1000 for _, cpu, _ in samples)
+            queries = [count for _, _, count in samples]
+            endpoints[label] = {
+                "requests": len(samples),
+                "errors": recorder.errors.get(label, 0),
+                "p50_ms": round(percentile_of(latencies, 50), 2),
+                "p95_ms": round(percentile_of(latencies, 95), 2),
+                "p99_ms": round(percentile_of(latencies, 99), 2),
+                "cpu_p50_ms": round(percentile_of(cpu, 50), 2),
+                "queries_mean": round(sum(queries) / len(queries), 2),
+                "queries_max": max(queries),
+            }
+        total = sum(endpoint["requests"] for endpoint in endpoints.values())
+        return {
+            "options": run_options,
+            "requests": total,
+            "seconds": round(wall_time, 2),
+            "throughput": round(total / wall_time, 2),
+            "endpoints": endpoints,
+        }
+
+    def report(self, results, recorder):
+        self.stdout.write(
+            f"\n{'Endpoint':<48}{'Requests':>9}{'Errors':>7}{'p50 ms':>9}"
+            f"{'p95 ms':>9}{'p99 ms':>9}{'CPU ms':>9}{'Queries':>9}")
+        for label, endpoint in sorted(results["endpoints"].items(),
+                                      key=lambda item: item[0].split(" ", 1)[::-1]):
+            self.stdout.write(
+                f"{label:<48}{endpoint['requests']:>9}{endpoint['errors']:>7}"
+                f"{endpoint['p50_ms']:>9.1f}{endpoint['p95_ms']:>9.1f}"
+                f"{endpoint['p99_ms']:>9.1f}{endpoint['cpu_p50_ms']:>9.1f}"
+                f"{endpoint['queries_mean']:>9.1f}")
+        self.stdout.write(
+            f"\n{results['requests']} requests in {results['seconds']:.1f} s: "
+            f"{results['throughput']:.1f} requests/s\n")
+        for failure in recorder.failures:
+            self.stdout.write(self.style.ERROR(f"  {failure}"))
+
+    def check_coverage(self, results):
+        """Warn about endpoints of website/urls.py that no scenario requests."""
+        exercised = {label.split(" ", 1)[1].split(" (")[0] for label in results["endpoints"]}
+        missing = sorted(pattern.name for pattern in website_urls.urlpatterns
+                         if pattern.name not in exercised)
+        if missing:
+            self.stdout.write(self.style.WARNING(
+                "Endpoints without a scenario: " + ", ".join(missing)))
+
+    @staticmethod
+    def compare(results, baseline, tolerance, slack_ms):
+        if baseline.get("options") != results["options"]:
+            raise CommandError(
+                "The baseline was recorded with different options "
+                f"({baseline.get('options')}); run with the same options "
+                "or record a new baseline with --save-baseline.")
+        problems = []
+        for label, base in sorted(baseline["endpoints"].items()):
+            current = results["endpoints"].get(label)
+            if current is None:
+                problems.append(f"{label}: no longer requested")
+                continue
+            # Counts depend on the code, not the machine; allow for cache refreshes
+            if current["queries_mean"] >= base["queries_mean"] + 1:
+                problems.append(
+                    f"{label}: {current['queries_mean']} queries per request "
+                    f"(baseline {base['queries_mean']})")
+            # Wall-clock latency mostly measures waiting for the other
+            # threads; the request's own CPU time is what the code changes
+            if (current["cpu_p50_ms"] > base["cpu_p50_ms"] * (1 + tolerance)
+                    and current["cpu_p50_ms"] - base["cpu_p50_ms"] > slack_ms):
+                problems.append(
+                    f"{label}: {current['cpu_p50_ms']} ms CPU per request "
+                    f"(baseline {base['cpu_p50_ms']} ms)")
+        if results["throughput"] < baseline["throughput"] * (1 - tolerance):
+            problems.append(
+                f"throughput {results['throughput']} requests/s "
+                f"(baseline {baseline['throughput']} requests/s)")
+        return problems
@@ -0,0 +1,89 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from website.models import (Membership, Product, Quotation, QuotationItem,
+                            Registration)
+from website.serializers import QuotationSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark serializing a membership's quotations with and without "
+        "eager loading. Sample data is created in a transaction that is "
+        "rolled back, so the database is left unchanged."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=10_000,
+                            help="Quotation items to create (default 10000).")
+        parser.add_argument("--quotations", type=int, default=100,
+                            help="Quotations to spread the items over (default 100).")
+        parser.add_argument("--products", type=int, default=500,
+                            help="Distinct products quoted (default 500).")
+        parser.add_argument("--skip-baseline", action="store_true",
+                            help="Only time the eager-loaded read.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            membership = self.create_sample(
+                max(1, options["items"]), max(1, options["quotations"]),
+                max(1, options["products"]))
+
+            queryset = Quotation.objects.filter(membership=membership)
+            if not options["skip_baseline"]:
+                self.measure("Baseline", queryset)
+            self.measure("Eager-loaded", QuotationSerializer.eager_load(queryset))
+
+            transaction.set_rollback(True)
+
+    def create_sample(self, item_count, quotation_count, product_count):
+        user = User.objects.create_user("bench-quotations")
+        registration = Registration.objects.create(
+            user=user, user_type="company", contact_number="0000000000",
+            country="India", state="Bench", city="Bench", pincode="000000")
+        membership = Membership.objects.create(
+            registration=registration, company_name="Benchmark Ltd",
+            email="bench@example.com", phone="0000000000", country="India",
+            state="Bench", city="Bench", pincode="000000")
+
+        category = Product._meta.get_field("category").choices[0][0]
+        formulation = Product._meta.get_field("formulation").choices[0][0]
+        products = Product.objects.bulk_create(
+            Product(product_name=f"Bench product {i}",
+                    biocontrol_agent_name="Bench agent",
+                    biocontrol_agent_strain="B-1",
+                    category=category, formulation=formulation)
+            for i in range(product_count))
+        quotations = Quotation.objects.bulk_create(
+            Quotation(membership=membership, country="India", currency="INR",
+                      title=f"Bench quotation {i}")
+            for i in range(quotation_count))
+        QuotationItem.objects.bulk_create(
+            (QuotationItem(quotation=quotations[i % quotation_count],
+                           product=products[i % product_count],
+                           currency="INR", quoted_price=100 + i % 50,
+                           quoted_by=user if i % 2 else None)
+             for i in range(item_count)),
+            batch_size=1000)
+        return membership
+
+    def measure(self, label, queryset):
+        # Counted with a wrapper: the debug query log is capped at 9000
+        queries = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            started = time.perf_counter()
+            data = QuotationSerializer(queryset, many=True).data
+            elapsed = time.perf_counter() - started
+        items = sum(len(quotation["items"]) for quotation in data)
+        self.stdout.write(
+            f"{label:<14}{len(data):>6} quotations{items:>8} items"
+            f"{queries:>8} queries{elapsed:>9.2f} s")
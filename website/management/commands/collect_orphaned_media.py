@@ -0,0 +1,183 @@
+import heapq
+import os
+import tempfile
+import time
+from collections import Counter
+from itertools import groupby
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from website.models import StoredBlob
+from website.previews import preview_name
+from website.storage import BLOB_DIR, blob_sha256, stored_file_fields
+
+
+class Command(BaseCommand):
+    help = (
+        "Find files in the upload directories that no FileField refers to "
+        "and report them (default) or delete them (--delete). Both sides are "
+        "sorted on disk and merge-walked, so memory use stays bounded no "
+        "matter how many files there are."
+    )
+
+    # In-progress resumable uploads are cleaned up with their sessions
+    EXCLUDED_DIRS = (settings.UPLOAD_SESSION_DIR,)
+    RECHECK_BATCH_SIZE = 1000
+
+    def add_arguments(self, parser):
+        parser.add_argument("--delete", action="store_true",
+                            help="Delete orphaned files instead of only reporting them.")
+        parser.add_argument("--min-age", type=float, default=24,
+                            help="Ignore files modified in the last N hours (default 24), "
+                                 "so uploads still being saved are never touched.")
+        parser.add_argument("--run-size", type=int, default=100_000,
+                            help="Names sorted in memory at a time (default 100000).")
+
+    def handle(self, *args, **options):
+        self.verbosity = options["verbosity"]
+        cutoff = time.time() - options["min_age"] * 3600
+        run_size = max(1, options["run_size"])
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            stored = external_sort(self.stored_files(cutoff), run_size, temp_dir)
+            referenced = external_sort(self.referenced_names(), run_size, temp_dir)
+
+            orphans = Counter()
+            sizes = Counter()
+            batch = []
+            for name, size in self.unreferenced(stored, referenced):
+                batch.append((name, size))
+                if len(batch) >= self.RECHECK_BATCH_SIZE:
+                    self.collect(batch, orphans, sizes, options["delete"])
+                    batch = []
+            self.collect(batch, orphans, sizes, options["delete"])
+
+        verb = "Deleted" if options["delete"] else "Found"
+        for directory in sorted(orphans):
+            self.stdout.write(
+                f"  {directory:<24}{orphans[directory]:>10} files"
+                f"{sizes[directory] / (1024 * 1024):>12.1f} MB")
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {sum(orphans.values())} orphaned files "
+            f"({sum(sizes.values()) / (1024 * 1024):.1f} MB)."
+            + ("" if options["delete"] else " Run with --delete to remove them.")))
+
+    def media_dirs(self):
+        dirs = {BLOB_DIR + "/", settings.PREVIEW_DIR}
+        for _, field in stored_file_fields():
+            if isinstance(field.upload_to, str) and field.upload_to:
+                dirs.add(field.upload_to.split("/")[0] + "/")
+        return sorted(d for d in dirs if d not in self.EXCLUDED_DIRS)
+
+    def stored_files(self, cutoff):
+        """Yield "name\\tsize" for every file old enough to be collected."""
+        root = default_storage.path("")
+        for directory in self.media_dirs():
+            for dirpath, dirnames, filenames in os.walk(os.path.join(root, directory)):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    name = os.path.relpath(path, root).replace(os.sep, "/")
+                    if stat.st_mtime < cutoff and "\n" not in name:
+                        yield f"{name}\t{stat.st_size}"
+
+    def referenced_names(self):
+        """Yield every stored name a FileField points at, plus its derived previews."""
+        for model, field in stored_file_fields():
+            names = (
+                model.objects.exclude(**{f"{field.attname}__isnull": True})
+                .exclude(**{field.attname: ""})
+                .values_list(field.attname, flat=True)
+                .iterator(chunk_size=2000)
+            )
+            for name in names:
+                yield name
+                sha256 = blob_sha256(name)
+                if sha256 is not None:
+                    yield preview_name(sha256, "preview")
+                    yield preview_name(sha256, "thumbnail")
+
+    def unreferenced(self, stored, referenced):
+        """Merge-walk the two sorted streams and yield stored files with no reference."""
+        reference = next(referenced, None)
+        for line in stored:
+            name, size = line.rsplit("\t", 1)
+            while reference is not None and reference < name:
+                reference = next(referenced, None)
+            if reference != name:
+                yield name, int(size)
+
+    def collect(self, batch, orphans, sizes, delete):
+        if not batch:
+            return
+        # Re-check against the database: a reference may have been added
+        # to an existing file since the references were read
+        names = [name for name, _ in batch]
+        still_used = set()
+        for model, field in stored_file_fields():
+            still_used.update(
+                model.objects.filter(**{f"{field.attname}__in": names})
+                .values_list(field.attname, flat=True))
+
+        removed_blobs = []
+        for name, size in batch:
+            if name in still_used:
+                continue
+            if delete:
+                try:
+                    os.unlink(default_storage.path(name))
+                except FileNotFoundError:
+                    continue
+                if blob_sha256(name) is not None:
+                    removed_blobs.append(name)
+            elif self.verbosity >= 2:
+                self.stdout.write(name)
+            directory = name.split("/")[0]
+            orphans[directory] += 1
+            sizes[directory] += size
+
+        if removed_blobs:
+            StoredBlob.objects.filter(name__in=removed_blobs).delete()
+
+
+def external_sort(lines, run_size, temp_dir):
+    """
+    Sort an iterable of strings that may not fit in memory, dropping
+    duplicates: sorted runs of ``run_size`` go to temporary files, which
+    are then merged lazily.
+    """
+    runs = []
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= run_size:
+            runs.append(_write_run(chunk, temp_dir))
+            chunk = []
+
+    if not runs:
+        merged = iter(sorted(chunk))
+    else:
+        if chunk:
+            runs.append(_write_run(chunk, temp_dir))
+        merged = heapq.merge(*(_read_run(path) for path in runs))
+    return (line for line, _ in groupby(merged))
+
+
+def _write_run(chunk, temp_dir):
+    chunk.sort()
+    fd, path = tempfile.mkstemp(dir=temp_dir, suffix=".run")
+    with os.fdopen(fd, "w", encoding="utf-8") as run:
+        for line in chunk:
+            run.write(line + "\n")
+    return path
+
+
+def _read_run(path):
+    with open(path, encoding="utf-8") as run:
+        for line in run:
+            yield line[:-1]
@@ -0,0 +1,117 @@
+import os
+from collections import Counter
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from website.models import StoredBlob
+from website.storage import BLOB_DIR, hash_file, stored_file_fields
+
+
+class Command(BaseCommand):
+    help = (
+        "Move files saved before content-addressed storage was enabled into "
+        "it, so identical files are kept once, then recompute every blob's "
+        "reference count from the file fields that point at it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500,
+                            help="Rows read per query (default 500).")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Only report how much space deduplication would save.")
+
+    def handle(self, *args, **options):
+        if not hasattr(default_storage, "adopt"):
+            raise CommandError(
+                "The default storage is not content-addressed; check STORAGES.")
+
+        chunk_size = max(1, options["chunk_size"])
+        if options["dry_run"]:
+            self.report(chunk_size)
+            return
+
+        moved = {}
+        missing = 0
+        for model, field in stored_file_fields():
+            for pk, name in self.legacy_rows(model, field, chunk_size):
+                if name not in moved:
+                    path = default_storage.path(name)
+                    if not os.path.exists(path):
+                        missing += 1
+                        continue
+                    moved[name] = (default_storage.adopt(path, name),
+                                   os.path.getsize(path))
+                else:
+                    default_storage.add_reference(moved[name][0])
+                model.objects.filter(pk=pk, **{field.attname: name}).update(
+                    **{field.attname: moved[name][0]})
+
+        # Only remove the old copies once every row points at its blob
+        for name in moved:
+            default_storage.delete(name)
+
+        recounted = self.recount(chunk_size)
+        blobs = {blob for blob, _ in moved.values()}
+        before = sum(size for _, size in moved.values())
+        after = sum(StoredBlob.objects.filter(
+            name__in=blobs).values_list("size", flat=True))
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved {len(moved)} files into {len(blobs)} blobs "
+            f"({self.megabytes(before)} -> {self.megabytes(after)} MB); "
+            f"{missing} referenced files were missing; "
+            f"corrected {recounted} reference counts."))
+
+    def legacy_rows(self, model, field, chunk_size):
+        return (
+            model.objects.exclude(
+                Q(**{f"{field.attname}__isnull": True})
+                | Q(**{field.attname: ""})
+                | Q(**{f"{field.attname}__startswith": f"{BLOB_DIR}/"}))
+            .values_list("pk", field.attname)
+            .iterator(chunk_size=chunk_size)
+        )
+
+    def report(self, chunk_size):
+        seen = {}
+        sizes = {}
+        files = 0
+        for model, field in stored_file_fields():
+            for _, name in self.legacy_rows(model, field, chunk_size):
+                path = default_storage.path(name)
+                if name in seen or not os.path.exists(path):
+                    continue
+                seen[name], sizes[name] = hash_file(path)
+                files += 1
+
+        unique = {}
+        for name, sha256 in seen.items():
+            unique.setdefault(sha256, sizes[name])
+        before = sum(sizes.values())
+        after = sum(unique.values())
+        self.stdout.write(
+            f"{files} files ({self.megabytes(before)} MB) would become "
+            f"{len(unique)} blobs ({self.megabytes(after)} MB).")
+
+    def recount(self, chunk_size):
+        counts = Counter()
+        for model, field in stored_file_fields():
+            counts.update(
+                model.objects.filter(
+                    **{f"{field.attname}__startswith": f"{BLOB_DIR}/"})
+                .values_list(field.attname, flat=True)
+                .iterator(chunk_size=chunk_size)
+            )
+
+        changed = []
+        for blob in StoredBlob.objects.order_by("pk").iterator(chunk_size=chunk_size):
+            if blob.ref_count != counts[blob.name]:
+                blob.ref_count = counts[blob.name]
+                changed.append(blob)
+        StoredBlob.objects.bulk_update(changed, ["ref_count"], batch_size=chunk_size)
+        return len(changed)
+
+    @staticmethod
+    def megabytes(size):
+        return round(size / (1024 * 1024), 1)
@@ -0,0 +1,57 @@
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from website.previews import PREVIEW_FIELDS, render_job, render_previews
+from website.storage import BLOB_DIR
+
+
+class Command(BaseCommand):
+    help = (
+        "Render missing previews and thumbnails for every uploaded document "
+        "and payment proof. Each unique file is rendered once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Worker processes (default: one per CPU).")
+
+    def handle(self, *args, **options):
+        names = set()
+        for label, field_name in PREVIEW_FIELDS.items():
+            model = apps.get_model(label)
+            names.update(
+                model.objects.filter(
+                    **{f"{field_name}__startswith": f"{BLOB_DIR}/"})
+                .values_list(field_name, flat=True)
+                .distinct()
+                .iterator()
+            )
+
+        jobs = {}
+        for name in names:
+            job = render_job(name)
+            if job is not None:
+                # Keyed by preview path: one render per unique content
+                jobs.setdefault(job[2], (name, job))
+
+        results = Counter()
+        with ProcessPoolExecutor(max_workers=options["workers"]) as executor:
+            futures = {
+                executor.submit(render_previews, *job): name
+                for name, job in jobs.values()
+            }
+            for future in as_completed(futures):
+                try:
+                    results[future.result()] += 1
+                except Exception as exc:
+                    results["failed"] += 1
+                    self.stderr.write(f"{futures[future]}: {exc}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(jobs)} files: {results['ready']} rendered, "
+            f"{results['cached']} already cached, "
+            f"{results['unavailable']} skipped (renderer not installed), "
+            f"{results['failed']} failed."))
@@ -0,0 +1,98 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from website.models import GuidelineText, GuidelineTextPage, QuotationGuidelineFile
+from website.search import extract_text, queue_text_extraction
+from website.storage import BLOB_DIR, file_extension
+
+
+class Command(BaseCommand):
+    help = (
+        "Extract and index the text of quotation guideline files. Only "
+        "content hashes that haven't been indexed yet are processed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=20,
+                            help="Files handed to the pool at a time (default 20).")
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Worker processes (default: one per CPU).")
+        parser.add_argument("--reindex", action="store_true",
+                            help="Extract every file again (e.g. after installing pypdf).")
+
+    def handle(self, *args, **options):
+        self.queue_missing()
+        _, deleted = GuidelineText.objects.exclude(
+            file_name__in=QuotationGuidelineFile.objects.filter(
+                file__startswith=f"{BLOB_DIR}/").values("file")
+        ).delete()
+        pruned = deleted.get(GuidelineText._meta.label, 0)
+        if options["reindex"]:
+            GuidelineText.objects.update(status="pending")
+
+        batch_size = max(1, options["batch_size"])
+        counts = {"indexed": 0, "unsupported": 0, "failed": 0}
+        cursor = ""
+        with ProcessPoolExecutor(max_workers=options["workers"]) as executor:
+            while True:
+                batch = list(
+                    GuidelineText.objects.filter(status="pending", pk__gt=cursor)
+                    .order_by("pk")[:batch_size]
+                )
+                if not batch:
+                    break
+                cursor = batch[-1].pk
+
+                futures = {
+                    executor.submit(
+                        extract_text,
+                        default_storage.path(document.file_name),
+                        file_extension(document.file_name),
+                    ): document
+                    for document in batch
+                }
+                for future in as_completed(futures):
+                    document = futures[future]
+                    try:
+                        pages, note = future.result()
+                    except Exception as exc:
+                        pages, note = None, str(exc)
+                        document.status = "failed"
+                        self.stderr.write(f"{document.file_name}: {exc}")
+                    self.save_pages(document, pages, note)
+                    counts[document.status] += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{counts['indexed']} indexed, {counts['unsupported']} unsupported, "
+            f"{counts['failed']} failed, {pruned} stale entries removed."))
+
+    def queue_missing(self):
+        """Queue guideline files saved before indexing existed."""
+        names = (
+            QuotationGuidelineFile.objects.filter(file__startswith=f"{BLOB_DIR}/")
+            .exclude(file__in=GuidelineText.objects.values("file_name"))
+            .values_list("file", flat=True)
+            .distinct()
+        )
+        for name in names.iterator():
+            queue_text_extraction(QuotationGuidelineFile(file=name).file)
+
+    @transaction.atomic
+    def save_pages(self, document, pages, note):
+        document.pages.all().delete()
+        if pages is not None:
+            GuidelineTextPage.objects.bulk_create(
+                GuidelineTextPage(document=document, page=number, text=text)
+                for number, text in enumerate(pages, start=1)
+            )
+            document.status = "indexed"
+            document.page_count = len(pages)
+        elif document.status != "failed":
+            document.status = "unsupported"
+        document.note = note[:255] if note else None
+        document.indexed_at = timezone.now()
+        document.save()
@@ -0,0 +1,100 @@
+import csv
+import os
+import sys
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from website.fx import clear_rate_cache
+from website.models import FxRate
+
+RATE_PLACES = Decimal("0.00000001")
+
+
+class Command(BaseCommand):
+    help = (
+        "Load exchange rates from a CSV file with the columns "
+        "date,base,quote,rate (and optionally source). A rate of 1 base = "
+        "<rate> quote applies from its date until the pair's next rate. "
+        "Existing rates for the same pair and date are replaced, and the "
+        "inverse rate is stored unless the file gives one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv_file", help="CSV file to load, or - for stdin.")
+        parser.add_argument("--source", default=None,
+                            help="Source label for rows without one (default: the file name).")
+        parser.add_argument("--no-inverse", action="store_true",
+                            help="Don't derive inverse rates.")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Validate the file without saving anything.")
+
+    def handle(self, *args, **options):
+        path = options["csv_file"]
+        default_source = options["source"] or (
+            "stdin" if path == "-" else os.path.basename(path))
+
+        if path == "-":
+            rates = self.read_rates(sys.stdin, default_source)
+        else:
+            try:
+                with open(path, newline="", encoding="utf-8-sig") as csv_file:
+                    rates = self.read_rates(csv_file, default_source)
+            except OSError as exc:
+                raise CommandError(f"Can't read {path}: {exc}")
+
+        given = len(rates)
+        if not options["no_inverse"]:
+            for (base, quote, effective_date), (rate, source) in list(rates.items()):
+                rates.setdefault(
+                    (quote, base, effective_date),
+                    ((1 / rate).quantize(RATE_PLACES), source))
+
+        if options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(
+                f"{given} rates are valid ({len(rates) - given} inverses would be added)."))
+            return
+
+        with transaction.atomic():
+            FxRate.objects.bulk_create(
+                [FxRate(base_currency=base, quote_currency=quote,
+                        effective_date=effective_date, rate=rate, source=source)
+                 for (base, quote, effective_date), (rate, source) in rates.items()],
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=["base_currency", "quote_currency", "effective_date"],
+                update_fields=["rate", "source"],
+            )
+        # bulk_create sends no signals
+        clear_rate_cache()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {given} rates and {len(rates) - given} inverses."))
+
+    def read_rates(self, csv_file, default_source):
+        """``{(base, quote, date): (rate, source)}``; later rows win."""
+        reader = csv.DictReader(csv_file)
+        missing = {"date", "base", "quote", "rate"} - set(reader.fieldnames or [])
+        if missing:
+            raise CommandError(
+                f"Missing CSV columns: {', '.join(sorted(missing))}")
+
+        rates = {}
+        for row in reader:
+            line = reader.line_num
+            try:
+                effective_date = date.fromisoformat(row["date"].strip())
+                rate = Decimal(row["rate"].strip()).quantize(RATE_PLACES)
+            except (ValueError, InvalidOperation):
+                raise CommandError(f"Line {line}: invalid date or rate")
+            base = row["base"].strip().upper()
+            quote = row["quote"].strip().upper()
+            if not base or not quote or base == quote:
+                raise CommandError(f"Line {line}: invalid currency pair")
+            if rate <= 0:
+                raise CommandError(f"Line {line}: rate must be positive")
+            source = (row.get("source") or "").strip() or default_source
+            rates[(base, quote, effective_date)] = (rate, source[:100])
+        return rates
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q, Sum
+
+from website.models import MediaOptimization
+
+
+class Command(BaseCommand):
+    help = "Show how much storage media optimization has saved per upload directory."
+
+    def handle(self, *args, **options):
+        rows = (
+            MediaOptimization.objects.values("category")
+            .annotate(
+                optimized=Count("pk", filter=Q(status="optimized")),
+                skipped=Count("pk", filter=Q(status="skipped")),
+                pending=Count("pk", filter=Q(status="pending")),
+                failed=Count("pk", filter=Q(status="failed")),
+                before=Sum("original_size", filter=Q(status="optimized")),
+                after=Sum("optimized_size", filter=Q(status="optimized")),
+                kept=Sum("original_size", filter=Q(
+                    status="optimized", original_file__gt="")),
+            )
+            .order_by("category")
+        )
+
+        header = (f"{'Directory':<24}{'Optimized':>10}{'Skipped':>9}{'Pending':>9}"
+                  f"{'Failed':>8}{'Before MB':>11}{'After MB':>10}"
+                  f"{'Saved MB':>10}{'Saved':>7}{'Kept MB':>9}")
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+
+        total_before = total_after = total_kept = 0
+        for row in rows:
+            before, after, kept = row["before"] or 0, row["after"] or 0, row["kept"] or 0
+            total_before += before
+            total_after += after
+            total_kept += kept
+            self.stdout.write(
+                f"{row['category']:<24}{row['optimized']:>10}{row['skipped']:>9}"
+                f"{row['pending']:>9}{row['failed']:>8}{self.mb(before):>11}"
+                f"{self.mb(after):>10}{self.mb(before - after):>10}"
+                f"{self.percent(before - after, before):>7}{self.mb(kept):>9}")
+
+        saved = total_before - total_after
+        self.stdout.write(self.style.SUCCESS(
+            f"Saved {self.mb(saved)} MB of {self.mb(total_before)} MB "
+            f"({self.percent(saved, total_before)}); net of kept originals "
+            f"{self.mb(saved - total_kept)} MB."))
+
+    @staticmethod
+    def mb(size):
+        return f"{size / (1024 * 1024):.1f}"
+
+    @staticmethod
+    def percent(part, whole):
+        return f"{100 * part / whole:.0f}%" if whole else "-"
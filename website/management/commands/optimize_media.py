@@ -0,0 +1,80 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from website.models import MediaOptimization
+from website.optimization import apply_result, optimize_file, optimize_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Optimize queued uploads: downscale and re-encode images without "
+        "metadata, linearize and recompress PDFs. CPU work runs in a process "
+        "pool; run this regularly from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50,
+                            help="Files handed to the pool at a time (default 50).")
+        parser.add_argument("--limit", type=int, default=None,
+                            help="Stop after this many files.")
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Worker processes (default: one per CPU).")
+        parser.add_argument("--retry-failed", action="store_true",
+                            help="Queue files that failed before again.")
+
+    def handle(self, *args, **options):
+        if options["retry_failed"]:
+            MediaOptimization.objects.filter(status="failed").update(status="pending")
+
+        temp_dir = default_storage.path("blobs/tmp")
+        os.makedirs(temp_dir, exist_ok=True)
+        batch_size = max(1, options["batch_size"])
+        limit = options["limit"]
+        counts = {"optimized": 0, "skipped": 0, "failed": 0}
+        cursor = 0
+        done = 0
+
+        with ProcessPoolExecutor(max_workers=options["workers"]) as executor:
+            while limit is None or done < limit:
+                size = batch_size if limit is None else min(batch_size, limit - done)
+                batch = list(
+                    MediaOptimization.objects.filter(status="pending", pk__gt=cursor)
+                    .order_by("pk")[:size]
+                )
+                if not batch:
+                    break
+                cursor = batch[-1].pk
+                done += len(batch)
+
+                futures = {}
+                for entry in batch:
+                    if not default_storage.exists(entry.original_name):
+                        self.mark_failed(entry, "Original file is missing")
+                        counts["failed"] += 1
+                        continue
+                    future = executor.submit(
+                        optimize_file, *optimize_job(entry, temp_dir))
+                    futures[future] = entry
+
+                for future in as_completed(futures):
+                    entry = futures[future]
+                    try:
+                        apply_result(entry, future.result())
+                    except Exception as exc:
+                        self.mark_failed(entry, str(exc))
+                        self.stderr.write(f"{entry.original_name}: {exc}")
+                    counts[entry.status] += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{counts['optimized']} optimized, {counts['skipped']} skipped, "
+            f"{counts['failed']} failed."))
+
+    def mark_failed(self, entry, note):
+        entry.status = "failed"
+        entry.note = note[:255]
+        entry.processed_at = timezone.now()
+        entry.save()
@@ -0,0 +1,112 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from website.models import BatchJobCheckpoint, Membership, RenewalReminder
+
+
+class Command(BaseCommand):
+    help = (
+        "Deactivate memberships whose end_date has passed and queue renewal "
+        "reminders for memberships expiring soon. Work is done in bounded "
+        "chunks and checkpointed, so a rerun after a crash resumes."
+    )
+
+    EXPIRE_JOB = "membership_expiry"
+    REMIND_JOB = "membership_renewal_reminders"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500,
+                            help="Rows updated per transaction (default 500).")
+        parser.add_argument("--reminder-days", type=int, default=30,
+                            help="Queue reminders for memberships ending within this many days.")
+        parser.add_argument("--date", type=date.fromisoformat,
+                            help="Run as of this date (YYYY-MM-DD) instead of today.")
+        parser.add_argument("--restart", action="store_true",
+                            help="Ignore saved progress and start from the beginning.")
+
+    def handle(self, *args, **options):
+        today = options["date"] or timezone.localdate()
+        chunk_size = max(1, options["chunk_size"])
+
+        expired = self.run_job(
+            self.EXPIRE_JOB, today, options["restart"], chunk_size,
+            Membership.objects.filter(
+                membership_status="active", end_date__lt=today),
+            self.expire_chunk,
+        )
+        reminded = self.run_job(
+            self.REMIND_JOB, today, options["restart"], chunk_size,
+            Membership.objects.filter(
+                membership_status="active",
+                end_date__gte=today,
+                end_date__lte=today + timedelta(days=options["reminder_days"]),
+            ),
+            self.remind_chunk,
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Expired {expired} memberships, queued {reminded} renewal reminders."))
+
+    def run_job(self, name, today, restart, chunk_size, queryset, process_chunk):
+        checkpoint, _ = BatchJobCheckpoint.objects.get_or_create(name=name)
+        if restart or checkpoint.run_date != today:
+            checkpoint.run_date = today
+            checkpoint.cursor = 0
+            checkpoint.save()
+        elif checkpoint.cursor:
+            self.stdout.write(f"Resuming {name} after membership #{checkpoint.cursor}")
+
+        total = 0
+        while True:
+            chunk = list(
+                queryset.filter(pk__gt=checkpoint.cursor)
+                .order_by("pk")
+                .values_list("pk", "end_date")[:chunk_size]
+            )
+            if not chunk:
+                break
+
+            with transaction.atomic():
+                total += process_chunk(chunk, today)
+                checkpoint.cursor = chunk[-1][0]
+                checkpoint.save(update_fields=["cursor", "updated_at"])
+
+        return total
+
+    def expire_chunk(self, chunk, today):
+        # Re-check the status (with the rows locked until the chunk commits)
+        # so a membership renewed mid-run is neither expired nor reminded
+        expiring = list(
+            Membership.objects.select_for_update()
+            .filter(pk__in=[pk for pk, _ in chunk],
+                    membership_status="active", end_date__lt=today)
+            .order_by("pk")
+            .values_list("pk", "end_date")
+        )
+        if not expiring:
+            return 0
+        Membership.objects.filter(pk__in=[pk for pk, _ in expiring]).update(
+            membership_status="inactive", updated_at=timezone.now())
+        self.queue_reminders(expiring, "expired")
+        return len(expiring)
+
+    def remind_chunk(self, chunk, today):
+        return self.queue_reminders(chunk, "upcoming")
+
+    def queue_reminders(self, chunk, reminder_type):
+        already_queued = set(
+            RenewalReminder.objects.filter(
+                membership_id__in=[pk for pk, _ in chunk],
+                reminder_type=reminder_type,
+            ).values_list("membership_id", "end_date")
+        )
+        reminders = [
+            RenewalReminder(membership_id=pk, reminder_type=reminder_type, end_date=end_date)
+            for pk, end_date in chunk
+            if (pk, end_date) not in already_queued
+        ]
+        RenewalReminder.objects.bulk_create(reminders, ignore_conflicts=True)
+        return len(reminders)
@@ -0,0 +1,64 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.utils import timezone
+
+from website.analytics import dirty_slices, quotation_slices, refresh_slice
+from website.models import BatchJobCheckpoint, Quotation, QuotationItem, QuotedPriceRollup
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresh the quoted price rollups (count, min, max, mean and "
+        "percentiles per product, country, currency and month) for the "
+        "country/month slices touched since the last run. Run it from cron; "
+        "use --rebuild now and then to also drop slices whose quotations "
+        "were deleted or moved."
+    )
+
+    ITEMS_JOB = "price_rollups_items"
+    QUOTATIONS_JOB = "price_rollups_quotations"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rebuild", action="store_true",
+                            help="Recompute every slice and remove rollups of empty ones.")
+
+    def handle(self, *args, **options):
+        # Anything written from here on is picked up by the next run
+        started = timezone.now()
+        last_item = QuotationItem.objects.aggregate(last=Max("id"))["last"] or 0
+
+        items_checkpoint, _ = BatchJobCheckpoint.objects.get_or_create(name=self.ITEMS_JOB)
+        quotations_checkpoint, _ = BatchJobCheckpoint.objects.get_or_create(
+            name=self.QUOTATIONS_JOB)
+
+        if options["rebuild"]:
+            slices = quotation_slices(Quotation.objects.all())
+            stale = set(
+                QuotedPriceRollup.objects.values_list("country", "month").distinct()
+            ) - slices
+        else:
+            since = datetime.fromtimestamp(
+                quotations_checkpoint.cursor / 1_000_000, tz=dt_timezone.utc)
+            slices = dirty_slices(items_checkpoint.cursor, since)
+            stale = set()
+
+        groups = 0
+        for country, month in sorted(slices):
+            groups += refresh_slice(country, month)
+            if options["verbosity"] >= 2:
+                self.stdout.write(f"  {country} {month:%Y-%m}")
+        for country, month in stale:
+            QuotedPriceRollup.objects.filter(country=country, month=month).delete()
+
+        items_checkpoint.cursor = last_item
+        items_checkpoint.run_date = started.date()
+        items_checkpoint.save()
+        quotations_checkpoint.cursor = int(started.timestamp() * 1_000_000)
+        quotations_checkpoint.run_date = started.date()
+        quotations_checkpoint.save()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed {len(slices)} slices ({groups} rollups)"
+            + (f", removed {len(stale)} empty slices." if stale else ".")))
@@ -0,0 +1,78 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from website.models import Quotation
+from website.quotation_pdf import pdf_name, quotation_document, render_quotation_pdf
+from website.serializers import QuotationSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the PDFs of quotations whose current version isn't cached "
+        "yet, in a process pool. Limit to one month with --month, or "
+        "re-render cached ones with --force."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--month", type=parse_month,
+                            help="Only quotations created in this month (YYYY-MM).")
+        parser.add_argument("--force", action="store_true",
+                            help="Render again even if the current PDF exists.")
+        parser.add_argument("--batch-size", type=int, default=200,
+                            help="Quotations loaded and handed to the pool at a time (default 200).")
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Worker processes (default: one per CPU).")
+
+    def handle(self, *args, **options):
+        quotations = Quotation.objects.order_by("pk")
+        if options["month"]:
+            start, end = options["month"]
+            quotations = quotations.filter(created_at__gte=start, created_at__lt=end)
+        quotations = QuotationSerializer.eager_load(quotations)
+        batch_size = max(1, options["batch_size"])
+
+        rendered = cached = failed = 0
+        cursor = 0
+        with ProcessPoolExecutor(max_workers=options["workers"]) as executor:
+            while True:
+                batch = list(quotations.filter(pk__gt=cursor)[:batch_size])
+                if not batch:
+                    break
+                cursor = batch[-1].pk
+
+                futures = {}
+                for quotation in batch:
+                    path = default_storage.path(pdf_name(quotation))
+                    if not options["force"] and os.path.exists(path):
+                        cached += 1
+                        continue
+                    future = executor.submit(
+                        render_quotation_pdf, quotation_document(quotation), path)
+                    futures[future] = quotation.pk
+
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                        rendered += 1
+                    except Exception as exc:
+                        failed += 1
+                        self.stderr.write(f"Quotation #{futures[future]}: {exc}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{rendered} rendered, {cached} already cached, {failed} failed."))
+
+
+def parse_month(value):
+    """``YYYY-MM`` -> (start, end) aware datetimes of that month."""
+    try:
+        first = date.fromisoformat(f"{value}-01")
+    except ValueError:
+        raise CommandError(f"Invalid month {value!r}, expected YYYY-MM")
+    following = date(first.year + first.month // 12, first.month % 12 + 1, 1)
+    return (timezone.make_aware(datetime.combine(first, time.min)),
+            timezone.make_aware(datetime.combine(following, time.min)))
@@ -0,0 +1,357 @@
+"""
+In-process metrics in the Prometheus text format.
+
+``MetricsMiddleware`` records, per URL name: request latency, queries and
+query time per request (histograms), responses by status class, and upload
+bytes. ``record_cache`` counts hits and misses of the in-process caches
+(FX rates, price index, previews, quotation PDFs), so hit ratios are
+``hits / (hits + misses)`` in PromQL.
+
+Updates only touch dictionaries of this process. Each process writes its
+totals to ``METRICS_DIR/<pid>.json`` from a background thread every
+``METRICS_FLUSH_SECONDS`` (and at exit); ``/metrics`` adds up the files of
+all processes, so every Gunicorn worker is counted whichever one serves
+the scrape. Totals of processes that have exited are folded into
+``archive.json`` so counters never go backwards.
+"""
+import atexit
+import bisect
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+try:
+    import fcntl
+except ImportError:  # Windows: no locking, single process anyway
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+QUERY_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+# name: (type, help, histogram buckets)
+METRICS = {
+    "http_request_duration_seconds": (
+        "histogram", "Time to build the response, per URL name.", LATENCY_BUCKETS),
+    "http_request_db_queries": (
+        "histogram", "Database queries per request, per URL name.", QUERY_COUNT_BUCKETS),
+    "http_request_db_seconds": (
+        "histogram", "Time spent in database queries per request, per URL name.",
+        QUERY_TIME_BUCKETS),
+    "http_responses_total": (
+        "counter", "Responses by URL name, method and status class (2xx, 4xx, 5xx...).", None),
+    "http_upload_bytes_total": (
+        "counter", "Request body bytes of uploads (multipart and upload chunks).", None),
+    "cache_requests_total": (
+        "counter", "In-process cache lookups by cache and result (hit or miss).", None),
+}
+
+UNMATCHED = "<unmatched>"
+ARCHIVE = "archive.json"
+
+
+class Registry:
+    """Counters and histograms of this process, keyed by name and labels."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}  # key -> [count per bucket..., +Inf count, sum]
+        self.changes = 0
+
+    def inc(self, name, labels, amount=1):
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+            self.changes += 1
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+            histogram[bisect.bisect_left(buckets, value)] += 1
+            histogram[-1] += value
+            self.changes += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "counters": [[name, list(labels), value]
+                             for (name, labels), value in self.counters.items()],
+                "histograms": [[name, list(labels), list(values)]
+                               for (name, labels), values in self.histograms.items()],
+            }
+
+
+registry = Registry()
+
+
+def record_cache(cache, hit):
+    registry.inc("cache_requests_total", (("cache", cache), ("result", "hit" if hit else "miss")))
+
+
+# --- Sharing between processes ---------------------------------------------
+
+class Flusher:
+    """Writes this process's totals to its file; started once per process."""
+
+    def __init__(self):
+        self.pid = None
+        self.written = -1
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.exit_hook = False
+
+    def ensure_started(self):
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            self.written = -1
+            os.makedirs(settings.METRICS_DIR, exist_ok=True)
+            # A file with our pid belongs to an earlier process that exited
+            with archive_lock():
+                archive_files([process_file(self.pid)])
+            self.stopped = threading.Event()
+            threading.Thread(target=self.run, args=(self.stopped,),
+                             name="metrics-flush", daemon=True).start()
+            if not self.exit_hook:
+                atexit.register(self.flush_safely)
+                self.exit_hook = True
+
+    def run(self, stopped):
+        while not stopped.wait(settings.METRICS_FLUSH_SECONDS):
+            self.flush_safely()
+
+    def stop(self):
+        """
+        Stop writing this process's totals (they are left out of
+        ``collect()``); waits for a flush in progress to finish.
+        """
+        with self.flush_lock:
+            self.stopped.set()
+            self.pid = None
+
+    def flush_safely(self):
+        # A failed write (disk full...) must not end the flush thread
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Writing the metrics of process %s failed", os.getpid())
+
+    def flush(self):
+        with self.flush_lock:
+            if self.pid != os.getpid() or registry.changes == self.written:
+                return
+            changes = registry.changes
+            os.makedirs(settings.METRICS_DIR, exist_ok=True)
+            write_json(process_file(self.pid), registry.snapshot())
+            self.written = changes
+
+
+flusher = Flusher()
+
+
+def process_file(pid):
+    return os.path.join(settings.METRICS_DIR, f"{pid}.json")
+
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w") as temp_file:
+        json.dump(data, temp_file)
+    os.replace(temp_path, path)
+
+
+def read_json(path):
+    try:
+        with open(path) as json_file:
+            return json.load(json_file)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+class archive_lock:
+    def __enter__(self):
+        self.file = open(os.path.join(settings.METRICS_DIR, "archive.lock"), "a")
+        if fcntl:
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc_info):
+        self.file.close()
+
+
+def archive_files(paths):
+    """Fold the files at ``paths`` into the archive and remove them (lock held)."""
+    found = [(path, read_json(path)) for path in paths]
+    found = [(path, snapshot) for path, snapshot in found if snapshot]
+    if not found:
+        return
+    snapshots = [snapshot for _, snapshot in found]
+    archive_path = os.path.join(settings.METRICS_DIR, ARCHIVE)
+    merged = merge([read_json(archive_path) or {}] + snapshots)
+    write_json(archive_path, {
+        "counters": [[name, list(labels), value]
+                     for (name, labels), value in merged[0].items()],
+        "histograms": [[name, list(labels), values]
+                       for (name, labels), values in merged[1].items()],
+    })
+    for path, _ in found:
+        os.remove(path)
+
+
+def process_alive(pid):
+    if os.name == "nt":
+        # os.kill() would terminate it
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def merge(snapshots):
+    """Sum snapshots into ``(counters, histograms)`` dicts."""
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot.get("counters", ()):
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, values in snapshot.get("histograms", ()):
+            key = (name, tuple(map(tuple, labels)))
+            total = histograms.get(key)
+            histograms[key] = values if total is None else [a + b for a, b in zip(total, values)]
+    return counters, histograms
+
+
+def collect():
+    """Totals of every process, current one included, as ``merge`` returns them."""
+    flusher.ensure_started()
+    flusher.flush()
+    directory = settings.METRICS_DIR
+    files = {}
+    for name in os.listdir(directory):
+        stem, _, extension = name.partition(".")
+        if extension == "json" and stem.isdigit():
+            files[int(stem)] = os.path.join(directory, name)
+
+    dead = [path for pid, path in files.items() if not process_alive(pid)]
+    if dead:
+        with archive_lock():
+            archive_files(dead)
+
+    paths = [os.path.join(directory, ARCHIVE)] + [
+        path for path in files.values() if path not in dead]
+    return merge(filter(None, map(read_json, paths)))
+
+
+def exposition():
+    """Prometheus text format (version 0.0.4) of ``collect()``."""
+    counters, histograms = collect()
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "counter":
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+            continue
+        for (metric, labels), values in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets + ("+Inf",), values):
+                cumulative += count
+                le = bound if bound == "+Inf" else format_value(bound)
+                lines.append(f"{name}_bucket{format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{format_labels(labels)} {format_value(values[-1])}")
+            lines.append(f"{name}_count{format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# --- Middleware ------------------------------------------------------------
+
+class QueryCounter:
+    """``execute_wrapper`` adding up the queries of one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+UPLOAD_CONTENT_TYPES = ("multipart/form-data", "application/offset+octet-stream")
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        flusher.ensure_started()
+        queries = QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = (match.url_name or match.view_name) if match else UNMATCHED
+        labels = (("view", view),)
+        registry.observe("http_request_duration_seconds", labels, elapsed)
+        registry.observe("http_request_db_queries", labels, queries.count)
+        registry.observe("http_request_db_seconds", labels, queries.seconds)
+        registry.inc("http_responses_total", labels + (
+            ("method", request.method), ("status", f"{response.status_code // 100}xx")))
+        if request.content_type in UPLOAD_CONTENT_TYPES:
+            try:
+                size = int(request.META.get("CONTENT_LENGTH") or 0)
+            except ValueError:
+                size = 0
+            if size:
+                registry.inc("http_upload_bytes_total", labels, size)
+        return response
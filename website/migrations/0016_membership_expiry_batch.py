@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("website", "0015_alter_quotationguidelinefile_file"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BatchJobCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100, unique=True)),
+                ("run_date", models.DateField(blank=True, null=True)),
+                ("cursor", models.BigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="RenewalReminder",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "reminder_type",
+                    models.CharField(
+                        choices=[("upcoming", "Expiring Soon"), ("expired", "Expired")],
+                        max_length=20,
+                    ),
+                ),
+                ("end_date", models.DateField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("sent_at", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="membership",
+            index=models.Index(
+                fields=["membership_status", "end_date"],
+                name="membership_status_end_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="renewalreminder",
+            name="membership",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="renewal_reminders",
+                to="website.membership",
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="renewalreminder",
+            unique_together={("membership", "reminder_type", "end_date")},
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("website", "0019_storedblob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MediaOptimization",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("original_sha256", models.CharField(max_length=64, unique=True)),
+                ("original_name", models.CharField(max_length=255)),
+                ("category", models.CharField(max_length=100)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("optimized", "Optimized"),
+                            ("skipped", "Skipped"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "optimized_name",
+                    models.CharField(
+                        blank=True, db_index=True, max_length=255, null=True
+                    ),
+                ),
+                ("original_size", models.BigIntegerField(blank=True, null=True)),
+                ("optimized_size", models.BigIntegerField(blank=True, null=True)),
+                (
+                    "original_file",
+                    models.FileField(
+                        blank=True, max_length=255, null=True, upload_to=""
+                    ),
+                ),
+                ("note", models.CharField(blank=True, max_length=255, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("processed_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["status", "id"], name="mediaopt_status_idx")
+                ],
+            },
+        ),
+    ]
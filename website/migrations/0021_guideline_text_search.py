@@ -0,0 +1,143 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:15
+
+import django.db.models.deletion
+from django.db import OperationalError, migrations, models
+
+FTS_TABLE = "website_guidelinetextpage_fts"
+
+CREATE_FTS = [
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        text,
+        content='website_guidelinetextpage',
+        content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    f"""
+    CREATE TRIGGER website_guidelinetextpage_fts_insert
+    AFTER INSERT ON website_guidelinetextpage BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER website_guidelinetextpage_fts_delete
+    AFTER DELETE ON website_guidelinetextpage BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER website_guidelinetextpage_fts_update
+    AFTER UPDATE ON website_guidelinetextpage BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+]
+
+DROP_FTS = [
+    "DROP TRIGGER IF EXISTS website_guidelinetextpage_fts_insert",
+    "DROP TRIGGER IF EXISTS website_guidelinetextpage_fts_delete",
+    "DROP TRIGGER IF EXISTS website_guidelinetextpage_fts_update",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def create_fts_index(apps, schema_editor):
+    # Other databases (or SQLite builds without FTS5) fall back to a
+    # plain substring search over the pages table
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    try:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+            cursor.execute("DROP TABLE temp.fts5_probe")
+    except OperationalError:
+        return
+    for statement in CREATE_FTS:
+        schema_editor.execute(statement)
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for statement in DROP_FTS:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("website", "0020_mediaoptimization"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="quotationguidelinefile",
+            name="file",
+            field=models.FileField(
+                blank=True, db_index=True, null=True, upload_to="quotation_guidelines/"
+            ),
+        ),
+        migrations.CreateModel(
+            name="GuidelineText",
+            fields=[
+                (
+                    "sha256",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                ("file_name", models.CharField(max_length=255)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("indexed", "Indexed"),
+                            ("unsupported", "Unsupported"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                    ),
+                ),
+                ("page_count", models.PositiveIntegerField(default=0)),
+                ("note", models.CharField(blank=True, max_length=255, null=True)),
+                ("indexed_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["status"], name="guidelinetext_status_idx")
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="GuidelineTextPage",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("page", models.PositiveIntegerField()),
+                ("text", models.TextField()),
+                (
+                    "document",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="pages",
+                        to="website.guidelinetext",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("document", "page")},
+            },
+        ),
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("website", "0021_guideline_text_search"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FxRate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("base_currency", models.CharField(max_length=10)),
+                ("quote_currency", models.CharField(max_length=10)),
+                ("effective_date", models.DateField()),
+                ("rate", models.DecimalField(decimal_places=8, max_digits=20)),
+                ("source", models.CharField(blank=True, max_length=100, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("base_currency", "quote_currency", "effective_date"),
+                        name="fxrate_pair_date_unique",
+                    )
+                ],
+            },
+        ),
+    ]
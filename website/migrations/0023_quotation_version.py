@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("website", "0022_fxrate"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="quotation",
+            name="version",
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("website", "0023_quotation_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="QuotedPriceRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("country", models.CharField(max_length=100)),
+                ("currency", models.CharField(max_length=10)),
+                ("month", models.DateField()),
+                ("count", models.PositiveIntegerField()),
+                ("min_price", models.DecimalField(decimal_places=2, max_digits=12)),
+                ("max_price", models.DecimalField(decimal_places=2, max_digits=12)),
+                ("mean_price", models.DecimalField(decimal_places=2, max_digits=12)),
+                ("p25_price", models.DecimalField(decimal_places=2, max_digits=12)),
+                ("median_price", models.DecimalField(decimal_places=2, max_digits=12)),
+                ("p75_price", models.DecimalField(decimal_places=2, max_digits=12)),
+                ("p90_price", models.DecimalField(decimal_places=2, max_digits=12)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="website.product",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["country", "month"], name="pricerollup_slice_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("product", "month", "country", "currency"),
+                        name="pricerollup_group_unique",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:10
+
+from django.db import migrations, models
+
+# Columns searched with istartswith / iexact in the admin (website/admin.py).
+# Django runs those lookups as "col LIKE 'term%'" on SQLite, which can only
+# use an index built with NOCASE, and as "UPPER(col::text) LIKE UPPER('term%')"
+# on PostgreSQL, which needs an expression index with text_pattern_ops.
+# The plain column indexes added in 0017 serve neither, so they are dropped.
+SEARCH_COLUMNS = [
+    ("membership_company_ci_idx", "website_membership", "company_name"),
+    ("membership_email_ci_idx", "website_membership", "email"),
+    ("payment_reference_ci_idx", "website_membershippayment", "payment_reference"),
+    ("product_name_ci_idx", "website_product", "product_name"),
+    ("product_reg_number_ci_idx", "website_productregistration", "registration_number"),
+    ("quotation_title_ci_idx", "website_quotation", "title"),
+    ("guideline_file_name_ci_idx", "website_quotationguidelinefile", "file_name"),
+]
+
+INDEX_SQL = {
+    "sqlite": 'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ("{column}" COLLATE NOCASE)',
+    "postgresql": 'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" '
+                  '(UPPER("{column}"::text) text_pattern_ops)',
+}
+
+
+def create_search_indexes(apps, schema_editor):
+    sql = INDEX_SQL.get(schema_editor.connection.vendor)
+    if sql is None:
+        return
+    for name, table, column in SEARCH_COLUMNS:
+        schema_editor.execute(sql.format(name=name, table=table, column=column))
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor not in INDEX_SQL:
+        return
+    for name, _, _ in SEARCH_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("website", "0024_quotedpricerollup"),
+    ]
+
+    operations = [
+        # Dropping the old indexes rebuilds the tables on SQLite, which would
+        # also drop indexes created by raw SQL, so it has to come first
+        migrations.AlterField(
+            model_name="membership",
+            name="company_name",
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AlterField(
+            model_name="membership",
+            name="email",
+            field=models.EmailField(max_length=254),
+        ),
+        migrations.AlterField(
+            model_name="membershippayment",
+            name="payment_reference",
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AlterField(
+            model_name="product",
+            name="product_name",
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AlterField(
+            model_name="productregistration",
+            name="registration_number",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name="quotation",
+            name="title",
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AlterField(
+            model_name="quotationguidelinefile",
+            name="file_name",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
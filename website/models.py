@@ -1,4 +1,8 @@
+import uuid
+
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 # Create your models here.
@@ -203,6 +207,12 @@ class Membership(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["membership_status", "end_date"],
+                         name="membership_status_end_idx"),
+        ]
+
     def __str__(self):
         return f"{self.company_name} - {self.membership_type}"
 
@@ -302,6 +312,35 @@ class MembershipPayment(models.Model):
         return f"{self.membership.company_name} - {self.amount} {self.currency}"
 
 
+class RenewalReminder(models.Model):
+    REMINDER_TYPES = (
+        ("upcoming", "Expiring Soon"),
+        ("expired", "Expired"),
+    )
+
+    membership = models.ForeignKey(
+        Membership, on_delete=models.CASCADE, related_name="renewal_reminders"
+    )
+    reminder_type = models.CharField(max_length=20, choices=REMINDER_TYPES)
+    end_date = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        unique_together = ("membership", "reminder_type", "end_date")
+
+    def __str__(self):
+        return f"{self.membership_id} - {self.reminder_type} ({self.end_date})"
+
+
+class StaleVersionError(Exception):
+    """The row was changed by someone else since the caller read it."""
+
+
+class InvalidStatusTransition(ValueError):
+    pass
+
+
 class Quotation(models.Model):
     STATUS_CHOICES = (
         ("pending", "Pending"),
@@ -311,6 +350,15 @@ class Quotation(models.Model):
         ("rejected", "Rejected"),
     )
 
+    # Allowed status changes; accepted is final
+    STATUS_TRANSITIONS = {
+        "pending": ("under_review", "rejected"),
+        "under_review": ("pending", "sent", "rejected"),
+        "sent": ("accepted", "rejected", "under_review"),
+        "accepted": (),
+        "rejected": ("pending",),
+    }
+
     CURRENCY_CHOICES = (
         ("INR", "INR"),
         ("USD", "USD"),
@@ -330,12 +378,63 @@ class Quotation(models.Model):
     status = models.CharField(
         max_length=50, choices=STATUS_CHOICES, default="pending"
     )
+    # Bumped on every change made with compare_and_save()
+    version = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Quotation #{self.id} - {self.title}"
 
+    @property
+    def allowed_transitions(self):
+        return list(self.STATUS_TRANSITIONS.get(self.status, ()))
+
+    def compare_and_save(self, expected_version, fields=()):
+        """
+        Write ``fields`` with one ``UPDATE ... WHERE version = expected_version``
+        and bump the version. Raises StaleVersionError if the row has been
+        changed (or deleted) since that version was read.
+        """
+        self.updated_at = timezone.now()
+        values = {name: getattr(self, name) for name in fields
+                  if name not in ("version", "updated_at")}
+        updated = Quotation.objects.filter(
+            pk=self.pk, version=expected_version
+        ).update(version=F("version") + 1, updated_at=self.updated_at, **values)
+        if not updated:
+            raise StaleVersionError(
+                f"Quotation #{self.pk} is no longer at version {expected_version}")
+        self.version = expected_version + 1
+
+    def transition_to(self, status, expected_version=None):
+        """
+        Move to ``status`` if the state machine allows it. Pass the version
+        the caller saw to make sure the quotation hasn't changed since.
+        """
+        if expected_version is not None and expected_version != self.version:
+            raise StaleVersionError(
+                f"Quotation #{self.pk} is no longer at version {expected_version}")
+        if status not in self.STATUS_TRANSITIONS.get(self.status, ()):
+            raise InvalidStatusTransition(
+                f"A quotation can't go from {self.get_status_display()} to "
+                f"{dict(self.STATUS_CHOICES).get(status, status)}.")
+        previous = self.status
+        self.status = status
+        try:
+            self.compare_and_save(self.version, fields=["status"])
+        except StaleVersionError:
+            self.status = previous
+            raise
+
+
+def touch_quotation(quotation_id):
+    """
+    Bump the quotation's ``updated_at`` after a change to one of its items
+    or files, so its cached PDF (keyed by ``updated_at``) is rendered again.
+    """
+    Quotation.objects.filter(pk=quotation_id).update(updated_at=timezone.now())
+
 
 class QuotationItem(models.Model):
     CURRENCY_CHOICES = (
@@ -357,6 +456,15 @@ class QuotationItem(models.Model):
     def __str__(self):
         return f"{self.product.product_name}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        touch_quotation(self.quotation_id)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        touch_quotation(self.quotation_id)
+        return result
+
 
 class QuotationGuidelineFile(models.Model):
     quotation = models.ForeignKey(
@@ -364,12 +472,211 @@ class QuotationGuidelineFile(models.Model):
     )
     file_name = models.CharField(max_length=255, blank=True, null=True)
     file = models.FileField(
-        upload_to="quotation_guidelines/", null=True, blank=True)
+        upload_to="quotation_guidelines/", null=True, blank=True, db_index=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return self.file_name or self.file.name
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        touch_quotation(self.quotation_id)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        touch_quotation(self.quotation_id)
+        return result
+
+
+class GuidelineText(models.Model):
+    """Text extraction state of one guideline file, keyed by its content hash."""
+    STATUS_CHOICES = (
+        ("pending", "Pending"),
+        ("indexed", "Indexed"),
+        ("unsupported", "Unsupported"),
+        ("failed", "Failed"),
+    )
+
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    file_name = models.CharField(max_length=255)
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default="pending")
+    page_count = models.PositiveIntegerField(default=0)
+    note = models.CharField(max_length=255, blank=True, null=True)
+    indexed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status"], name="guidelinetext_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.file_name} ({self.status})"
+
+
+class GuidelineTextPage(models.Model):
+    """
+    Extracted text of one page. On SQLite the ``text`` column is mirrored
+    into an FTS5 index by triggers (see migration 0021).
+    """
+    document = models.ForeignKey(
+        GuidelineText, on_delete=models.CASCADE, related_name="pages")
+    page = models.PositiveIntegerField()
+    text = models.TextField()
+
+    class Meta:
+        unique_together = ("document", "page")
+
+    def __str__(self):
+        return f"{self.document_id} p.{self.page}"
+
+
+class UploadSession(models.Model):
+    """Server-side state of a resumable (chunked) file upload."""
+    TARGET_CHOICES = (
+        ("membership_document", "Membership Document"),
+        ("membership_payment", "Membership Payment"),
+    )
+
+    STATUS_CHOICES = (
+        ("uploading", "Uploading"),
+        ("completed", "Completed"),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="upload_sessions")
+    target = models.CharField(max_length=50, choices=TARGET_CHOICES)
+    file_name = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    metadata = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default="uploading")
+    object_id = models.BigIntegerField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.file_name} ({self.offset}/{self.total_size})"
+
+
+class StoredBlob(models.Model):
+    """A unique file in content-addressed storage and how many fields use it."""
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+
+class MediaOptimization(models.Model):
+    """
+    Queue entry and outcome of optimizing one uploaded file (by content).
+    ``original_file`` holds the untouched upload when the retention policy
+    for its ``category`` (the field's ``upload_to``) requires keeping it.
+    """
+    STATUS_CHOICES = (
+        ("pending", "Pending"),
+        ("optimized", "Optimized"),
+        ("skipped", "Skipped"),
+        ("failed", "Failed"),
+    )
+
+    original_sha256 = models.CharField(max_length=64, unique=True)
+    original_name = models.CharField(max_length=255)
+    category = models.CharField(max_length=100)
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default="pending")
+    optimized_name = models.CharField(
+        max_length=255, blank=True, null=True, db_index=True)
+    original_size = models.BigIntegerField(blank=True, null=True)
+    optimized_size = models.BigIntegerField(blank=True, null=True)
+    original_file = models.FileField(max_length=255, blank=True, null=True)
+    note = models.CharField(max_length=255, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "id"], name="mediaopt_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.original_name} ({self.status})"
+
+
+class BatchJobCheckpoint(models.Model):
+    """Progress marker so batch jobs can resume after a crash."""
+    name = models.CharField(max_length=100, unique=True)
+    run_date = models.DateField(blank=True, null=True)
+    cursor = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.cursor}"
+
+
+class FxRate(models.Model):
+    """
+    Exchange rate from ``base_currency`` to ``quote_currency``, in force
+    from ``effective_date`` until the pair's next rate. Loaded offline with
+    ``manage.py load_fx_rates``.
+    """
+    base_currency = models.CharField(max_length=10)
+    quote_currency = models.CharField(max_length=10)
+    effective_date = models.DateField()
+    rate = models.DecimalField(max_digits=20, decimal_places=8)
+    source = models.CharField(max_length=100, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["base_currency", "quote_currency", "effective_date"],
+                name="fxrate_pair_date_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.base_currency}/{self.quote_currency} {self.rate} from {self.effective_date}"
+
+
+class QuotedPriceRollup(models.Model):
+    """
+    Summary of the quoted prices of one product in one country, currency
+    and month (of the quotation's creation). Maintained by
+    ``manage.py refresh_price_rollups``; see ``analytics.py``.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    country = models.CharField(max_length=100)
+    currency = models.CharField(max_length=10)
+    month = models.DateField()
+    count = models.PositiveIntegerField()
+    min_price = models.DecimalField(max_digits=12, decimal_places=2)
+    max_price = models.DecimalField(max_digits=12, decimal_places=2)
+    mean_price = models.DecimalField(max_digits=12, decimal_places=2)
+    p25_price = models.DecimalField(max_digits=12, decimal_places=2)
+    median_price = models.DecimalField(max_digits=12, decimal_places=2)
+    p75_price = models.DecimalField(max_digits=12, decimal_places=2)
+    p90_price = models.DecimalField(max_digits=12, decimal_places=2)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "month", "country", "currency"],
+                name="pricerollup_group_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["country", "month"], name="pricerollup_slice_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} {self.country} {self.currency} {self.month:%Y-%m}"
+
 
 '''
 # ------------------------------------------------------------
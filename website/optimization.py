@@ -0,0 +1,223 @@
+"""
+Post-upload media optimization.
+
+Saving a payment proof, membership document or product document queues its
+content hash in ``MediaOptimization``. ``manage.py optimize_media`` (run from
+cron) works through the queue off the request path. It re-encodes images to
+a bounded size and quality with metadata stripped, and linearizes and
+recompresses PDFs. Every row that pointed at the original then points at the
+smaller file. The original is kept only when ``MEDIA_KEEP_ORIGINALS`` lists
+its upload directory.
+
+Images need Pillow; PDFs need pikepdf or the ``qpdf`` command. Files whose
+tool isn't installed are skipped.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .previews import preview_name
+from .storage import blob_sha256, file_extension
+
+# File fields whose uploads are optimized, by model label
+OPTIMIZE_FIELDS = {
+    "website.membershippayment": "payment_proof",
+    "website.membershipdocument": "file",
+    "website.productdocument": "file",
+}
+
+# GIFs are left alone: re-encoding would drop animation
+IMAGE_FORMATS = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG"}
+PDF_TIMEOUT = 120
+
+
+def queue_optimization(file, field):
+    """Add ``file`` to the optimization queue unless it was seen before."""
+    from .models import MediaOptimization
+
+    sha256 = blob_sha256(file.name) if file else None
+    if sha256 is None:
+        return
+    extension = file_extension(file.name)
+    if extension != ".pdf" and extension not in IMAGE_FORMATS:
+        return
+    # Already the output of an optimization
+    if MediaOptimization.objects.filter(optimized_name=file.name).exists():
+        return
+    MediaOptimization.objects.get_or_create(
+        original_sha256=sha256,
+        defaults={"original_name": file.name, "category": field.upload_to},
+    )
+
+
+def optimize_job(entry, temp_dir):
+    """Arguments for ``optimize_file`` for a queued ``MediaOptimization``."""
+    return (
+        default_storage.path(entry.original_name),
+        file_extension(entry.original_name),
+        temp_dir,
+        settings.MEDIA_OPTIMIZE_MAX_DIMENSION,
+        settings.MEDIA_OPTIMIZE_JPEG_QUALITY,
+    )
+
+
+def apply_result(entry, result):
+    """
+    Record the outcome of ``optimize_file`` and, when the file got smaller,
+    point every row using the original at the optimized copy.
+    """
+    temp_path, original_size, optimized_size, note = result
+    entry.original_size = original_size
+    entry.processed_at = timezone.now()
+    entry.note = note
+
+    min_size = original_size * (1 - settings.MEDIA_OPTIMIZE_MIN_SAVING)
+    if temp_path is None or optimized_size > min_size:
+        if temp_path is not None:
+            os.unlink(temp_path)
+            entry.note = note or "No significant saving"
+        entry.status = "skipped"
+        entry.save()
+        return
+
+    try:
+        with transaction.atomic():
+            optimized_name = default_storage.adopt(temp_path, entry.original_name)
+            replaced = 0
+            for model, field in optimized_model_fields():
+                replaced += model.objects.filter(
+                    **{field.attname: entry.original_name}
+                ).update(**{field.attname: optimized_name})
+
+            if replaced == 0:
+                # Every row using the file was deleted in the meantime
+                default_storage.delete(optimized_name)
+                entry.status = "skipped"
+                entry.note = "File is no longer used"
+                entry.save()
+                return
+
+            # adopt() took one reference; the original loses one per row,
+            # keeping one for original_file if the policy says so
+            default_storage.add_reference(optimized_name, replaced - 1)
+            keep = entry.category in settings.MEDIA_KEEP_ORIGINALS
+            for _ in range(replaced - 1 if keep else replaced):
+                default_storage.delete(entry.original_name)
+
+            entry.status = "optimized"
+            entry.optimized_name = optimized_name
+            entry.optimized_size = optimized_size
+            entry.original_file = entry.original_name if keep else None
+            entry.save()
+            transaction.on_commit(
+                lambda: copy_previews(entry.original_name, optimized_name))
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+
+def copy_previews(original_name, optimized_name):
+    """The optimized file looks the same, so reuse the original's previews."""
+    original, optimized = blob_sha256(original_name), blob_sha256(optimized_name)
+    for kind in ("preview", "thumbnail"):
+        source = default_storage.path(preview_name(original, kind))
+        destination = default_storage.path(preview_name(optimized, kind))
+        if os.path.exists(source) and not os.path.exists(destination):
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            try:
+                os.link(source, destination)
+            except FileExistsError:
+                pass
+
+
+def optimized_model_fields():
+    for label, field_name in OPTIMIZE_FIELDS.items():
+        model = apps.get_model(label)
+        yield model, model._meta.get_field(field_name)
+
+
+# --- Runs in a worker process: plain arguments, no ORM -----------------------
+
+def optimize_file(source, extension, temp_dir, max_dimension, jpeg_quality):
+    """
+    Write an optimized copy of ``source`` into ``temp_dir``.
+
+    Returns ``(temp_path, original_size, optimized_size, note)``;
+    ``temp_path`` is None when nothing was produced and ``note`` says why.
+    """
+    original_size = os.path.getsize(source)
+    fd, temp_path = tempfile.mkstemp(dir=temp_dir, suffix=extension)
+    os.close(fd)
+    try:
+        if extension == ".pdf":
+            note = optimize_pdf(source, temp_path)
+        else:
+            note = optimize_image(source, temp_path, IMAGE_FORMATS[extension],
+                                  max_dimension, jpeg_quality)
+    except Exception:
+        os.unlink(temp_path)
+        raise
+    if note is not None:
+        os.unlink(temp_path)
+        return None, original_size, None, note
+    return temp_path, original_size, os.path.getsize(temp_path), None
+
+
+def optimize_image(source, destination, image_format, max_dimension, jpeg_quality):
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return "Pillow is not installed"
+
+    with Image.open(source) as image:
+        if image_format == "JPEG":
+            image.draft("RGB", (max_dimension, max_dimension))
+        # Bake the EXIF orientation into the pixels before metadata is dropped
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_dimension, max_dimension))
+        if image_format == "JPEG":
+            image = image.convert("RGB")
+            # No exif/icc arguments: metadata is not carried over
+            image.save(destination, "JPEG", quality=jpeg_quality,
+                       optimize=True, progressive=True)
+        else:
+            image.save(destination, "PNG", optimize=True)
+    return None
+
+
+def optimize_pdf(source, destination):
+    try:
+        import pikepdf
+    except ImportError:
+        pikepdf = None
+
+    if pikepdf is not None:
+        with pikepdf.open(source) as pdf:
+            pdf.save(
+                destination,
+                linearize=True,
+                compress_streams=True,
+                recompress_flate=True,
+                object_stream_mode=pikepdf.ObjectStreamMode.generate,
+            )
+        return None
+
+    qpdf = shutil.which("qpdf")
+    if qpdf is None:
+        return "Neither pikepdf nor qpdf is installed"
+    result = subprocess.run(
+        [qpdf, "--linearize", "--object-streams=generate",
+         "--recompress-flate", "--compression-level=9", source, destination],
+        capture_output=True, timeout=PDF_TIMEOUT,
+    )
+    # Exit status 3 means the output was written with warnings
+    if result.returncode not in (0, 3):
+        raise RuntimeError(result.stderr.decode(errors="replace").strip())
+    return None
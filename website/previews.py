@@ -0,0 +1,167 @@
+"""
+First-page previews and thumbnails for uploaded documents.
+
+Previews are cached by content hash next to the blobs
+(``previews/<aa>/<sha256>.png`` and ``...-thumb.png``), so a file uploaded
+many times is rendered once and a cached file costs a single ``stat``.
+Rendering happens in the shared process pool (see ``tasks.py``).
+
+Both renderers are optional: images need Pillow and PDFs need poppler's
+``pdftoppm``. Without them no previews are made and the serializers return
+``null`` URLs.
+"""
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from .metrics import record_cache
+from .storage import blob_sha256, file_extension
+from .tasks import submit_on_commit
+
+logger = logging.getLogger(__name__)
+
+# File field that gets previews, by model label
+PREVIEW_FIELDS = {
+    "website.membershipdocument": "file",
+    "website.membershippayment": "payment_proof",
+    "website.productdocument": "file",
+    "website.quotationguidelinefile": "file",
+}
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif"}
+PDF_RENDER_TIMEOUT = 60
+
+# Content hashes queued in this process and not finished yet
+_pending = set()
+
+
+def preview_name(sha256, kind):
+    suffix = "-thumb" if kind == "thumbnail" else ""
+    return f"{settings.PREVIEW_DIR}{sha256[:2]}/{sha256}{suffix}.png"
+
+
+def cached_preview(file, kind):
+    """Storage name of the cached preview for ``file``, or None if there isn't one yet."""
+    sha256 = blob_sha256(file.name) if file else None
+    if sha256 is None:
+        return None
+    name = preview_name(sha256, kind)
+    found = default_storage.exists(name)
+    record_cache("previews", found)
+    return name if found else None
+
+
+def render_job(file_name):
+    """Arguments for ``render_previews``, or None if ``file_name`` can't have a preview."""
+    sha256 = blob_sha256(file_name)
+    if sha256 is None:
+        return None
+    extension = file_extension(file_name)
+    if extension != ".pdf" and extension not in IMAGE_EXTENSIONS:
+        return None
+    return (
+        default_storage.path(file_name),
+        extension,
+        default_storage.path(preview_name(sha256, "preview")),
+        default_storage.path(preview_name(sha256, "thumbnail")),
+        settings.PREVIEW_SIZE,
+        settings.THUMBNAIL_SIZE,
+    )
+
+
+def queue_previews(file):
+    """Render previews for ``file`` in the background unless they are cached."""
+    if not file:
+        return
+    job = render_job(file.name)
+    if job is None or os.path.exists(job[3]):
+        return
+    sha256 = blob_sha256(file.name)
+    if sha256 in _pending:
+        return
+    _pending.add(sha256)
+
+    def done(future):
+        _pending.discard(sha256)
+        if future.exception() is not None:
+            logger.error("Preview rendering failed for %s: %s",
+                         file.name, future.exception())
+
+    submit_on_commit(render_previews, *job, callback=done)
+
+
+# --- Runs in a worker process: plain arguments, no ORM -----------------------
+
+def render_previews(source, extension, preview_path, thumbnail_path,
+                    preview_size, thumbnail_size):
+    """
+    Write the preview and thumbnail PNGs for ``source``.
+
+    Returns "ready", "cached", "unsupported" or "unavailable" (the renderer
+    for this type isn't installed).
+    """
+    if os.path.exists(thumbnail_path):
+        return "cached"
+    os.makedirs(os.path.dirname(preview_path), exist_ok=True)
+
+    if extension == ".pdf":
+        return render_pdf(source, preview_path, thumbnail_path,
+                          preview_size, thumbnail_size)
+    if extension in IMAGE_EXTENSIONS:
+        return render_image(source, preview_path, thumbnail_path,
+                            preview_size, thumbnail_size)
+    return "unsupported"
+
+
+def render_image(source, preview_path, thumbnail_path, preview_size, thumbnail_size):
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return "unavailable"
+
+    with Image.open(source) as image:
+        # Let JPEG decode at a reduced scale instead of full resolution
+        image.draft("RGB", (preview_size, preview_size))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        image.thumbnail((preview_size, preview_size))
+        _save_png(image, preview_path)
+        image.thumbnail((thumbnail_size, thumbnail_size))
+        _save_png(image, thumbnail_path)
+    return "ready"
+
+
+def render_pdf(source, preview_path, thumbnail_path, preview_size, thumbnail_size):
+    pdftoppm = shutil.which("pdftoppm")
+    if pdftoppm is None:
+        return "unavailable"
+
+    # Thumbnail last: its presence marks the pair as done
+    for path, size in ((preview_path, preview_size),
+                       (thumbnail_path, thumbnail_size)):
+        directory = os.path.dirname(path)
+        with tempfile.TemporaryDirectory(dir=directory) as temp_dir:
+            prefix = os.path.join(temp_dir, "page")
+            subprocess.run(
+                [pdftoppm, "-png", "-f", "1", "-l", "1", "-singlefile",
+                 "-scale-to", str(size), source, prefix],
+                check=True, capture_output=True, timeout=PDF_RENDER_TIMEOUT,
+            )
+            os.replace(prefix + ".png", path)
+    return "ready"
+
+
+def _save_png(image, path):
+    # Write then rename so readers never see a half-written file
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".png")
+    try:
+        with os.fdopen(fd, "wb") as temp:
+            image.save(temp, "PNG", optimize=True)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
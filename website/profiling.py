@@ -0,0 +1,185 @@
+"""
+On-demand profiling of single requests.
+
+Staff send ``X-Profile: 1`` (or add ``?_profile=1``) to run one request
+under cProfile with every SQL query and its duration recorded. The normal
+response comes back with an ``X-Profile-Id`` header and the report is kept
+in REQUEST_PROFILE_DIR, to be downloaded from ``/api/profiles/<id>/`` as
+JSON (timings, queries, repeated queries, top functions) or with
+``?output=pstats`` for pstats/snakeviz. ``X-Profile: download`` returns the
+JSON report as an attachment instead of the response.
+
+Requests without the flag only cost a header lookup and a substring test;
+with REQUEST_PROFILING off the middleware isn't installed at all. Query
+parameters are not recorded, only the SQL with its placeholders.
+"""
+import cProfile
+import io
+import json
+import logging
+import marshal
+import os
+import pstats
+import re
+import secrets
+import tempfile
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+logger = logging.getLogger(__name__)
+
+HEADER = "HTTP_X_PROFILE"
+QUERY_FLAG = "_profile"
+DOWNLOAD = "download"
+TOP_FUNCTIONS = 60
+REPEATED_QUERIES = 10
+PROFILE_ID = re.compile(r"^\d{8}-\d{6}-[0-9a-f]{8}$")
+
+
+def profile_name(profile_id, output="json"):
+    extension = "prof" if output == "pstats" else "json"
+    return f"{settings.REQUEST_PROFILE_DIR}{profile_id}.{extension}"
+
+
+def requested_mode(request):
+    """``"store"``, ``"download"`` or None when the request isn't flagged."""
+    mode = request.META.get(HEADER)
+    if mode is None and QUERY_FLAG in request.META.get("QUERY_STRING", ""):
+        mode = request.GET.get(QUERY_FLAG)
+    if not mode or mode == "0":
+        return None
+    return DOWNLOAD if mode == DOWNLOAD else "store"
+
+
+def is_staff(request):
+    """Staff by session, or by API token (which only DRF views check)."""
+    user = getattr(request, "user", None)
+    if user is not None and user.is_staff:
+        return True
+    try:
+        authenticated = TokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return False
+    return bool(authenticated and authenticated[0].is_staff)
+
+
+class QueryRecorder:
+    """``execute_wrapper`` recording each query's SQL and duration."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                "sql": sql,
+                "ms": round((time.perf_counter() - started) * 1000, 3),
+                "many": many,
+                "database": context["connection"].alias,
+            })
+
+
+class RequestProfilingMiddleware:
+    def __init__(self, get_response):
+        if not settings.REQUEST_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = requested_mode(request)
+        if mode is None or not is_staff(request):
+            return self.get_response(request)
+        return self.profile(request, mode)
+
+    def profile(self, request, mode):
+        profiler = cProfile.Profile()
+        recorder = QueryRecorder()
+        started_at = timezone.now()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            started = time.perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            elapsed = time.perf_counter() - started
+
+        profile_id = f"{started_at:%Y%m%d-%H%M%S}-{secrets.token_hex(4)}"
+        profiler.create_stats()
+        # Before build_report: pstats.Stats takes the stats from the profiler
+        stats_dump = marshal.dumps(profiler.stats)
+        report = build_report(profile_id, request, response, profiler,
+                              recorder.queries, elapsed, started_at)
+        body = json.dumps(report, indent=1, default=str).encode()
+        logger.info("Request profiled", extra={
+            "profile_id": profile_id, "path": request.path,
+            "duration_ms": report["duration_ms"], "query_count": report["query_count"]})
+
+        if mode == DOWNLOAD:
+            response = HttpResponse(body, content_type="application/json")
+            response["Content-Disposition"] = f'attachment; filename="profile-{profile_id}.json"'
+            return response
+
+        store_profile(profile_id, body, stats_dump)
+        response["X-Profile-Id"] = profile_id
+        response["X-Profile-URL"] = reverse("request-profile", args=[profile_id])
+        return response
+
+
+def build_report(profile_id, request, response, profiler, queries, elapsed, started_at):
+    functions = io.StringIO()
+    pstats.Stats(profiler, stream=functions).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+    repeated = Counter(query["sql"] for query in queries)
+    return {
+        "id": profile_id,
+        "method": request.method,
+        "path": request.get_full_path(),
+        "status": response.status_code,
+        "started_at": started_at.isoformat(),
+        "duration_ms": round(elapsed * 1000, 3),
+        "query_count": len(queries),
+        "query_ms": round(sum(query["ms"] for query in queries), 3),
+        "repeated_queries": [
+            {"sql": sql, "count": count}
+            for sql, count in repeated.most_common(REPEATED_QUERIES) if count > 1
+        ],
+        "queries": queries,
+        "functions": functions.getvalue(),
+    }
+
+
+def store_profile(profile_id, report, stats):
+    """Write the report and pstats dump, keeping the newest REQUEST_PROFILE_KEEP."""
+    directory = default_storage.path(settings.REQUEST_PROFILE_DIR)
+    os.makedirs(directory, exist_ok=True)
+    for output, content in (("json", report), ("pstats", stats)):
+        path = default_storage.path(profile_name(profile_id, output))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as temp_file:
+            temp_file.write(content)
+        os.replace(temp_path, path)
+
+    # Ids start with their timestamp, so sorting them sorts by age
+    reports = sorted(name for name in os.listdir(directory) if name.endswith(".json"))
+    for name in reports[:max(0, len(reports) - settings.REQUEST_PROFILE_KEEP)]:
+        for extension in (".json", ".prof"):
+            try:
+                os.remove(os.path.join(directory, name[:-5] + extension))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,416 @@
+"""
+Downloadable quotation PDFs.
+
+A PDF is cached on disk per ``(quotation.id, quotation.updated_at)``
+(``quotation_pdfs/<id>/quotation-<id>-<updated_at>.pdf``), so any edit made
+through the API (which saves the quotation) or to one of its items or
+guideline files (which bumps ``updated_at``, admin edits included) yields a
+new file and cached files can be served as-is. Rendering happens in the shared process pool
+(see ``tasks.py``), or in bulk with ``manage.py render_quotation_pdfs``.
+
+The PDF is written with the standard library only: A4 pages of text in
+the PDF base fonts (Helvetica), which every viewer has built in.
+"""
+import logging
+import os
+import tempfile
+import zlib
+from collections import defaultdict
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .fx import convert
+from .metrics import record_cache
+from .tasks import submit_on_commit
+
+logger = logging.getLogger(__name__)
+
+# Quotation ids queued in this process and not finished yet
+_pending = set()
+
+
+def pdf_name(quotation):
+    stamp = quotation.updated_at.astimezone(dt_timezone.utc).strftime("%Y%m%d%H%M%S%f")
+    return f"{pdf_dir(quotation.id)}quotation-{quotation.id}-{stamp}.pdf"
+
+
+def pdf_dir(quotation_id):
+    return f"{settings.QUOTATION_PDF_DIR}{quotation_id}/"
+
+
+def cached_pdf(quotation):
+    """Storage name of the quotation's current PDF, or None if not rendered yet."""
+    name = pdf_name(quotation)
+    found = default_storage.exists(name)
+    record_cache("quotation_pdfs", found)
+    return name if found else None
+
+
+def quotation_document(quotation):
+    """
+    Everything the PDF shows, as plain data for the worker. ``quotation``
+    should come from ``QuotationSerializer.eager_load``.
+    """
+    items = []
+    totals = defaultdict(Decimal)
+    for item in quotation.items.all():
+        currency = item.currency or quotation.currency
+        if item.quoted_price is not None:
+            totals[currency] += item.quoted_price
+        items.append({
+            "product": item.product.product_name,
+            "category": item.product.get_category_display(),
+            "currency": currency,
+            "price": None if item.quoted_price is None else f"{item.quoted_price:,.2f}",
+            "quoted_by": item.quoted_by.username if item.quoted_by else "",
+            "remarks": item.remarks or "",
+        })
+
+    # Mixed currencies also get a grand total in the quotation's currency,
+    # at the rates of its creation date (as with_quotation_totals does).
+    # Rates come from the in-process table, so bulk rendering runs no
+    # query per quotation.
+    converted_total = None
+    if len(totals) > 1:
+        on_date = timezone.localdate(quotation.created_at)
+        converted = [convert(total, currency, quotation.currency, on_date)
+                     for currency, total in totals.items()]
+        if None not in converted:
+            converted_total = f"{sum(converted):,.2f}"
+
+    return {
+        "id": quotation.id,
+        "title": quotation.title,
+        "company": quotation.membership.company_name,
+        "country": quotation.country,
+        "currency": quotation.currency,
+        "status": quotation.get_status_display(),
+        "created": timezone.localtime(quotation.created_at).strftime("%d %b %Y"),
+        "updated": timezone.localtime(quotation.updated_at).strftime("%d %b %Y %H:%M"),
+        "description": quotation.description or "",
+        "authority": [
+            ("Department", quotation.authority_department or ""),
+            ("Website", quotation.authority_website or ""),
+            ("Contact", quotation.authority_contact_details or ""),
+        ],
+        "items": items,
+        "totals": [(currency, f"{total:,.2f}") for currency, total in sorted(totals.items())],
+        "converted_total": converted_total,
+        "guideline_files": [
+            guideline_file.file_name or os.path.basename(guideline_file.file.name)
+            for guideline_file in quotation.guideline_files.all()
+        ],
+    }
+
+
+def queue_pdf(quotation):
+    """Render the quotation's PDF in the background unless it is queued already."""
+    if quotation.id in _pending:
+        return
+    _pending.add(quotation.id)
+    quotation_id = quotation.id
+
+    def done(future):
+        _pending.discard(quotation_id)
+        if future.exception() is not None:
+            logger.error("PDF rendering failed for quotation %s: %s",
+                         quotation_id, future.exception())
+
+    submit_on_commit(render_quotation_pdf, quotation_document(quotation),
+                     default_storage.path(pdf_name(quotation)), callback=done)
+
+
+# --- Runs in a worker process: plain arguments, no ORM -----------------------
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 in points
+MARGIN = 50
+LINE = 1.35  # line height as a multiple of the font size
+
+# Column x positions of the items table
+COLUMNS = {"no": MARGIN, "product": MARGIN + 22, "category": MARGIN + 230,
+           "quoted_by": MARGIN + 330, "price_right": PAGE_WIDTH - MARGIN}
+
+
+def render_quotation_pdf(document, path):
+    """Write the PDF for ``document`` to ``path`` and drop older versions."""
+    pdf = PdfCanvas()
+    layout = QuotationLayout(pdf, document)
+    layout.draw()
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as temp:
+            temp.write(pdf.getvalue())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+    for name in os.listdir(directory):
+        if name.endswith(".pdf") and name != os.path.basename(path):
+            try:
+                os.unlink(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+    return path
+
+
+class QuotationLayout:
+    def __init__(self, pdf, document):
+        self.pdf = pdf
+        self.document = document
+        self.y = PAGE_HEIGHT - MARGIN
+
+    def draw(self):
+        document = self.document
+        self.heading(f"Quotation #{document['id']}", 18)
+        self.paragraph(document["title"], size=13, bold=True)
+        self.space(4)
+        for label, value in (
+            ("Company", document["company"]),
+            ("Country", document["country"]),
+            ("Currency", document["currency"]),
+            ("Status", document["status"]),
+            ("Created", document["created"]),
+            ("Last updated", document["updated"]),
+        ):
+            self.field(label, value)
+
+        if document["description"]:
+            self.section("Description")
+            self.paragraph(document["description"])
+
+        if any(value for _, value in document["authority"]):
+            self.section("Authority")
+            for label, value in document["authority"]:
+                if value:
+                    self.field(label, value)
+
+        self.section("Items")
+        self.items_table()
+
+        if document["guideline_files"]:
+            self.section("Guideline files")
+            for file_name in document["guideline_files"]:
+                self.paragraph(f"- {file_name}")
+
+        self.pdf.finish(footer=f"Quotation #{document['id']}")
+
+    # Building blocks
+
+    def ensure(self, height):
+        if self.y - height < MARGIN + 20:
+            self.pdf.new_page()
+            self.y = PAGE_HEIGHT - MARGIN
+
+    def space(self, points):
+        self.y -= points
+
+    def heading(self, text, size):
+        self.ensure(size * LINE)
+        self.y -= size
+        self.pdf.text(MARGIN, self.y, text, size, bold=True)
+        self.y -= size * (LINE - 1)
+
+    def section(self, title):
+        self.ensure(40)
+        self.space(10)
+        self.heading(title, 12)
+        self.pdf.line(MARGIN, self.y + 2, PAGE_WIDTH - MARGIN, self.y + 2)
+        self.space(4)
+
+    def paragraph(self, text, size=10, bold=False, x=MARGIN, width=None):
+        width = width or PAGE_WIDTH - MARGIN - x
+        for line in wrap(text, width, size):
+            self.ensure(size * LINE)
+            self.y -= size * LINE
+            self.pdf.text(x, self.y, line, size, bold=bold)
+
+    def field(self, label, value, size=10):
+        lines = wrap(value, PAGE_WIDTH - 2 * MARGIN - 100, size)
+        self.ensure(size * LINE)
+        self.y -= size * LINE
+        self.pdf.text(MARGIN, self.y, label, size, bold=True)
+        self.pdf.text(MARGIN + 100, self.y, lines[0], size)
+        for line in lines[1:]:
+            self.ensure(size * LINE)
+            self.y -= size * LINE
+            self.pdf.text(MARGIN + 100, self.y, line, size)
+
+    def items_table(self):
+        items = self.document["items"]
+        if not items:
+            self.paragraph("No items.")
+            return
+
+        self.table_header()
+        for number, item in enumerate(items, 1):
+            product_lines = wrap(item["product"], COLUMNS["category"] - COLUMNS["product"] - 8, 9)
+            remark_lines = wrap(item["remarks"], PAGE_WIDTH - MARGIN - COLUMNS["product"], 8) if item["remarks"] else []
+            height = len(product_lines) * 9 * LINE + len(remark_lines) * 8 * LINE + 4
+            if self.y - height < MARGIN + 20:
+                self.ensure(height + 40)
+                self.table_header()
+
+            self.y -= 9 * LINE
+            row_y = self.y
+            self.pdf.text(COLUMNS["no"], row_y, str(number), 9)
+            self.pdf.text(COLUMNS["category"], row_y, clip(item["category"], 95, 9), 9)
+            self.pdf.text(COLUMNS["quoted_by"], row_y, clip(item["quoted_by"], 80, 9), 9)
+            price = "-" if item["price"] is None else f"{item['currency']} {item['price']}"
+            self.pdf.text_right(COLUMNS["price_right"], row_y, price, 9)
+            self.pdf.text(COLUMNS["product"], row_y, product_lines[0], 9)
+            for line in product_lines[1:]:
+                self.y -= 9 * LINE
+                self.pdf.text(COLUMNS["product"], self.y, line, 9)
+            for line in remark_lines:
+                self.y -= 8 * LINE
+                self.pdf.text(COLUMNS["product"], self.y, line, 8, gray=True)
+            self.y -= 4
+
+        self.space(4)
+        self.pdf.line(MARGIN, self.y, PAGE_WIDTH - MARGIN, self.y)
+        for currency, total in self.document["totals"]:
+            self.ensure(10 * LINE)
+            self.y -= 10 * LINE
+            self.pdf.text(COLUMNS["quoted_by"], self.y, "Total", 10, bold=True)
+            self.pdf.text_right(COLUMNS["price_right"], self.y, f"{currency} {total}", 10, bold=True)
+        if self.document["converted_total"] is not None:
+            self.ensure(10 * LINE)
+            self.y -= 10 * LINE
+            self.pdf.text(COLUMNS["quoted_by"], self.y,
+                          f"Total in {self.document['currency']}", 10, bold=True)
+            self.pdf.text_right(
+                COLUMNS["price_right"], self.y,
+                f"{self.document['currency']} {self.document['converted_total']}", 10, bold=True)
+
+    def table_header(self):
+        self.ensure(9 * LINE * 2)
+        self.y -= 9 * LINE
+        for key, title in (("no", "#"), ("product", "Product"),
+                           ("category", "Category"), ("quoted_by", "Quoted by")):
+            self.pdf.text(COLUMNS[key], self.y, title, 9, bold=True)
+        self.pdf.text_right(COLUMNS["price_right"], self.y, "Price", 9, bold=True)
+        self.pdf.line(MARGIN, self.y - 3, PAGE_WIDTH - MARGIN, self.y - 3)
+        self.y -= 4
+
+
+def text_width(text, size):
+    # Average Helvetica glyph width; digits are exactly 0.556 em
+    return len(text) * size * 0.53
+
+
+def clip(text, width, size):
+    if text_width(text, size) <= width:
+        return text
+    return text[:max(0, int(width / (size * 0.53)) - 1)] + "…"
+
+
+def wrap(text, width, size):
+    """Split ``text`` into lines of at most ``width`` points (never empty)."""
+    max_chars = max(1, int(width / (size * 0.53)))
+    lines = []
+    for paragraph in str(text).splitlines() or [""]:
+        line = ""
+        for word in paragraph.split():
+            while len(word) > max_chars:
+                if line:
+                    lines.append(line)
+                    line = ""
+                lines.append(word[:max_chars])
+                word = word[max_chars:]
+            candidate = f"{line} {word}" if line else word
+            if len(candidate) > max_chars:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return lines or [""]
+
+
+class PdfCanvas:
+    """Minimal PDF writer: pages of text and lines in Helvetica."""
+
+    FONTS = {"F1": "Helvetica", "F2": "Helvetica-Bold"}
+
+    def __init__(self):
+        self.pages = []
+        self.new_page()
+
+    def new_page(self):
+        self.ops = []
+        self.pages.append(self.ops)
+
+    def text(self, x, y, text, size, bold=False, gray=False):
+        if not text:
+            return
+        font = "F2" if bold else "F1"
+        color = "0.4 g " if gray else ""
+        self.ops.append(
+            f"BT {color}/{font} {size} Tf {x:.2f} {y:.2f} Td ({escape(text)}) Tj ET"
+            + (" 0 g" if gray else ""))
+
+    def text_right(self, right, y, text, size, bold=False):
+        self.text(right - text_width(text, size), y, text, size, bold=bold)
+
+    def line(self, x1, y1, x2, y2):
+        self.ops.append(f"0.5 w 0.6 G {x1:.2f} {y1:.2f} m {x2:.2f} {y2:.2f} l S 0 G")
+
+    def finish(self, footer):
+        count = len(self.pages)
+        for number, ops in enumerate(self.pages, 1):
+            self.ops = ops
+            self.text(MARGIN, MARGIN - 20, footer, 8, gray=True)
+            self.text_right(PAGE_WIDTH - MARGIN, MARGIN - 20, f"Page {number} of {count}", 8)
+
+    def getvalue(self):
+        objects = [
+            b"<< /Type /Catalog /Pages 2 0 R >>",
+            None,  # page tree, filled in below
+        ]
+        font_refs = []
+        for name, base_font in self.FONTS.items():
+            objects.append(
+                f"<< /Type /Font /Subtype /Type1 /BaseFont /{base_font} "
+                f"/Encoding /WinAnsiEncoding >>".encode())
+            font_refs.append(f"/{name} {len(objects)} 0 R")
+        resources = f"<< /Font << {' '.join(font_refs)} >> >>"
+
+        page_refs = []
+        for ops in self.pages:
+            content = zlib.compress("\n".join(ops).encode("cp1252", errors="replace"))
+            objects.append(
+                f"<< /Length {len(content)} /Filter /FlateDecode >>\nstream\n".encode()
+                + content + b"\nendstream")
+            objects.append(
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                f"/Resources {resources} /Contents {len(objects)} 0 R >>".encode())
+            page_refs.append(f"{len(objects)} 0 R")
+        objects[1] = (f"<< /Type /Pages /Kids [{' '.join(page_refs)}] "
+                      f"/Count {len(page_refs)} >>").encode()
+
+        output = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(len(output))
+            output += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+        xref = len(output)
+        output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+        for offset in offsets:
+            output += f"{offset:010d} 00000 n \n".encode()
+        output += (f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+                   f"startxref\n{xref}\n%%EOF\n").encode()
+        return bytes(output)
+
+
+def escape(text):
+    # WinAnsi covers Latin-1 and a few symbols; anything else becomes "?"
+    text = text.encode("cp1252", errors="replace").decode("cp1252")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
@@ -0,0 +1,189 @@
+"""
+Full-text search over quotation guideline files.
+
+Saving a ``QuotationGuidelineFile`` queues its content hash in
+``GuidelineText``; ``manage.py index_guidelines`` extracts the text of
+queued PDFs and DOCX files page by page in a process pool and stores it in
+``GuidelineTextPage``. On SQLite those pages are indexed by FTS5 (kept in
+sync by triggers); other databases fall back to a substring search.
+
+Text is keyed by content hash, so re-uploading a file or attaching it to
+another quotation reuses the extracted text, and re-indexing only touches
+new hashes. PDF extraction needs pypdf or poppler's ``pdftotext``; DOCX is
+read with the standard library.
+"""
+import functools
+import io
+import re
+import shutil
+import subprocess
+import zipfile
+from xml.etree import ElementTree
+
+from django.db import connection, connections
+from django.db.models import Q
+
+from .storage import blob_sha256, file_extension
+
+FTS_TABLE = "website_guidelinetextpage_fts"
+SEARCH_LIMIT = 200
+SNIPPET_WORDS = 12
+PDF_TIMEOUT = 120
+DOCX_MAX_XML_SIZE = 50 * 1024 * 1024
+EXTRACT_EXTENSIONS = {".pdf", ".docx"}
+
+W_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def queue_text_extraction(file):
+    """Add ``file`` to the extraction queue unless its content was seen before."""
+    from .models import GuidelineText
+
+    sha256 = blob_sha256(file.name) if file else None
+    if sha256 is None or file_extension(file.name) not in EXTRACT_EXTENSIONS:
+        return
+    GuidelineText.objects.get_or_create(
+        sha256=sha256, defaults={"file_name": file.name})
+
+
+@functools.lru_cache(maxsize=None)
+def _fts_table_exists(alias):
+    # The table comes from a migration, so one look per database is enough
+    return FTS_TABLE in connections[alias].introspection.table_names()
+
+
+def fts_available():
+    return connection.vendor == "sqlite" and _fts_table_exists(connection.alias)
+
+
+def fts_query(query):
+    """Quote each search term so user input can't break the FTS5 syntax."""
+    terms = re.findall(r"\w+", query)
+    return " ".join(f'"{term}"' for term in terms)
+
+
+def search_pages(query, files=None, limit=SEARCH_LIMIT):
+    """
+    Return ``[(file_name, page, snippet), ...]`` for the pages matching
+    ``query``, best matches first. ``files`` (a ``QuotationGuidelineFile``
+    queryset) limits the search to the files the user may see; the filter
+    runs in the database before ranking, so ``limit`` applies to their hits.
+    """
+    if fts_available():
+        match = fts_query(query)
+        if not match:
+            return []
+        condition, params = "", []
+        if files is not None:
+            subquery, params = files.values("file").query.sql_with_params()
+            condition = f"AND t.file_name IN ({subquery})"
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT t.file_name, p.page,
+                       snippet({FTS_TABLE}, 0, '[', ']', '...', %s)
+                FROM {FTS_TABLE}
+                JOIN website_guidelinetextpage p ON p.id = {FTS_TABLE}.rowid
+                JOIN website_guidelinetext t ON t.sha256 = p.document_id
+                WHERE {FTS_TABLE} MATCH %s {condition}
+                ORDER BY bm25({FTS_TABLE})
+                LIMIT %s
+                """,
+                [SNIPPET_WORDS, match, *params, limit],
+            )
+            return cursor.fetchall()
+
+    from .models import GuidelineTextPage
+
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        return []
+    condition = Q()
+    for term in terms:
+        condition &= Q(text__icontains=term)
+    if files is not None:
+        condition &= Q(document__file_name__in=files.values("file"))
+    pages = (
+        GuidelineTextPage.objects.filter(condition)
+        .values_list("document__file_name", "page", "text")[:limit]
+    )
+    return [(name, page, make_snippet(text, terms[0])) for name, page, text in pages]
+
+
+def make_snippet(text, term):
+    words = text.split()
+    for i, word in enumerate(words):
+        if term.lower() in word.lower():
+            start = max(0, i - SNIPPET_WORDS // 2)
+            return " ".join(words[start:start + SNIPPET_WORDS])
+    return " ".join(words[:SNIPPET_WORDS])
+
+
+# --- Runs in a worker process: plain arguments, no ORM -----------------------
+
+def extract_text(source, extension):
+    """
+    Return ``(pages, note)``: the text of each page, or None and the reason
+    nothing could be extracted.
+    """
+    if extension == ".pdf":
+        return extract_pdf(source)
+    if extension == ".docx":
+        return extract_docx(source), None
+    return None, "Unsupported file type"
+
+
+def extract_pdf(source):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        PdfReader = None
+
+    if PdfReader is not None:
+        reader = PdfReader(source)
+        return [page.extract_text() or "" for page in reader.pages], None
+
+    pdftotext = shutil.which("pdftotext")
+    if pdftotext is None:
+        return None, "Neither pypdf nor pdftotext is installed"
+    result = subprocess.run(
+        [pdftotext, "-enc", "UTF-8", source, "-"],
+        check=True, capture_output=True, timeout=PDF_TIMEOUT,
+    )
+    # pdftotext ends every page with a form feed
+    pages = result.stdout.decode("utf-8", errors="replace").split("\f")
+    if pages and not pages[-1].strip():
+        pages.pop()
+    return pages, None
+
+
+def extract_docx(source):
+    """
+    Text of a DOCX file split at page breaks. DOCX has no fixed pages, so
+    explicit and last-rendered page breaks mark the boundaries.
+    """
+    with zipfile.ZipFile(source) as archive:
+        if archive.getinfo("word/document.xml").file_size > DOCX_MAX_XML_SIZE:
+            raise ValueError("Document is too large to index")
+        xml = archive.read("word/document.xml")
+
+    pages = [[]]
+    paragraph = []
+    for _, element in ElementTree.iterparse(io.BytesIO(xml)):
+        tag = element.tag
+        if tag == W_NAMESPACE + "t":
+            paragraph.append(element.text or "")
+        elif tag == W_NAMESPACE + "tab":
+            paragraph.append("\t")
+        elif (tag == W_NAMESPACE + "lastRenderedPageBreak"
+              or (tag == W_NAMESPACE + "br"
+                  and element.get(W_NAMESPACE + "type") == "page")):
+            if paragraph or pages[-1]:
+                pages[-1].append("".join(paragraph))
+                paragraph = []
+                pages.append([])
+        elif tag == W_NAMESPACE + "p":
+            pages[-1].append("".join(paragraph))
+            paragraph = []
+            element.clear()
+    return ["\n".join(lines) for lines in pages]
@@ -1,10 +1,20 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
-from .models import Registration, Product, ProductDocument, ProductRegistration, Membership, MembershipDocument, MembershipPayment, Quotation, QuotationItem, QuotationGuidelineFile
+from django.utils import timezone
+from django.db import models, transaction
+from django.db.models import Prefetch
+from .signals import verification_batch_completed
+from .upload_handlers import check_file_signature, read_file_head
+from .uploads import size_limit_text
+from .previews import cached_preview, queue_previews
+from .search import queue_text_extraction
+from .signing import signed_file_url
+from .models import Registration, Product, ProductDocument, ProductRegistration, Membership, MembershipDocument, MembershipPayment, Quotation, QuotationItem, QuotationGuidelineFile, UploadSession
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -151,10 +161,68 @@ class ResetPasswordSerializer(serializers.Serializer):
         return user
 
 
-class ProductDocumentSerializer(serializers.ModelSerializer):
+def signed_url(name, context):
+    url = signed_file_url(name)
+    request = context.get('request')
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def prime_related_cache(instance, **related):
+    """
+    Make ``instance.<name>.all()`` return the given objects without a
+    query, the way ``prefetch_related`` would.
+    """
+    cache = instance.__dict__.setdefault('_prefetched_objects_cache', {})
+    for name, objects in related.items():
+        queryset = getattr(instance, name).all()
+        queryset._result_cache = list(objects)
+        queryset._prefetch_done = True
+        cache[name] = queryset
+
+
+class SignedFileField(serializers.FileField):
+    """File field whose URL is signed and expiring (see ``signing.py``)."""
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        return signed_url(value.name, self.context)
+
+
+class SignedFileURLsMixin:
+    """Model serializers with this mixin emit signed URLs for every file field."""
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        models.FileField: SignedFileField,
+    }
+
+
+class PreviewURLField(serializers.ReadOnlyField):
+    """
+    Signed URL of the cached preview ("preview") or thumbnail ("thumbnail")
+    for a file field, or null while it is still being rendered.
+    """
+
+    def __init__(self, kind, **kwargs):
+        self.kind = kind
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        name = cached_preview(value, self.kind)
+        if name is None:
+            return None
+        return signed_url(name, self.context)
+
+
+class ProductDocumentSerializer(SignedFileURLsMixin, serializers.ModelSerializer):
+    preview_url = PreviewURLField('preview', source='file')
+    thumbnail_url = PreviewURLField('thumbnail', source='file')
+
     class Meta:
         model = ProductDocument
-        fields = ['id', 'document_name', 'file', 'uploaded_at']
+        fields = ['id', 'document_name', 'file', 'preview_url', 'thumbnail_url', 'uploaded_at']
         read_only_fields = ['uploaded_at']
 
 
@@ -181,7 +249,7 @@ class ProductSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
-class MembershipDocumentSerializer(serializers.ModelSerializer):
+class MembershipDocumentSerializer(SignedFileURLsMixin, serializers.ModelSerializer):
     # Add human-readable field names
     document_type_display = serializers.CharField(
         source='get_document_type_display', read_only=True)
@@ -189,12 +257,14 @@ class MembershipDocumentSerializer(serializers.ModelSerializer):
         source='get_verification_status_display', read_only=True)
     verified_by_username = serializers.CharField(
         source='verified_by.username', read_only=True)
+    preview_url = PreviewURLField('preview', source='file')
+    thumbnail_url = PreviewURLField('thumbnail', source='file')
 
     class Meta:
         model = MembershipDocument
         fields = [
             'id', 'membership', 'document_type', 'document_type_display', 'document_name', 'file',
-            'uploaded_at', 'remarks', 'verification_status', 'verification_status_display',
+            'preview_url', 'thumbnail_url', 'uploaded_at', 'remarks', 'verification_status', 'verification_status_display',
             'verified_at', 'verified_by', 'verified_by_username', 'verification_remarks'
         ]
         read_only_fields = [
@@ -286,10 +356,11 @@ class MembershipDocumentSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 "Please select a file to upload.")
 
-        # Check file size (limit to 10MB)
-        if hasattr(value, 'size') and value.size > 10 * 1024 * 1024:
+        # Check file size (limit from UPLOAD_MAX_FILE_SIZE)
+        if hasattr(value, 'size') and value.size > settings.UPLOAD_MAX_FILE_SIZE:
             raise serializers.ValidationError(
-                "File is too large. Please select a file smaller than 10MB."
+                "File is too large. Please select a file smaller than "
+                f"{size_limit_text(settings.UPLOAD_MAX_FILE_SIZE)}."
             )
 
         # Check file type (basic validation)
@@ -302,6 +373,12 @@ class MembershipDocumentSerializer(serializers.ModelSerializer):
                     f"File type not supported. Please upload one of: {', '.join(allowed_extensions)}"
                 )
 
+            # Check the content really is that type
+            signature_error = check_file_signature(
+                value.name, read_file_head(value))
+            if signature_error:
+                raise serializers.ValidationError(signature_error)
+
         return value
 
     def validate_remarks(self, value):
@@ -335,7 +412,7 @@ class MembershipDocumentSerializer(serializers.ModelSerializer):
         return attrs
 
 
-class MembershipPaymentSerializer(serializers.ModelSerializer):
+class MembershipPaymentSerializer(SignedFileURLsMixin, serializers.ModelSerializer):
     # Add human-readable field names
     method_display = serializers.CharField(
         source='get_method_display', read_only=True)
@@ -347,11 +424,13 @@ class MembershipPaymentSerializer(serializers.ModelSerializer):
         source='get_verification_status_display', read_only=True)
     verified_by_username = serializers.CharField(
         source='verified_by.username', read_only=True)
+    preview_url = PreviewURLField('preview', source='payment_proof')
+    thumbnail_url = PreviewURLField('thumbnail', source='payment_proof')
 
     class Meta:
         model = MembershipPayment
         fields = [
-            'id', 'membership', 'payment_proof', 'payment_date', 'payment_reference',
+            'id', 'membership', 'payment_proof', 'preview_url', 'thumbnail_url', 'payment_date', 'payment_reference',
             'amount', 'currency', 'currency_display', 'method', 'method_display',
             'status', 'status_display', 'verification_status', 'verification_status_display',
             'verified_at', 'verified_by', 'verified_by_username', 'verification_remarks',
@@ -467,10 +546,11 @@ class MembershipPaymentSerializer(serializers.ModelSerializer):
     def validate_payment_proof(self, value):
         """Validate payment proof file with friendly messages"""
         if value:
-            # Check file size (limit to 10MB)
-            if hasattr(value, 'size') and value.size > 10 * 1024 * 1024:
+            # Check file size (limit from UPLOAD_MAX_FILE_SIZE)
+            if hasattr(value, 'size') and value.size > settings.UPLOAD_MAX_FILE_SIZE:
                 raise serializers.ValidationError(
-                    "Payment proof file is too large. Please select a file smaller than 10MB."
+                    "Payment proof file is too large. Please select a file smaller than "
+                    f"{size_limit_text(settings.UPLOAD_MAX_FILE_SIZE)}."
                 )
 
             # Check file type
@@ -482,6 +562,12 @@ class MembershipPaymentSerializer(serializers.ModelSerializer):
                         f"File type not supported. Please upload one of: {', '.join(allowed_extensions)}"
                     )
 
+                # Check the content really is that type
+                signature_error = check_file_signature(
+                    value.name, read_file_head(value))
+                if signature_error:
+                    raise serializers.ValidationError(signature_error)
+
         return value
 
     def validate(self, attrs):
@@ -504,18 +590,198 @@ class MembershipPaymentSerializer(serializers.ModelSerializer):
         return attrs
 
 
+# ------------------------------------------------------------
+# BULK VERIFICATION SERIALIZERS
+# ------------------------------------------------------------
+
+class BulkVerificationItemSerializer(serializers.Serializer):
+    VERIFICATION_CHOICES = (
+        ("verified", "Verified"),
+        ("rejected", "Rejected"),
+    )
+
+    id = serializers.IntegerField(min_value=1)
+    verification_status = serializers.ChoiceField(
+        choices=VERIFICATION_CHOICES,
+        error_messages={
+            'invalid_choice': 'Please choose either verified or rejected'
+        })
+    verification_remarks = serializers.CharField(
+        required=False, allow_blank=True, allow_null=True, max_length=1000)
+
+
+class BulkVerificationSerializer(serializers.Serializer):
+    """
+    Verify or reject many documents / payments in one transaction.
+    The target model is passed in the context as ``model``.
+    """
+    MAX_ITEMS = 1000
+
+    items = BulkVerificationItemSerializer(many=True)
+
+    def validate_items(self, value):
+        if not value:
+            raise serializers.ValidationError(
+                "Please select at least one item to verify.")
+
+        if len(value) > self.MAX_ITEMS:
+            raise serializers.ValidationError(
+                f"Too many items. Please verify at most {self.MAX_ITEMS} items at a time.")
+
+        ids = [item['id'] for item in value]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError(
+                "Each item can only appear once per request.")
+
+        return value
+
+    def save(self):
+        model = self.context['model']
+        user = self.context['request'].user
+        items = self.validated_data['items']
+        now = timezone.now()
+
+        with transaction.atomic():
+            instances = {
+                obj.id: obj for obj in model.objects.select_for_update().filter(
+                    pk__in=[item['id'] for item in items])
+            }
+
+            results = []
+            updated = []
+            for item in items:
+                obj = instances.get(item['id'])
+                if obj is None:
+                    results.append({
+                        "id": item['id'],
+                        "success": False,
+                        "message": "Item not found."
+                    })
+                    continue
+
+                obj.verification_status = item['verification_status']
+                obj.verification_remarks = item.get('verification_remarks')
+                obj.verified_by = user
+                obj.verified_at = now
+                updated.append(obj)
+                results.append({
+                    "id": obj.id,
+                    "success": True,
+                    "verification_status": obj.verification_status,
+                })
+
+            if updated:
+                model.objects.bulk_update(
+                    updated,
+                    ['verification_status', 'verification_remarks',
+                     'verified_by', 'verified_at'],
+                    batch_size=500,
+                )
+                transaction.on_commit(
+                    lambda: verification_batch_completed.send(
+                        sender=model, instances=updated, verified_by=user))
+
+        return results
+
+
+# ------------------------------------------------------------
+# RESUMABLE UPLOAD SERIALIZERS
+# ------------------------------------------------------------
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    ALLOWED_EXTENSIONS = {
+        "membership_document": ['.pdf', '.doc', '.docx', '.jpg', '.jpeg', '.png', '.gif'],
+        "membership_payment": ['.pdf', '.jpg', '.jpeg', '.png', '.gif'],
+    }
+
+    chunk_size = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            'id', 'target', 'file_name', 'total_size', 'offset', 'metadata',
+            'status', 'object_id', 'chunk_size', 'created_at', 'updated_at'
+        ]
+        read_only_fields = [
+            'offset', 'status', 'object_id', 'created_at', 'updated_at'
+        ]
+        extra_kwargs = {
+            'target': {
+                'error_messages': {
+                    'required': 'Please select what this upload is for',
+                    'invalid_choice': 'Please select a valid upload target'
+                }
+            },
+            'total_size': {
+                'error_messages': {
+                    'required': 'Please provide the size of the file'
+                }
+            }
+        }
+
+    def get_chunk_size(self, obj):
+        return settings.UPLOAD_CHUNK_SIZE
+
+    def validate_total_size(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("The selected file is empty.")
+
+        if value > settings.UPLOAD_MAX_FILE_SIZE:
+            raise serializers.ValidationError(
+                "File is too large. Please select a file smaller than "
+                f"{size_limit_text(settings.UPLOAD_MAX_FILE_SIZE)}.")
+
+        return value
+
+    def validate(self, attrs):
+        allowed_extensions = self.ALLOWED_EXTENSIONS[attrs['target']]
+        file_extension = '.' + attrs['file_name'].split('.')[-1].lower()
+        if file_extension not in allowed_extensions:
+            raise serializers.ValidationError({
+                'file_name': f"File type not supported. Please upload one of: {', '.join(allowed_extensions)}"
+            })
+
+        return attrs
+
+
+def upload_metadata_serializer(target, data, membership):
+    """
+    Serializer for the non-file fields of an upload target, used to validate
+    metadata when a resumable upload starts and to create the row when it
+    completes.
+    """
+    serializer_class = {
+        "membership_document": MembershipDocumentSerializer,
+        "membership_payment": MembershipPaymentSerializer,
+    }[target]
+    data = dict(data or {})
+    data['membership'] = membership.id
+    serializer = serializer_class(data=data)
+    serializer.fields.pop(
+        'file' if target == "membership_document" else 'payment_proof')
+    return serializer
+
+
 # ------------------------------------------------------------
 # QUOTATION SERIALIZERS
 # ------------------------------------------------------------
 
-class QuotationGuidelineFileSerializer(serializers.ModelSerializer):
+class QuotationGuidelineFileSerializer(SignedFileURLsMixin, serializers.ModelSerializer):
+    # Writable so quotation updates can refer to existing files
+    id = serializers.IntegerField(required=False)
+    preview_url = PreviewURLField('preview', source='file')
+    thumbnail_url = PreviewURLField('thumbnail', source='file')
+
     class Meta:
         model = QuotationGuidelineFile
         fields = [
-            'id', 'quotation', 'file_name', 'file', 'uploaded_at'
+            'id', 'quotation', 'file_name', 'file', 'preview_url', 'thumbnail_url', 'uploaded_at'
         ]
         read_only_fields = ['uploaded_at']
         extra_kwargs = {
+            'quotation': {
+                'required': False  # Not required when used as nested serializer
+            },
             'file': {
                 'required': False,  # File is now optional
                 'allow_null': True,
@@ -536,10 +802,11 @@ class QuotationGuidelineFileSerializer(serializers.ModelSerializer):
         """Validate file upload with friendly messages"""
         # File is now optional, so only validate if provided
         if value:
-            # Check file size (limit to 10MB)
-            if hasattr(value, 'size') and value.size > 10 * 1024 * 1024:
+            # Check file size (limit from UPLOAD_MAX_FILE_SIZE)
+            if hasattr(value, 'size') and value.size > settings.UPLOAD_MAX_FILE_SIZE:
                 raise serializers.ValidationError(
-                    "File is too large. Please select a file smaller than 10MB."
+                    "File is too large. Please select a file smaller than "
+                    f"{size_limit_text(settings.UPLOAD_MAX_FILE_SIZE)}."
                 )
 
             # Check file type
@@ -552,6 +819,12 @@ class QuotationGuidelineFileSerializer(serializers.ModelSerializer):
                         f"File type not supported. Please upload one of: {', '.join(allowed_extensions)}"
                     )
 
+                # Check the content really is that type
+                signature_error = check_file_signature(
+                    value.name, read_file_head(value))
+                if signature_error:
+                    raise serializers.ValidationError(signature_error)
+
         return value
 
     def validate(self, attrs):
@@ -572,7 +845,48 @@ class QuotationGuidelineFileSerializer(serializers.ModelSerializer):
         return attrs
 
 
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Primary key field that resolves from rows preloaded in the context
+    (see ``QuotationItemListSerializer``), querying only for a miss.
+    """
+
+    def to_internal_value(self, data):
+        preloaded = self.context.get('preloaded', {}).get(
+            self.get_queryset().model, {})
+        try:
+            return preloaded[int(data)]
+        except (KeyError, TypeError, ValueError):
+            return super().to_internal_value(data)
+
+
+class QuotationItemListSerializer(serializers.ListSerializer):
+    """Loads the products and users of all items in one query each"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            preloaded = self.context.setdefault('preloaded', {})
+            for name, field in self.child.fields.items():
+                if not isinstance(field, PreloadedPrimaryKeyRelatedField):
+                    continue
+                ids = set()
+                for row in data:
+                    try:
+                        ids.add(int(row[name]))
+                    except (KeyError, TypeError, ValueError):
+                        pass
+                queryset = field.get_queryset()
+                preloaded.setdefault(queryset.model, {}).update(
+                    queryset.in_bulk(ids) if ids else {})
+        return super().to_internal_value(data)
+
+
 class QuotationItemSerializer(serializers.ModelSerializer):
+    # Writable so quotation updates can refer to existing items
+    id = serializers.IntegerField(required=False)
+    product = PreloadedPrimaryKeyRelatedField(queryset=Product.objects.all())
+    quoted_by = PreloadedPrimaryKeyRelatedField(
+        queryset=User.objects.all(), required=False, allow_null=True)
     product_name = serializers.CharField(
         source='product.product_name', read_only=True)
     product_category = serializers.CharField(
@@ -582,6 +896,7 @@ class QuotationItemSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = QuotationItem
+        list_serializer_class = QuotationItemListSerializer
         fields = [
             'id', 'quotation', 'product', 'product_name', 'product_category',
             'currency', 'quoted_price', 'quoted_by', 'quoted_by_username', 'remarks'
@@ -648,19 +963,35 @@ class QuotationSerializer(serializers.ModelSerializer):
     guideline_files = QuotationGuidelineFileSerializer(
         many=True, required=False)
 
+    allowed_transitions = serializers.ListField(
+        child=serializers.CharField(), read_only=True)
+
+    # Present when the queryset was annotated by fx.with_quotation_totals
+    total_amount = serializers.DecimalField(
+        max_digits=20, decimal_places=2, read_only=True, allow_null=True)
+    total_currency = serializers.CharField(read_only=True, allow_null=True)
+    total_complete = serializers.BooleanField(read_only=True, allow_null=True)
+
     class Meta:
         model = Quotation
         fields = [
             'id', 'membership', 'membership_company', 'country', 'currency', 'currency_display',
             'title', 'description', 'authority_department', 'authority_website',
             'authority_contact_details', 'status', 'status_display', 'created_at',
-            'updated_at', 'items', 'guideline_files'
+            'updated_at', 'version', 'allowed_transitions', 'items', 'guideline_files',
+            'total_amount', 'total_currency', 'total_complete'
         ]
         read_only_fields = [
             'created_at', 'updated_at', 'status_display', 'currency_display',
             'membership_company'
         ]
         extra_kwargs = {
+            'version': {
+                'required': False,  # Only needed (and then required) for updates
+                'error_messages': {
+                    'invalid': 'Please send the version of the quotation you last loaded'
+                }
+            },
             'membership': {
                 'error_messages': {
                     'required': 'Please select a membership',
@@ -697,6 +1028,24 @@ class QuotationSerializer(serializers.ModelSerializer):
             }
         }
 
+    @staticmethod
+    def eager_load(queryset):
+        """
+        Load everything this serializer reads in a fixed number of queries,
+        however many quotations and items there are.
+        """
+        return queryset.select_related('membership').only(
+            *(field.attname for field in Quotation._meta.concrete_fields),
+            'membership__company_name',
+        ).prefetch_related(
+            'items',
+            Prefetch('items__product', queryset=Product.objects.only(
+                'id', 'product_name', 'category')),
+            Prefetch('items__quoted_by', queryset=User.objects.only(
+                'id', 'username')),
+            'guideline_files',
+        )
+
     def validate_country(self, value):
         """Validate country with friendly messages"""
         if not value or not value.strip():
@@ -742,70 +1091,310 @@ class QuotationSerializer(serializers.ModelSerializer):
         return value
 
     def create(self, validated_data):
-        """Create quotation with atomic transaction for items and files"""
-        from django.db import transaction
-
+        """
+        Create quotation with atomic transaction for items and files.
+        Items and files are inserted with one bulk query each and kept on
+        the instance, so serializing the result needs no further queries.
+        """
         # Extract nested data
         items_data = validated_data.pop('items', [])
         guideline_files_data = validated_data.pop('guideline_files', [])
 
+        validated_data.pop('version', None)
+
         with transaction.atomic():
             # Create the quotation
             quotation = Quotation.objects.create(**validated_data)
 
-            # Create quotation items
+            items = []
             for item_data in items_data:
-                QuotationItem.objects.create(quotation=quotation, **item_data)
+                item_data.pop('id', None)
+                item_data.pop('quotation', None)
+                items.append(QuotationItem(quotation=quotation, **item_data))
+            items = QuotationItem.objects.bulk_create(items)
 
-            # Create guideline files
-            for file_data in guideline_files_data:
-                QuotationGuidelineFile.objects.create(
-                    quotation=quotation, **file_data)
+            guideline_files = self.create_guideline_files(
+                quotation, guideline_files_data)
 
+            prime_related_cache(
+                quotation, items=items, guideline_files=guideline_files)
             return quotation
 
     def update(self, instance, validated_data):
-        """Update quotation with atomic transaction for items and files"""
-        from django.db import transaction
-
+        """
+        Update quotation with atomic transaction for items and files.
+
+        Nested lists are applied as a diff against the existing rows, so
+        unchanged items keep their ids (and ``quoted_by`` and order links)
+        and the writes are proportional to what actually changed.
+        Leaving ``items`` or ``guideline_files`` out keeps them as they are.
+        ``version`` must match the stored one (optimistic locking).
+        """
         # Extract nested data
-        items_data = validated_data.pop('items', [])
-        guideline_files_data = validated_data.pop('guideline_files', [])
+        items_data = validated_data.pop('items', None)
+        guideline_files_data = validated_data.pop('guideline_files', None)
+
+        expected_version = validated_data.pop('version')
 
         with transaction.atomic():
-            # Update the quotation
+            # Update the quotation only if nobody changed it in between;
+            # raises StaleVersionError (and rolls back) otherwise
             for attr, value in validated_data.items():
                 setattr(instance, attr, value)
-            instance.save()
+            instance.compare_and_save(expected_version, fields=list(validated_data))
 
-            # Update quotation items (delete existing and create new ones)
             if items_data is not None:
-                instance.items.all().delete()
-                for item_data in items_data:
-                    QuotationItem.objects.create(
-                        quotation=instance, **item_data)
+                self.sync_items(instance, items_data)
 
-            # Update guideline files (delete existing and create new ones)
             if guideline_files_data is not None:
-                instance.guideline_files.all().delete()
-                for file_data in guideline_files_data:
-                    QuotationGuidelineFile.objects.create(
-                        quotation=instance, **file_data)
+                self.sync_guideline_files(instance, guideline_files_data)
 
             return instance
 
+    def validate_status(self, value):
+        """Status changes of existing quotations go through the state machine"""
+        if self.instance is not None and value != self.instance.status:
+            raise serializers.ValidationError(
+                "Status can't be edited here. Please use the quotation status endpoint.")
+        return value
+
+    def validate(self, attrs):
+        """
+        Updates must say which version they were based on. Nested rows
+        given by id must belong to the quotation being updated.
+        """
+        if self.instance is not None and attrs.get('version') is None:
+            raise serializers.ValidationError(
+                {'version': "Please send the version of the quotation you last loaded."})
+
+        for name in ('items', 'guideline_files'):
+            ids = [row['id'] for row in attrs.get(name) or [] if row.get('id')]
+            if not ids:
+                continue
+            if len(ids) != len(set(ids)):
+                raise serializers.ValidationError(
+                    {name: "The same entry appears more than once."})
+            existing = set()
+            if self.instance is not None:
+                existing = set(getattr(self.instance, name).filter(
+                    id__in=ids).values_list('id', flat=True))
+            unknown = sorted(set(ids) - existing)
+            if unknown:
+                raise serializers.ValidationError(
+                    {name: f"Entries not found on this quotation: {', '.join(map(str, unknown))}"})
+        return attrs
+
+    def sync_items(self, instance, items_data):
+        """Insert, update and delete items so they match ``items_data``"""
+        existing = {item.id: item for item in instance.items.all()}
+        by_product = {}
+        for item in existing.values():
+            by_product.setdefault(item.product_id, []).append(item)
+
+        # Explicit ids are matched first so a product match can't take them
+        claimed = {data['id'] for data in items_data if data.get('id')}
+        to_create, to_update, changed_fields, kept = [], [], set(), set()
+        for item_data in items_data:
+            item_data = dict(item_data)
+            item_data.pop('quotation', None)
+            item_id = item_data.pop('id', None)
+            if item_id:
+                item = existing[item_id]
+            else:
+                candidates = [candidate for candidate in by_product.get(item_data['product'].id, [])
+                              if candidate.id not in claimed]
+                item = candidates[0] if candidates else None
+
+            if item is None:
+                to_create.append(QuotationItem(quotation=instance, **item_data))
+                continue
+
+            claimed.add(item.id)
+            kept.add(item.id)
+            fields = [attr for attr, value in item_data.items()
+                      if getattr(item, attr) != value]
+            for attr in fields:
+                setattr(item, attr, item_data[attr])
+            if fields:
+                to_update.append(item)
+                changed_fields.update(fields)
+
+        stale = [item_id for item_id in existing if item_id not in kept]
+        if stale:
+            QuotationItem.objects.filter(id__in=stale).delete()
+        if to_update:
+            QuotationItem.objects.bulk_update(to_update, sorted(changed_fields))
+        if to_create:
+            QuotationItem.objects.bulk_create(to_create)
+
+    def sync_guideline_files(self, instance, files_data):
+        """
+        Insert, rename and delete guideline files so they match ``files_data``.
+        Entries without an id are new uploads; an entry with an id and a new
+        file replaces that row's file.
+        """
+        existing = {file.id: file for file in instance.guideline_files.all()}
+        to_create, to_rename, kept = [], [], set()
+        for file_data in files_data:
+            file_data = dict(file_data)
+            file_data.pop('quotation', None)
+            file_id = file_data.pop('id', None)
+            if not file_id:
+                to_create.append(file_data)
+                continue
+
+            guideline_file = existing[file_id]
+            kept.add(file_id)
+            new_file = file_data.get('file')
+            if new_file is not None and new_file != guideline_file.file:
+                # A new upload goes through save() to store the file and
+                # queue previews and indexing; save() also releases the old blob
+                guideline_file.file = new_file
+                guideline_file.file_name = file_data.get('file_name') or guideline_file.file_name
+                guideline_file.save()
+            elif 'file_name' in file_data and file_data['file_name'] != guideline_file.file_name:
+                guideline_file.file_name = file_data['file_name']
+                to_rename.append(guideline_file)
+
+        stale = [file_id for file_id in existing if file_id not in kept]
+        if stale:
+            # Queryset delete still sends post_delete, which releases the blobs
+            QuotationGuidelineFile.objects.filter(id__in=stale).delete()
+        if to_rename:
+            QuotationGuidelineFile.objects.bulk_update(to_rename, ['file_name'])
+        if to_create:
+            self.create_guideline_files(instance, to_create)
+
+    def create_guideline_files(self, quotation, files_data):
+        """Insert guideline files with one query and queue their processing"""
+        guideline_files = []
+        for file_data in files_data:
+            file_data.pop('id', None)
+            file_data.pop('quotation', None)
+            guideline_files.append(
+                QuotationGuidelineFile(quotation=quotation, **file_data))
+        if not guideline_files:
+            return []
+
+        # bulk_create stores the uploads but sends no post_save
+        guideline_files = QuotationGuidelineFile.objects.bulk_create(
+            guideline_files)
+        for guideline_file in guideline_files:
+            queue_previews(guideline_file.file)
+            queue_text_extraction(guideline_file.file)
+        return guideline_files
+
+
+class QuotationFanOutSerializer(QuotationSerializer):
+    """
+    The same quotation (fields, items and guideline files) for several
+    countries at once. Everything is inserted with one bulk query per table
+    and each uploaded file is stored once and shared by all the quotations.
+    """
+    MAX_COUNTRIES = 50
+
+    countries = serializers.ListField(
+        child=serializers.CharField(max_length=100),
+        min_length=1,
+        max_length=MAX_COUNTRIES,
+        write_only=True,
+        error_messages={
+            'required': 'Please select at least one country',
+            'empty': 'Please select at least one country',
+            'min_length': 'Please select at least one country',
+            'max_length': f'Please select at most {MAX_COUNTRIES} countries'
+        })
+
+    class Meta(QuotationSerializer.Meta):
+        fields = QuotationSerializer.Meta.fields + ['countries']
+        extra_kwargs = {
+            **QuotationSerializer.Meta.extra_kwargs,
+            'country': {'required': False}
+        }
+
+    def validate_countries(self, value):
+        """Validate each country like a single quotation's, dropping repeats"""
+        countries = []
+        for country in value:
+            country = self.validate_country(country)
+            if country.casefold() not in (seen.casefold() for seen in countries):
+                countries.append(country)
+        return countries
+
+    def create(self, validated_data):
+        """Create one quotation per country; returns the list of quotations"""
+        countries = validated_data.pop('countries')
+        items_data = validated_data.pop('items', [])
+        guideline_files_data = validated_data.pop('guideline_files', [])
+        validated_data.pop('country', None)
+        validated_data.pop('version', None)
+
+        with transaction.atomic():
+            quotations = Quotation.objects.bulk_create([
+                Quotation(country=country, **validated_data) for country in countries
+            ])
+
+            items = []
+            for item_data in items_data:
+                item_data.pop('id', None)
+                item_data.pop('quotation', None)
+                items.extend(QuotationItem(quotation=quotation, **item_data)
+                             for quotation in quotations)
+            QuotationItem.objects.bulk_create(items)
+
+            # The first quotation stores the uploads; the others point at
+            # the same blobs, each taking a reference so deleting one
+            # quotation leaves the file to the rest
+            first, others = quotations[0], quotations[1:]
+            guideline_files = self.create_guideline_files(first, guideline_files_data)
+            shared = []
+            for guideline_file in guideline_files:
+                if guideline_file.file and others:
+                    guideline_file.file.storage.add_reference(
+                        guideline_file.file.name, len(others))
+                shared.extend(
+                    QuotationGuidelineFile(quotation=quotation,
+                                           file_name=guideline_file.file_name,
+                                           file=guideline_file.file.name)
+                    for quotation in others)
+            QuotationGuidelineFile.objects.bulk_create(shared)
+
+            return quotations
+
+
+class QuotationStatusSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(
+        choices=Quotation.STATUS_CHOICES,
+        error_messages={
+            'invalid_choice': 'Please select a valid status'
+        })
+    version = serializers.IntegerField(
+        min_value=1,
+        error_messages={
+            'required': 'Please send the version of the quotation you last loaded'
+        })
+
 
 class MembershipSerializer(serializers.ModelSerializer):
     documents = MembershipDocumentSerializer(many=True, read_only=True)
     payments = MembershipPaymentSerializer(many=True, read_only=True)
 
+    # Present when the queryset was annotated by fx.with_membership_totals
+    quoted_total = serializers.DecimalField(
+        max_digits=20, decimal_places=2, read_only=True, allow_null=True)
+    paid_total = serializers.DecimalField(
+        max_digits=20, decimal_places=2, read_only=True, allow_null=True)
+    totals_currency = serializers.CharField(read_only=True, allow_null=True)
+    totals_complete = serializers.BooleanField(read_only=True, allow_null=True)
+
     class Meta:
         model = Membership
         fields = [
             'id', 'registration', 'company_name', 'email', 'phone',
             'country', 'state', 'district', 'city', 'address', 'pincode',
             'membership_type', 'payment_status', 'membership_status', 'start_date',
-            'end_date', 'remarks', 'created_at', 'updated_at', 'documents', 'payments'
+            'end_date', 'remarks', 'created_at', 'updated_at', 'documents', 'payments',
+            'quoted_total', 'paid_total', 'totals_currency', 'totals_complete'
         ]
         read_only_fields = ['created_at', 'updated_at']
         extra_kwargs = {
@@ -0,0 +1,113 @@
+import logging
+import shutil
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from .fx import clear_rate_cache
+from .optimization import OPTIMIZE_FIELDS, queue_optimization
+from .previews import PREVIEW_FIELDS, queue_previews
+from .quotation_pdf import pdf_dir
+from .search import queue_text_extraction
+from .storage import stored_file_fields
+
+logger = logging.getLogger(__name__)
+
+# Sent once per bulk verification batch (after the transaction commits)
+# with ``instances`` (the updated rows) and ``verified_by`` (the reviewer).
+verification_batch_completed = Signal()
+
+
+@receiver(verification_batch_completed)
+def log_verification_batch(sender, instances, verified_by, **kwargs):
+    """One audit record per bulk verification batch instead of one per row."""
+    counts = {}
+    for instance in instances:
+        counts[instance.verification_status] = counts.get(instance.verification_status, 0) + 1
+    logger.info("Verification batch completed", extra={
+        "model": sender._meta.label,
+        "verified_by": verified_by.pk,
+        "counts": counts,
+        "ids": [instance.pk for instance in instances],
+    })
+
+
+# FileFields kept in content-addressed storage, per model
+STORED_FILE_FIELDS = {}
+for model, field in stored_file_fields():
+    if hasattr(field.storage, "is_blob"):
+        STORED_FILE_FIELDS.setdefault(model, []).append(field)
+
+
+def release_stored_files(sender, instance, **kwargs):
+    """Drop the content-addressed storage references held by a deleted row."""
+    for field in STORED_FILE_FIELDS[sender]:
+        file = getattr(instance, field.attname)
+        if file and field.storage.is_blob(file.name):
+            field.storage.delete(file.name)
+
+
+def remember_replaced_files(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Note the stored files that this save() replaces with other ones."""
+    if raw or instance._state.adding:
+        return
+    fields = [field for field in STORED_FILE_FIELDS[sender]
+              if update_fields is None or field.name in update_fields]
+    if not fields:
+        return
+    stored = sender._base_manager.filter(pk=instance.pk).values_list(
+        *[field.attname for field in fields]).first()
+    if stored is None:
+        return
+    instance._replaced_files = [
+        (field, name) for field, name in zip(fields, stored)
+        if name and field.storage.is_blob(name)
+        and name != getattr(instance, field.attname).name
+    ]
+
+
+def release_replaced_files(sender, instance, raw=False, **kwargs):
+    """Release the files noted by ``remember_replaced_files`` once the row is saved."""
+    for field, name in instance.__dict__.pop("_replaced_files", ()):
+        field.storage.delete(name)
+
+
+for model in STORED_FILE_FIELDS:
+    pre_save.connect(remember_replaced_files, sender=model)
+    post_save.connect(release_replaced_files, sender=model)
+    post_delete.connect(release_stored_files, sender=model)
+
+
+def queue_file_previews(sender, instance, **kwargs):
+    queue_previews(getattr(instance, PREVIEW_FIELDS[sender._meta.label_lower]))
+
+
+for label in PREVIEW_FIELDS:
+    post_save.connect(queue_file_previews, sender=label)
+
+
+def queue_file_optimization(sender, instance, **kwargs):
+    field_name = OPTIMIZE_FIELDS[sender._meta.label_lower]
+    queue_optimization(getattr(instance, field_name), sender._meta.get_field(field_name))
+
+
+for label in OPTIMIZE_FIELDS:
+    post_save.connect(queue_file_optimization, sender=label)
+
+
+@receiver(post_save, sender="website.QuotationGuidelineFile")
+def queue_guideline_indexing(sender, instance, **kwargs):
+    queue_text_extraction(instance.file)
+
+
+@receiver([post_save, post_delete], sender="website.FxRate")
+def clear_fx_rate_cache(sender, **kwargs):
+    clear_rate_cache()
+
+
+@receiver(post_delete, sender="website.Quotation")
+def remove_quotation_pdfs(sender, instance, **kwargs):
+    path = default_storage.path(pdf_dir(instance.pk))
+    transaction.on_commit(lambda: shutil.rmtree(path, ignore_errors=True))
@@ -0,0 +1,59 @@
+"""
+Signed, expiring URLs for uploaded files.
+
+A URL carries the storage name, an expiry timestamp, the id of the key it
+was signed with, and an HMAC over name and expiry. Checking it needs only the
+settings, so downloads are served without touching the database.
+
+Keys live in ``FILE_URL_SIGNING_KEYS`` (id -> secret) and new URLs are signed
+with ``FILE_URL_SIGNING_KEY_ID``. To rotate, add a key, make it current, and
+drop the old one once ``FILE_URL_MAX_AGE`` has passed.
+"""
+import hmac
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils.crypto import salted_hmac
+
+SALT = "website.signing.file-url"
+
+
+def _signature(key_id, name, expires):
+    secret = settings.FILE_URL_SIGNING_KEYS[key_id]
+    return salted_hmac(SALT, f"{name}\n{expires}",
+                       secret=secret, algorithm="sha256").hexdigest()
+
+
+def signed_file_url(name, max_age=None):
+    """
+    Relative URL that serves the stored file ``name`` until it expires.
+
+    Expiry is rounded up to ``FILE_URL_EXPIRY_GRANULARITY`` so repeated
+    listings return the same URL and browsers can cache the download.
+    """
+    max_age = settings.FILE_URL_MAX_AGE if max_age is None else max_age
+    granularity = settings.FILE_URL_EXPIRY_GRANULARITY
+    expires = -(-(int(time.time()) + max_age) // granularity) * granularity
+    key_id = settings.FILE_URL_SIGNING_KEY_ID
+    query = urlencode({
+        "expires": expires,
+        "kid": key_id,
+        "sig": _signature(key_id, name, expires),
+    })
+    return f"{reverse('signed-file', args=[name])}?{query}"
+
+
+def verify_signed_file(name, expires, key_id, signature):
+    """Return True if the signature is valid for ``name`` and hasn't expired."""
+    if key_id not in settings.FILE_URL_SIGNING_KEYS:
+        return False
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return False
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(
+        _signature(key_id, name, expires), signature or "")
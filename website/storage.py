@@ -0,0 +1,191 @@
+"""
+Content-addressed file storage.
+
+Every file is stored once under ``blobs/<aa>/<bb>/<sha256><ext>`` no matter
+which ``upload_to`` directory or file name it was saved with, and
+``StoredBlob`` keeps a reference count per unique file. Saving a file that
+is already stored only bumps the count; deleting a reference only removes
+the file once nothing else points at it.
+
+FileFields keep working as before: the storage name returned by ``save()``
+is simply the blob path. Receivers in ``signals.py`` release a row's
+references when it is deleted or when a save replaces one of its files. Names outside ``blobs/`` (files saved before this
+storage was enabled) are handled like plain ``FileSystemStorage`` until
+``manage.py dedupe_media`` moves them over.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+
+BLOB_DIR = "blobs"
+HASH_BLOCK_SIZE = 64 * 1024
+
+
+def blob_name(sha256, extension):
+    return f"{BLOB_DIR}/{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}"
+
+
+def blob_sha256(name):
+    """Content hash encoded in a blob name, or None for other names."""
+    name = (name or "").replace("\\", "/")
+    if not name.startswith(BLOB_DIR + "/"):
+        return None
+    sha256 = os.path.splitext(os.path.basename(name))[0]
+    return sha256 if len(sha256) == 64 else None
+
+
+def file_extension(name):
+    return os.path.splitext(name)[1].lower()
+
+
+def stored_file_fields():
+    """Yield ``(model, field)`` for every FileField in the app."""
+    from django.apps import apps
+
+    for model in apps.get_app_config("website").get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField):
+                yield model, field
+
+
+def hash_file(path):
+    """Return the SHA-256 hex digest and size of the file at ``path``."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+            size += len(block)
+    return digest.hexdigest(), size
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def is_blob(self, name):
+        return name.replace("\\", "/").startswith(BLOB_DIR + "/")
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is decided by the content in _save(), and identical
+        # content is meant to share one file
+        return name
+
+    def _save(self, name, content):
+        """
+        Stream ``content`` to a temporary file, hashing it on the way, then
+        keep it as a new blob or drop it in favour of the existing copy.
+        """
+        temp_dir = self.path(f"{BLOB_DIR}/tmp")
+        os.makedirs(temp_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+
+        if hasattr(content, "seek") and content.seekable():
+            content.seek(0)
+        fd, temp_path = tempfile.mkstemp(dir=temp_dir)
+        try:
+            with os.fdopen(fd, "wb") as temp:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    temp.write(chunk)
+                    size += len(chunk)
+            return self._store(temp_path, digest.hexdigest(), size,
+                               file_extension(name))
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+    def adopt(self, path, name):
+        """
+        Add the file at ``path`` (on the same filesystem) without copying it
+        and return its storage name. ``name`` only supplies the extension.
+        The source file is left in place.
+        """
+        sha256, size = hash_file(path)
+        return self._store(path, sha256, size, file_extension(name))
+
+    def _store(self, source, sha256, size, extension):
+        """
+        Take a reference on the blob for ``sha256``, creating it from
+        ``source`` if needed.
+
+        The reference is taken in the caller's transaction, so it is undone
+        if the row that was going to use it is rolled back. A blob file
+        created for such a row is left for ``collect_orphaned_media``.
+        """
+        from .models import StoredBlob
+
+        updated = StoredBlob.objects.filter(pk=sha256).update(
+            ref_count=F("ref_count") + 1)
+        if not updated:
+            try:
+                with transaction.atomic():
+                    StoredBlob.objects.create(
+                        sha256=sha256, name=blob_name(sha256, extension),
+                        size=size, ref_count=1)
+            except IntegrityError:
+                # Stored concurrently by another request
+                StoredBlob.objects.filter(pk=sha256).update(
+                    ref_count=F("ref_count") + 1)
+        name = StoredBlob.objects.values_list(
+            "name", flat=True).get(pk=sha256)
+
+        # Checked after taking the reference, so a concurrent delete of the
+        # last reference can't remove the file underneath us
+        destination = self.path(name)
+        if not os.path.exists(destination):
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            try:
+                os.link(source, destination)
+            except FileExistsError:
+                pass
+            except OSError:
+                # Filesystem without hard links
+                shutil.copyfile(source, destination)
+            if self.file_permissions_mode is not None:
+                os.chmod(destination, self.file_permissions_mode)
+        return name
+
+    def add_reference(self, name, count=1):
+        """Take more references on an existing blob (e.g. when copying a FileField value)."""
+        from .models import StoredBlob
+
+        if self.is_blob(name):
+            StoredBlob.objects.filter(name=name).update(
+                ref_count=F("ref_count") + count)
+
+    def delete(self, name):
+        """Drop one reference, removing the file once nothing uses it."""
+        from .models import StoredBlob
+
+        if not name:
+            raise ValueError("The name must be given to delete().")
+        if not self.is_blob(name):
+            return super().delete(name)
+
+        with transaction.atomic():
+            try:
+                blob = StoredBlob.objects.select_for_update().get(name=name)
+            except StoredBlob.DoesNotExist:
+                return
+            if blob.ref_count > 1:
+                StoredBlob.objects.filter(pk=blob.pk).update(
+                    ref_count=F("ref_count") - 1)
+                return
+            sha256 = blob.pk
+            blob.delete()
+            transaction.on_commit(
+                lambda: self._remove_unreferenced(sha256, name))
+
+    def _remove_unreferenced(self, sha256, name):
+        from .models import StoredBlob
+
+        # Someone may have stored the same content again since the commit
+        if not StoredBlob.objects.filter(pk=sha256).exists():
+            super().delete(name)
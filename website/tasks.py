@@ -0,0 +1,63 @@
+"""
+Shared process pool for CPU-heavy work that shouldn't hold up a request
+(rendering previews and the like).
+
+Jobs are submitted after the surrounding transaction commits, so a worker
+never sees a file whose database row was rolled back. Functions run in a
+separate interpreter started with ``spawn``: they must be importable
+module-level functions that take plain arguments and don't touch the ORM.
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.BACKGROUND_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _lock:
+        _executor = None
+
+
+def submit(fn, *args, callback=None):
+    """Run ``fn(*args)`` in the pool now and return its future."""
+    try:
+        future = get_executor().submit(fn, *args)
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); start a fresh pool
+        _reset_executor()
+        future = get_executor().submit(fn, *args)
+    if callback is not None:
+        future.add_done_callback(callback)
+    return future
+
+
+def submit_on_commit(fn, *args, callback=None):
+    """Run ``fn(*args)`` in the pool once the current transaction commits."""
+    def run():
+        try:
+            submit(fn, *args, callback=callback)
+        except Exception:
+            logger.exception("Could not queue background job %s", fn.__name__)
+
+    transaction.on_commit(run)
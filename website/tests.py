@@ -1,3 +1,1655 @@
-from django.test import TestCase
+import errno
+import hashlib
+import io
+import json
+import logging
+import marshal
+import os
+import queue
+import shutil
+import tempfile
+import zipfile
+import zlib
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from django.http import UnreadablePostError
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .analytics import PriceIndex, suggest_price, summarize_numpy, summarize_python
+from .management.commands.collect_orphaned_media import Command as CollectCommand, external_sort
+from .management.commands.process_membership_expiry import Command as ExpiryCommand
+from .fx import clear_rate_cache, convert, get_rate, with_quotation_totals
+from .logconfig import REDACTED, JsonFormatter, QueueHandler, RedactingFilter, SamplingFilter
+from .metrics import flusher, registry
+from .models import (
+    BatchJobCheckpoint,
+    FxRate,
+    GuidelineText,
+    GuidelineTextPage,
+    InvalidStatusTransition,
+    MediaOptimization,
+    Membership,
+    MembershipDocument,
+    MembershipPayment,
+    Product,
+    ProductDocument,
+    Quotation,
+    QuotationGuidelineFile,
+    QuotationItem,
+    QuotedPriceRollup,
+    Registration,
+    RenewalReminder,
+    StaleVersionError,
+    StoredBlob,
+    UploadSession,
+    touch_quotation,
+)
+from . import previews
+from .previews import cached_preview, preview_name, queue_previews, render_job, render_previews
+from .quotation_pdf import cached_pdf, pdf_name, quotation_document, render_quotation_pdf
+from .search import search_pages
+from .serializers import (MembershipDocumentSerializer, QuotationFanOutSerializer,
+                          QuotationSerializer)
+from .signing import signed_file_url
+from .storage import blob_name, blob_sha256
+from .uploads import part_path, write_chunk
+
+PDF = b"%PDF-1.4\n%test\n"
+
+
+def make_user(username="alice", **kwargs):
+    return User.objects.create_user(
+        username, f"{username}@example.com", "pw-12345678", **kwargs)
+
+
+def make_membership(user):
+    registration = Registration.objects.create(
+        user=user, user_type="company", contact_number="1234567890",
+        country="India", state="KA", city="Bengaluru", pincode="560001")
+    return Membership.objects.create(
+        registration=registration, company_name=f"Acme {user.username}",
+        email=user.email, phone="1234567890", country="India", state="KA",
+        city="Bengaluru", pincode="560001")
+
+
+def make_document(membership, content=PDF, name="doc.pdf"):
+    return MembershipDocument.objects.create(
+        membership=membership, document_type="certificate_of_incorporation",
+        document_name=name, file=ContentFile(content, name=name))
+
+
+def make_product(name="Trichoderma viride"):
+    return Product.objects.create(
+        product_name=name, biocontrol_agent_name="x", biocontrol_agent_strain="y",
+        category="biocontrol", formulation="aqueous_suspension")
+
+
+def make_quotation(membership, title="Registration dossier", **kwargs):
+    return Quotation.objects.create(
+        membership=membership, country="India", currency="INR", title=title, **kwargs)
+
+
+def api_client(user=None):
+    client = APIClient()
+    if user is not None:
+        client.force_authenticate(user)
+    return client
+
+
+class MediaTestCase(TestCase):
+    """Runs with MEDIA_ROOT and METRICS_DIR in a temporary directory."""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, METRICS_DIR=f"{media_root}/metrics")
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # Cleanups run last-in first-out: the metrics flusher is stopped
+        # (waiting for a write in progress) before the directory is removed
+        self.addCleanup(flusher.stop)
+        self.media_root = media_root
+
+
+class BulkVerificationTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.staff = make_user("reviewer", is_staff=True)
+        self.membership = make_membership(make_user())
+        self.documents = [make_document(self.membership) for _ in range(3)]
+
+    def test_updates_all_rows_and_sends_one_signal(self):
+        items = [{"id": document.pk, "verification_status": "verified"}
+                 for document in self.documents[:2]]
+        items.append({"id": self.documents[2].pk, "verification_status": "rejected",
+                      "verification_remarks": "Blurry"})
+        items.append({"id": 999999, "verification_status": "verified"})
+
+        with self.assertLogs("website.signals", "INFO") as logs:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = api_client(self.staff).post(
+                    "/api/membership-documents/bulk-verify/", {"items": items},
+                    format="json")
+
+        self.assertEqual(response.status_code, 200, response.data)
+        results = {result["id"]: result["success"] for result in response.data["data"]}
+        self.assertEqual(results[999999], False)
+        statuses = dict(MembershipDocument.objects.values_list("pk", "verification_status"))
+        self.assertEqual(statuses[self.documents[2].pk], "rejected")
+        self.assertEqual(statuses[self.documents[0].pk], "verified")
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(logs.records[0].counts, {"verified": 2, "rejected": 1})
+
+    def test_requires_staff(self):
+        response = api_client(self.membership.registration.user).post(
+            "/api/membership-payments/bulk-verify/",
+            {"items": [{"id": 1, "verification_status": "verified"}]}, format="json")
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(MembershipPayment.objects.filter(verification_status="verified").exists())
+
+
+class MembershipExpiryTests(MediaTestCase):
+    TODAY = date(2026, 6, 1)
+
+    def setUp(self):
+        super().setUp()
+        self.expired = [self.member(f"old{n}", self.TODAY - timedelta(days=n + 1)) for n in range(3)]
+        self.expiring = self.member("soon", self.TODAY + timedelta(days=10))
+        self.current = self.member("current", self.TODAY + timedelta(days=200))
+
+    def member(self, username, end_date):
+        membership = make_membership(make_user(username))
+        membership.membership_status = "active"
+        membership.end_date = end_date
+        membership.save()
+        return membership
+
+    def run_job(self, *args):
+        call_command("process_membership_expiry", "--date", self.TODAY.isoformat(),
+                     "--chunk-size", "1", *args, stdout=StringIO())
+
+    def statuses(self):
+        return dict(Membership.objects.values_list("pk", "membership_status"))
+
+    def test_expires_and_queues_reminders_once(self):
+        self.run_job()
+        self.run_job("--restart")
+
+        statuses = self.statuses()
+        self.assertEqual({statuses[m.pk] for m in self.expired}, {"inactive"})
+        self.assertEqual(statuses[self.expiring.pk], "active")
+        self.assertEqual(statuses[self.current.pk], "active")
+        reminders = set(RenewalReminder.objects.values_list("membership_id", "reminder_type"))
+        self.assertEqual(reminders, {(m.pk, "expired") for m in self.expired}
+                         | {(self.expiring.pk, "upcoming")})
+
+    def test_rerun_after_a_crash_resumes_from_the_checkpoint(self):
+        expire_chunk = ExpiryCommand.expire_chunk
+        seen = []
+
+        def crash_on_second_chunk(command, chunk, today):
+            seen.append(chunk[0][0])
+            if len(seen) == 2:
+                raise RuntimeError("crash")
+            return expire_chunk(command, chunk, today)
+
+        with patch.object(ExpiryCommand, "expire_chunk", crash_on_second_chunk):
+            with self.assertRaises(RuntimeError):
+                self.run_job()
+        checkpoint = BatchJobCheckpoint.objects.get(name=ExpiryCommand.EXPIRE_JOB)
+        self.assertEqual(checkpoint.cursor, seen[0])
+
+        with patch.object(ExpiryCommand, "expire_chunk", crash_on_second_chunk):
+            self.run_job()
+        # The chunk committed before the crash is not processed again
+        self.assertEqual(seen.count(seen[0]), 1)
+        self.assertEqual({self.statuses()[m.pk] for m in self.expired}, {"inactive"})
+
+    def test_membership_renewed_mid_run_is_not_expired_or_reminded(self):
+        renewed = self.expired[0]
+        expire_chunk = ExpiryCommand.expire_chunk
+
+        def renew_first(command, chunk, today):
+            Membership.objects.filter(pk=renewed.pk).update(
+                end_date=self.TODAY + timedelta(days=365))
+            return expire_chunk(command, chunk, today)
+
+        with patch.object(ExpiryCommand, "expire_chunk", renew_first):
+            self.run_job()
+        self.assertEqual(self.statuses()[renewed.pk], "active")
+        self.assertFalse(RenewalReminder.objects.filter(
+            membership=renewed, reminder_type="expired").exists())
+        self.assertEqual(RenewalReminder.objects.filter(reminder_type="expired").count(), 2)
+
+
+class PerformanceAdminTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(make_user("admin", is_staff=True, is_superuser=True))
+        for name in ("Trichoderma viride", "trichoderma harzianum", "Bacillus subtilis"):
+            make_product(name)
+
+    def changelist(self, query):
+        response = self.client.get("/admin/website/product/", {"q": query})
+        self.assertEqual(response.status_code, 200)
+        return {product.product_name for product in response.context["cl"].result_list}
+
+    def test_search_is_a_case_insensitive_prefix_match(self):
+        self.assertEqual(self.changelist("TRICHO"),
+                         {"Trichoderma viride", "trichoderma harzianum"})
+        self.assertEqual(self.changelist("subtilis"), set())
+
+    def test_numeric_search_looks_up_the_primary_key(self):
+        product = Product.objects.get(product_name="Bacillus subtilis")
+        self.assertEqual(self.changelist(str(product.pk)), {"Bacillus subtilis"})
+
+    def test_numeric_payment_reference_is_found(self):
+        membership = make_membership(make_user())
+        payment = MembershipPayment.objects.create(
+            membership=membership, amount="100.00", currency="INR", method="upi",
+            payment_reference="412345678901")
+        response = self.client.get("/admin/website/membershippayment/",
+                                   {"q": "4123456"})
+        self.assertEqual(list(response.context["cl"].result_list), [payment])
+        response = self.client.get("/admin/website/membershippayment/",
+                                   {"q": str(payment.pk)})
+        self.assertEqual(list(response.context["cl"].result_list), [payment])
+
+    def test_search_uses_an_index(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("query plan checked on SQLite only")
+        queryset = Product.objects.filter(product_name__istartswith="tricho")
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            plan = " ".join(str(row) for row in cursor.fetchall())
+        self.assertIn("product_name_ci_idx", plan)
+
+    def test_searched_columns_have_only_the_search_index(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("indexes checked on SQLite only")
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, Product._meta.db_table)
+        indexes = [name for name, info in constraints.items()
+                   if info["index"] and info["columns"] == ["product_name"]]
+        self.assertEqual(indexes, ["product_name_ci_idx"])
+
+    def test_capped_count_is_flagged(self):
+        with patch("website.admin.EstimatedCountPaginator.max_count", 2):
+            response = self.client.get("/admin/website/product/")
+        self.assertEqual(response.status_code, 200)
+        messages = [str(message) for message in response.context["messages"]]
+        self.assertTrue(any("More than 2 rows match" in message for message in messages))
+
+
+def png_bytes(size=(1600, 800), color="red"):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class PreviewTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.document = make_document(make_membership(make_user()), content=png_bytes(),
+                                      name="scan.png")
+        self.addCleanup(previews._pending.clear)
+
+    def test_renders_preview_and_thumbnail_once(self):
+        job = render_job(self.document.file.name)
+        self.assertEqual(render_previews(*job), "ready")
+        with Image.open(job[2]) as preview, Image.open(job[3]) as thumbnail:
+            self.assertEqual(preview.size, (1024, 512))
+            self.assertEqual(thumbnail.size, (200, 100))
+        self.assertEqual(render_previews(*job), "cached")
+        self.assertEqual(cached_preview(self.document.file, "thumbnail"),
+                         preview_name(blob_sha256(self.document.file.name), "thumbnail"))
+
+    def test_only_stored_images_and_pdfs_get_previews(self):
+        self.assertIsNone(render_job("membership_documents/scan.png"))
+        self.assertIsNone(render_job(blob_name("a" * 64, ".docx")))
+        self.assertIsNone(cached_preview(self.document.file, "preview"))
+
+    def test_queueing_skips_pending_and_cached_files(self):
+        # Saving the document queued it already
+        self.assertIn(blob_sha256(self.document.file.name), previews._pending)
+        previews._pending.clear()
+        with patch("website.previews.submit_on_commit") as submit:
+            queue_previews(self.document.file)
+            queue_previews(self.document.file)
+        self.assertEqual(submit.call_count, 1)
+
+        previews._pending.clear()
+        render_previews(*render_job(self.document.file.name))
+        with patch("website.previews.submit_on_commit") as submit:
+            queue_previews(self.document.file)
+        submit.assert_not_called()
+
+
+@override_settings(MEDIA_OPTIMIZE_MAX_DIMENSION=200)
+class MediaOptimizationTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.membership = make_membership(make_user())
+        self.content = png_bytes(size=(800, 400))
+        self.documents = [make_document(self.membership, content=self.content, name="scan.png")
+                          for _ in range(2)]
+        self.original = self.documents[0].file.name
+
+    def optimize(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("optimize_media", "--workers", "1", stdout=StringIO())
+        return MediaOptimization.objects.get()
+
+    def test_uploads_are_queued_once_per_content(self):
+        entry = MediaOptimization.objects.get()
+        self.assertEqual((entry.original_name, entry.category, entry.status),
+                         (self.original, "membership_documents/", "pending"))
+        make_document(self.membership, content=b"not an image", name="notes.txt")
+        self.assertEqual(MediaOptimization.objects.count(), 1)
+
+    def test_rows_move_to_the_smaller_file(self):
+        entry = self.optimize()
+        self.assertEqual(entry.status, "optimized")
+        self.assertLess(entry.optimized_size, entry.original_size)
+        self.assertEqual(
+            set(MembershipDocument.objects.values_list("file", flat=True)),
+            {entry.optimized_name})
+        self.assertEqual(dict(StoredBlob.objects.values_list("name", "ref_count")),
+                         {entry.optimized_name: 2})
+        self.assertFalse(default_storage.exists(self.original))
+        with Image.open(default_storage.path(entry.optimized_name)) as image:
+            self.assertEqual(image.size, (200, 100))
+
+        # The optimized file isn't queued again
+        make_document(self.membership, content=default_storage.open(
+            entry.optimized_name).read(), name="again.png")
+        self.assertEqual(MediaOptimization.objects.count(), 1)
+
+    @override_settings(MEDIA_KEEP_ORIGINALS=["membership_documents/"])
+    def test_originals_are_kept_when_the_policy_says_so(self):
+        entry = self.optimize()
+        self.assertEqual(entry.original_file.name, self.original)
+        self.assertEqual(StoredBlob.objects.get(name=self.original).ref_count, 1)
+        self.assertTrue(default_storage.exists(self.original))
+
+    @override_settings(MEDIA_OPTIMIZE_MAX_DIMENSION=2000, MEDIA_OPTIMIZE_MIN_SAVING=0.99)
+    def test_small_savings_are_skipped(self):
+        entry = self.optimize()
+        self.assertEqual((entry.status, entry.note), ("skipped", "No significant saving"))
+        self.assertEqual(StoredBlob.objects.get(name=self.original).ref_count, 2)
+
+
+class SignedFileURLTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.document = make_document(make_membership(make_user()))
+        self.url = signed_file_url(self.document.file.name)
+
+    def get(self, url):
+        response = self.client.get(url)
+        if response.streaming:
+            response.body = b"".join(response.streaming_content)
+        return response
+
+    def test_valid_url_serves_the_file_without_queries(self):
+        with self.assertNumQueries(0):
+            response = self.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.body, PDF)
+        self.assertTrue(response["Cache-Control"].startswith("private, max-age="))
+
+    def test_url_is_stable_within_the_expiry_granularity(self):
+        self.assertEqual(signed_file_url(self.document.file.name), self.url)
+
+    def test_tampered_urls_are_rejected(self):
+        other = make_document(self.document.membership, content=PDF + b"other")
+        self.assertEqual(self.get(self.url.replace(
+            self.document.file.name, other.file.name)).status_code, 403)
+        self.assertEqual(self.get(self.url.replace("sig=", "sig=0")).status_code, 403)
+        self.assertEqual(self.get(self.url.replace("kid=default", "kid=old")).status_code, 403)
+
+    def test_expired_urls_are_rejected(self):
+        with patch("website.signing.time.time", return_value=0):
+            url = signed_file_url(self.document.file.name, max_age=60)
+        self.assertEqual(self.get(url).status_code, 403)
+
+    def test_rotated_keys_stay_valid_while_listed(self):
+        keys = {"old": "old-secret", "new": "new-secret"}
+        with override_settings(FILE_URL_SIGNING_KEYS=keys, FILE_URL_SIGNING_KEY_ID="old"):
+            url = signed_file_url(self.document.file.name)
+        with override_settings(FILE_URL_SIGNING_KEYS=keys, FILE_URL_SIGNING_KEY_ID="new"):
+            self.assertEqual(self.get(url).status_code, 200)
+        with override_settings(FILE_URL_SIGNING_KEYS={"new": "new-secret"},
+                               FILE_URL_SIGNING_KEY_ID="new"):
+            self.assertEqual(self.get(url).status_code, 403)
+
+    def test_paths_outside_media_are_not_served(self):
+        url = signed_file_url("../settings.py")
+        self.assertEqual(self.get(url).status_code, 404)
+
+
+class UploadSessionTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = make_user()
+        self.membership = make_membership(self.user)
+        self.client = api_client(self.user)
+
+    def start(self, content):
+        response = self.client.post("/api/uploads/", {
+            "target": "membership_document", "file_name": "proof.pdf",
+            "total_size": len(content),
+            "metadata": {"document_type": "certificate_of_incorporation",
+                         "document_name": "Proof"},
+        }, format="json")
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data["data"]["id"]
+
+    def send(self, session_id, data, offset):
+        return self.client.patch(
+            f"/api/uploads/{session_id}/", data,
+            content_type="application/offset+octet-stream",
+            HTTP_UPLOAD_OFFSET=str(offset))
+
+    def complete(self, session_id):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(f"/api/uploads/{session_id}/complete/")
+
+    def test_chunks_resume_from_the_stored_offset(self):
+        content = PDF + b"x" * 100
+        session_id = self.start(content)
+        self.assertEqual(self.send(session_id, content[:40], 0).status_code, 200)
+
+        response = self.send(session_id, content[40:], 0)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response["Upload-Offset"], "40")
+
+        response = self.send(session_id, content[40:], 40)
+        self.assertTrue(response.data["data"]["complete"])
+
+        response = self.complete(session_id)
+        self.assertEqual(response.status_code, 201, response.data)
+        document = MembershipDocument.objects.get()
+        self.assertEqual(document.file.read(), content)
+        session = UploadSession.objects.get(pk=session_id)
+        self.assertEqual((session.status, session.object_id), ("completed", document.pk))
+        self.assertFalse(os.path.exists(part_path(session)))
+
+    def test_incomplete_upload_cannot_be_completed(self):
+        content = PDF + b"x" * 100
+        session_id = self.start(content)
+        self.send(session_id, content[:50], 0)
+        response = self.complete(session_id)
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(MembershipDocument.objects.exists())
+
+    def test_completing_twice_creates_one_row(self):
+        session_id = self.start(PDF)
+        self.send(session_id, PDF, 0)
+        self.assertEqual(self.complete(session_id).status_code, 201)
+        response = self.complete(session_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["message"], "Upload already completed.")
+        self.assertEqual(MembershipDocument.objects.count(), 1)
+
+    def test_failed_complete_can_be_retried(self):
+        session_id = self.start(PDF)
+        self.send(session_id, PDF, 0)
+        with patch.object(MembershipDocumentSerializer, "save", side_effect=RuntimeError("boom")):
+            response = self.complete(session_id)
+        self.assertEqual(response.status_code, 500)
+        session = UploadSession.objects.get(pk=session_id)
+        self.assertEqual(session.status, "uploading")
+        self.assertTrue(os.path.exists(part_path(session)))
+
+        self.assertEqual(self.complete(session_id).status_code, 201)
+        self.assertEqual(MembershipDocument.objects.count(), 1)
+        # The failed attempt's blob reference was rolled back with it
+        self.assertEqual(StoredBlob.objects.get().ref_count, 1)
+
+    def test_disconnect_keeps_the_bytes_that_arrived(self):
+        content = PDF + b"x" * 100
+        session = UploadSession.objects.get(pk=self.start(content))
+
+        class Disconnecting(io.BytesIO):
+            def read(self, size=-1):
+                if self.tell():
+                    raise UnreadablePostError("connection reset")
+                return super().read(40)
+
+        self.assertEqual(write_chunk(session, Disconnecting(content), len(content)), 40)
+        self.assertEqual(UploadSession.objects.get(pk=session.pk).offset, 40)
+        with open(part_path(session), "rb") as part:
+            self.assertEqual(part.read(), content[:40])
+
+    def test_write_errors_are_not_swallowed(self):
+        session_id = self.start(PDF)
+
+        class FullDisk(io.BytesIO):
+            def write(self, data):
+                raise OSError(errno.ENOSPC, "No space left on device")
+
+        def fdopen(fd, mode):
+            os.close(fd)
+            return FullDisk()
+
+        with patch("website.uploads.os.fdopen", fdopen), \
+                self.assertLogs("website.views", "ERROR"):
+            response = self.send(session_id, PDF, 0)
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(UploadSession.objects.get(pk=session_id).offset, 0)
+
+    @override_settings(UPLOAD_MAX_FILE_SIZE=2 * 1024 * 1024)
+    def test_size_message_follows_the_setting(self):
+        response = self.client.post("/api/uploads/", {
+            "target": "membership_document", "file_name": "proof.pdf",
+            "total_size": 3 * 1024 * 1024,
+            "metadata": {"document_type": "certificate_of_incorporation",
+                         "document_name": "Proof"},
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("smaller than 2MB", str(response.data))
+
+    def test_other_users_cannot_touch_a_session(self):
+        session_id = self.start(PDF)
+        other = api_client(make_user("mallory"))
+        self.assertEqual(other.get(f"/api/uploads/{session_id}/").status_code, 404)
+        self.assertEqual(other.post(f"/api/uploads/{session_id}/complete/").status_code, 404)
+
+
+class UploadValidationTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = make_user()
+        self.membership = make_membership(self.user)
+
+    def upload(self, name, content):
+        return api_client(self.user).post(
+            f"/api/memberships/{self.membership.pk}/documents/", {
+                "document_type": "certificate_of_incorporation",
+                "document_name": "Proof",
+                "file": SimpleUploadedFile(name, content),
+            }, format="multipart")
+
+    def test_valid_upload_is_accepted(self):
+        response = self.upload("proof.pdf", PDF)
+        self.assertEqual(response.status_code, 201, response.data)
+
+    def test_mismatched_signature_is_rejected(self):
+        response = self.upload("proof.pdf", b"\x89PNG\r\n\x1a\n" + b"x" * 100)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("file", response.data["errors"])
+        self.assertFalse(MembershipDocument.objects.exists())
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=16)
+    def test_upload_spooled_to_disk_is_accepted(self):
+        response = self.upload("proof.pdf", PDF + b"x" * 100)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(MembershipDocument.objects.get().file.size, len(PDF) + 100)
+
+    @override_settings(UPLOAD_MAX_FILE_SIZE=64)
+    def test_oversized_file_is_rejected_while_streaming(self):
+        response = self.upload("proof.pdf", PDF + b"x" * 100)
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(MembershipDocument.objects.exists())
+
+    @override_settings(UPLOAD_MAX_FILE_SIZE=64, UPLOAD_MAX_REQUEST_SIZE=64)
+    def test_admin_uploads_are_not_validated(self):
+        self.client.force_login(make_user("admin", is_staff=True, is_superuser=True))
+        response = self.client.post("/admin/website/productdocument/add/", {
+            "product": make_product().pk,
+            "document_name": "Label",
+            "file": SimpleUploadedFile("label.txt", b"x" * 1000),
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(ProductDocument.objects.get().file.size, 1000)
+
+
+class ContentAddressedStorageTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.membership = make_membership(make_user())
+
+    def blob(self, document):
+        return StoredBlob.objects.filter(name=document.file.name).first()
+
+    def test_identical_content_is_stored_once(self):
+        first, second = make_document(self.membership), make_document(self.membership)
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertTrue(first.file.name.startswith("blobs/"))
+        self.assertEqual(self.blob(first).ref_count, 2)
+        self.assertEqual(StoredBlob.objects.count(), 1)
+
+    def test_deleting_rows_releases_references(self):
+        first, second = make_document(self.membership), make_document(self.membership)
+        path = first.file.path
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self.blob(second).ref_count, 1)
+        self.assertTrue(os.path.exists(path))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            MembershipDocument.objects.all().delete()
+        self.assertFalse(StoredBlob.objects.exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_replacing_a_file_on_save_releases_the_old_one(self):
+        document = make_document(self.membership)
+        old_name = document.file.name
+        document.file = ContentFile(PDF + b"v2", name="doc.pdf")
+        with self.captureOnCommitCallbacks(execute=True):
+            document.save()
+        self.assertFalse(StoredBlob.objects.filter(name=old_name).exists())
+        self.assertEqual(self.blob(document).ref_count, 1)
+
+    def test_saving_other_fields_keeps_references(self):
+        document = make_document(self.membership)
+        document.document_name = "Renamed"
+        document.save()
+        document.save(update_fields=["document_name"])
+        MembershipDocument.objects.get().save()
+        self.assertEqual(self.blob(document).ref_count, 1)
+
+    def test_rolled_back_save_takes_no_reference(self):
+        make_document(self.membership)
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                make_document(self.membership)
+                raise RuntimeError
+        self.assertEqual(StoredBlob.objects.get().ref_count, 1)
+
+    def test_concurrent_first_store_takes_both_references(self):
+        # Another request inserts the blob row after this one found none
+        sha256 = hashlib.sha256(PDF).hexdigest()
+        StoredBlob.objects.create(
+            sha256=sha256, name=blob_name(sha256, ".pdf"), size=len(PDF), ref_count=1)
+        update = QuerySet.update
+        calls = []
+
+        def update_before_the_insert(queryset, **kwargs):
+            calls.append(kwargs)
+            return 0 if len(calls) == 1 else update(queryset, **kwargs)
+
+        with patch.object(QuerySet, "update", update_before_the_insert):
+            document = make_document(self.membership)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.blob(document).ref_count, 2)
+        self.assertEqual(document.file.read(), PDF)
+
+    def test_release_receivers_only_cover_models_with_files(self):
+        from .signals import STORED_FILE_FIELDS
+
+        self.assertIn(MembershipDocument, STORED_FILE_FIELDS)
+        self.assertNotIn(Membership, STORED_FILE_FIELDS)
+        membership = make_membership(make_user("bob"))
+        with self.assertNumQueries(2):
+            membership.save()
+            membership.save()
+
+
+class FileSignalTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.membership = make_membership(make_user())
+
+    def test_previews_are_queued_for_document_models_only(self):
+        with patch("website.signals.queue_previews") as queue_previews:
+            document = make_document(self.membership)
+            make_product()
+            self.membership.save()
+        queue_previews.assert_called_once_with(document.file)
+
+    def test_optimization_is_queued_for_uploaded_files_only(self):
+        with patch("website.signals.queue_optimization") as queue_optimization:
+            document = make_document(self.membership)
+            make_product()
+            self.membership.save()
+        queue_optimization.assert_called_once_with(
+            document.file, MembershipDocument._meta.get_field("file"))
+
+
+class GuidelineSearchTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.alice = make_user("alice")
+        self.bob = make_user("bob")
+        self.own = self.guideline(self.alice, b"own", "trichoderma dosage trichoderma")
+        # Ranks above the own page: the term is repeated more often
+        self.other = self.guideline(
+            self.bob, b"other", "trichoderma trichoderma trichoderma trichoderma")
+
+    def guideline(self, user, content, text):
+        membership = Membership.objects.filter(registration__user=user).first()
+        quotation = make_quotation(membership or make_membership(user))
+        guideline = QuotationGuidelineFile.objects.create(
+            quotation=quotation, file_name="guide.pdf",
+            file=ContentFile(PDF + content, name="guide.pdf"))
+        document = GuidelineText.objects.get(file_name=guideline.file.name)
+        document.status = "indexed"
+        document.save()
+        GuidelineTextPage.objects.create(document=document, page=1, text=text)
+        return guideline
+
+    def search(self, user):
+        response = api_client(user).get(
+            "/api/quotations/guidelines/search/", {"q": "trichoderma"})
+        self.assertEqual(response.status_code, 200, response.data)
+        return {entry["quotation_id"] for entry in response.data["data"]}
+
+    def test_members_only_find_their_own_files(self):
+        self.assertEqual(self.search(self.alice), {self.own.quotation_id})
+        self.assertEqual(self.search(self.bob), {self.other.quotation_id})
+
+    def test_staff_find_every_file(self):
+        staff = make_user("staff", is_staff=True)
+        self.assertEqual(self.search(staff),
+                         {self.own.quotation_id, self.other.quotation_id})
+
+    def test_ownership_is_applied_before_the_limit(self):
+        files = QuotationGuidelineFile.objects.filter(
+            quotation__membership__registration__user=self.alice)
+        self.assertEqual(search_pages("trichoderma", limit=1)[0][0], self.other.file.name)
+        self.assertEqual([name for name, _, _ in search_pages("trichoderma", files, limit=1)],
+                         [self.own.file.name])
+        with patch("website.search.fts_available", return_value=False):
+            self.assertEqual([name for name, _, _ in search_pages("trichoderma", files, limit=1)],
+                             [self.own.file.name])
+
+    def test_fts_table_is_looked_up_once(self):
+        search_pages("trichoderma")
+        with CaptureQueriesContext(connection) as queries:
+            search_pages("trichoderma")
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("sqlite_master", queries[0]["sql"])
+
+
+class OrphanedMediaTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.document = make_document(make_membership(make_user()))
+        self.orphan = self.write_file("membership_documents/lost.pdf", b"lost")
+        sha256 = hashlib.sha256(b"orphan blob").hexdigest()
+        self.orphan_blob = self.write_file(blob_name(sha256, ".pdf"), b"orphan blob")
+        StoredBlob.objects.create(sha256=sha256, name=self.orphan_blob, size=11)
+        old = os.path.getmtime(default_storage.path(self.document.file.name)) - 48 * 3600
+        for name in (self.document.file.name, self.orphan, self.orphan_blob):
+            os.utime(default_storage.path(name), (old, old))
+
+    def write_file(self, name, content):
+        path = default_storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as stored:
+            stored.write(content)
+        return name
+
+    def collect(self, *args):
+        out = StringIO()
+        call_command("collect_orphaned_media", "--run-size", "1", *args, stdout=out)
+        return out.getvalue()
+
+    def test_report_only_lists_orphans(self):
+        output = self.collect()
+        self.assertIn("Found 2 orphaned files", output)
+        self.assertTrue(default_storage.exists(self.orphan))
+        self.assertTrue(default_storage.exists(self.orphan_blob))
+
+    def test_delete_keeps_referenced_files(self):
+        output = self.collect("--delete")
+        self.assertIn("Deleted 2 orphaned files", output)
+        self.assertFalse(default_storage.exists(self.orphan))
+        self.assertFalse(default_storage.exists(self.orphan_blob))
+        self.assertFalse(StoredBlob.objects.filter(name=self.orphan_blob).exists())
+        self.assertTrue(default_storage.exists(self.document.file.name))
+
+    def test_recent_files_are_left_alone(self):
+        self.write_file("membership_documents/new.pdf", b"new")
+        self.collect("--delete")
+        self.assertTrue(default_storage.exists("membership_documents/new.pdf"))
+
+    def test_references_added_during_the_walk_are_kept(self):
+        # The document starts pointing at the orphan after the references were read
+        original = CollectCommand.referenced_names
+
+        def referenced_names(command):
+            yield from original(command)
+            MembershipDocument.objects.filter(pk=self.document.pk).update(file=self.orphan)
+
+        with patch.object(CollectCommand, "referenced_names", referenced_names):
+            self.collect("--delete")
+        self.assertTrue(default_storage.exists(self.orphan))
+
+    def test_external_sort_merges_runs_and_drops_duplicates(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            merged = list(external_sort(["c", "a", "b", "a", "c"], 2, temp_dir))
+        self.assertEqual(merged, ["a", "b", "c"])
+
+
+class MembershipDossierTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = make_user()
+        self.membership = make_membership(self.user)
+        self.document = make_document(self.membership)
+        self.payment = MembershipPayment.objects.create(
+            membership=self.membership, amount="5000.00", currency="INR",
+            method="bank_transfer", payment_proof=ContentFile(b"proof text", name="proof.txt"))
+        self.url = f"/api/memberships/{self.membership.id}/dossier/"
+
+    def download(self, user):
+        response = api_client(user).get(self.url)
+        self.assertEqual(response.status_code, 200)
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+        return archive, json.loads(archive.read("manifest.json"))
+
+    def test_owner_downloads_documents_payments_and_manifest(self):
+        archive, manifest = self.download(self.user)
+        document_path = f"documents/{self.document.id}_certificate_of_incorporation.pdf"
+        payment_path = f"payments/{self.payment.id}_{self.payment.payment_date}.txt"
+        self.assertEqual(archive.read(document_path), PDF)
+        self.assertEqual(archive.read(payment_path), b"proof text")
+        self.assertEqual(archive.getinfo(document_path).compress_type, zipfile.ZIP_STORED)
+        self.assertEqual(archive.getinfo(payment_path).compress_type, zipfile.ZIP_DEFLATED)
+        self.assertEqual(manifest["membership_id"], self.membership.id)
+        self.assertEqual([entry["path"] for entry in manifest["files"]],
+                         [document_path, payment_path])
+        self.assertEqual(manifest["files"][0]["sha256"], hashlib.sha256(PDF).hexdigest())
+
+    def test_other_members_get_404(self):
+        response = api_client(make_user("mallory")).get(self.url)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(api_client().get(self.url).status_code, 401)
+
+    def test_staff_can_download_any_dossier(self):
+        _, manifest = self.download(make_user("admin", is_staff=True))
+        self.assertEqual(len(manifest["files"]), 2)
+
+    def test_missing_files_are_flagged(self):
+        os.remove(default_storage.path(self.payment.payment_proof.name))
+        archive, manifest = self.download(self.user)
+        self.assertTrue(manifest["files"][1]["missing"])
+        self.assertEqual(len(archive.namelist()), 2)
+
+
+class QuotationQueryCountTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = make_user()
+        self.membership = make_membership(self.user)
+        self.client = api_client(self.user)
+        self.products = [make_product(f"Product {n}") for n in range(10)]
+
+    def create(self, item_count):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post("/api/quotations/", {
+                "country": "Peru", "currency": "USD", "title": "Bulk quote",
+                "items": [{"product": product.id, "quoted_price": "120.00"}
+                          for product in self.products[:item_count]],
+            }, format="json")
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data["items_count"], item_count)
+        return len(queries)
+
+    def read(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def add_quotation(self):
+        quotation = make_quotation(self.membership)
+        QuotationItem.objects.bulk_create(
+            QuotationItem(quotation=quotation, product=product, quoted_price="99.00",
+                          quoted_by=self.user)
+            for product in self.products)
+        return quotation
+
+    def test_create_queries_do_not_grow_with_items(self):
+        self.assertEqual(self.create(1), self.create(10))
+
+    def test_unknown_products_are_rejected(self):
+        response = self.client.post("/api/quotations/", {
+            "country": "Peru", "currency": "USD", "title": "Bad quote",
+            "items": [{"product": 999999, "quoted_price": "1.00"}],
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("items", response.data["errors"])
+        self.assertFalse(Quotation.objects.exists())
+
+    def test_read_queries_do_not_grow_with_quotations_or_items(self):
+        quotation = self.add_quotation()
+        urls = ["/api/quotations/", f"/api/quotations/{quotation.id}/",
+                f"/api/quotations/by-membership/{self.membership.id}/"]
+        before = [self.read(url) for url in urls]
+        for _ in range(3):
+            self.add_quotation()
+        self.assertEqual([self.read(url) for url in urls], before)
+
+    def test_eager_loaded_data_matches_the_plain_serializer(self):
+        quotation = self.add_quotation()
+        eager = QuotationSerializer.eager_load(Quotation.objects.filter(pk=quotation.pk)).get()
+        self.assertEqual(QuotationSerializer(eager).data,
+                         QuotationSerializer(Quotation.objects.get(pk=quotation.pk)).data)
+
+
+class QuotationUpdateTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.quotation = make_quotation(make_membership(make_user()))
+
+    def attach(self, content):
+        return QuotationGuidelineFile.objects.create(
+            quotation=self.quotation, file_name="guide.pdf",
+            file=ContentFile(PDF + content, name="guide.pdf"))
+
+    def replace_files(self, replacements):
+        serializer = QuotationSerializer(self.quotation, data={
+            "version": self.quotation.version,
+            "guideline_files": [
+                {"id": guideline.pk, "file": SimpleUploadedFile("new.pdf", PDF + content)}
+                for guideline, content in replacements
+            ],
+        }, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        with self.captureOnCommitCallbacks(execute=True):
+            serializer.save()
+
+    def refs(self):
+        return dict(StoredBlob.objects.values_list("name", "ref_count"))
+
+    def test_replacing_two_files_releases_both_old_blobs(self):
+        first, second = self.attach(b"a"), self.attach(b"b")
+        old_names = {first.file.name, second.file.name}
+        self.replace_files([(first, b"c"), (second, b"d")])
+
+        refs = self.refs()
+        self.assertFalse(old_names & set(refs))
+        new_names = set(QuotationGuidelineFile.objects.values_list("file", flat=True))
+        self.assertEqual(len(new_names), 2)
+        self.assertEqual({refs[name] for name in new_names}, {1})
+
+    def test_replacing_two_files_sharing_a_blob(self):
+        first, second = self.attach(b"a"), self.attach(b"a")
+        self.assertEqual(self.refs(), {first.file.name: 2})
+        self.replace_files([(first, b"c"), (second, b"c")])
+
+        new_name = QuotationGuidelineFile.objects.values_list("file", flat=True).first()
+        self.assertEqual(self.refs(), {new_name: 2})
+
+    def test_unchanged_files_keep_their_rows(self):
+        guideline = self.attach(b"a")
+        serializer = QuotationSerializer(self.quotation, data={
+            "version": self.quotation.version,
+            "guideline_files": [{"id": guideline.pk, "file_name": "renamed.pdf"}],
+        }, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        guideline.refresh_from_db()
+        self.assertEqual(guideline.file_name, "renamed.pdf")
+        self.assertEqual(self.refs(), {guideline.file.name: 1})
+
+
+class FxRateTests(MediaTestCase):
+    RATES = "date,base,quote,rate\n2020-01-01,USD,INR,80\n2024-01-01,usd,inr,83.5\n"
+
+    def setUp(self):
+        super().setUp()
+        clear_rate_cache()
+        self.addCleanup(clear_rate_cache)
+        self.user = make_user()
+        self.membership = make_membership(self.user)
+
+    def load(self, content, *args):
+        path = default_storage.path("rates.csv")
+        with open(path, "w") as csv_file:
+            csv_file.write(content)
+        call_command("load_fx_rates", path, *args, stdout=StringIO())
+
+    def make_priced_quotation(self):
+        quotation = make_quotation(self.membership)
+        product = make_product()
+        QuotationItem.objects.create(quotation=quotation, product=product, quoted_price="100.00")
+        QuotationItem.objects.create(quotation=quotation, product=product,
+                                     quoted_price="10.00", currency="USD")
+        return quotation
+
+    def test_load_adds_inverses_and_upserts(self):
+        self.load(self.RATES)
+        self.load(self.RATES)
+        self.assertEqual(FxRate.objects.count(), 4)
+        inverse = FxRate.objects.get(base_currency="INR", effective_date=date(2024, 1, 1))
+        self.assertEqual(inverse.rate, Decimal("0.01197605"))
+        self.assertEqual(inverse.source, "rates.csv")
+
+    def test_dry_run_and_invalid_files_save_nothing(self):
+        self.load(self.RATES, "--dry-run")
+        with self.assertRaisesMessage(CommandError, "Line 2: rate must be positive"):
+            self.load("date,base,quote,rate\n2020-01-01,USD,INR,-1\n")
+        with self.assertRaisesMessage(CommandError, "Missing CSV columns: rate"):
+            self.load("date,base,quote\n")
+        self.assertFalse(FxRate.objects.exists())
+
+    def test_rate_in_force_on_a_date(self):
+        self.load(self.RATES)
+        self.assertIsNone(get_rate("USD", "INR", date(2019, 12, 31)))
+        self.assertEqual(get_rate("USD", "INR", date(2023, 12, 31)), Decimal(80))
+        self.assertEqual(get_rate("USD", "INR", date(2024, 1, 1)), Decimal("83.5"))
+        self.assertEqual(get_rate("INR", "INR", date(2000, 1, 1)), Decimal(1))
+        self.assertEqual(convert(Decimal("2.50"), "USD", "INR", date(2025, 1, 1)),
+                         Decimal("208.75"))
+        self.assertIsNone(convert(Decimal(1), "EUR", "INR", date(2025, 1, 1)))
+
+    def test_saving_a_rate_refreshes_the_cache(self):
+        self.load(self.RATES)
+        self.assertEqual(get_rate("USD", "INR", date(2025, 1, 1)), Decimal("83.5"))
+        FxRate.objects.create(base_currency="USD", quote_currency="INR",
+                              effective_date=date(2025, 1, 1), rate=Decimal(85))
+        with self.assertNumQueries(1):
+            self.assertEqual(get_rate("USD", "INR", date(2025, 1, 1)), Decimal(85))
+        with self.assertNumQueries(0):
+            get_rate("USD", "INR", date(2025, 1, 1))
+
+    def test_pdf_grand_total_uses_the_cached_rates(self):
+        self.load(self.RATES)
+        quotation = self.make_priced_quotation()
+        get_rate("USD", "INR", date.today())
+        quotation = QuotationSerializer.eager_load(Quotation.objects).get(pk=quotation.pk)
+        with self.assertNumQueries(0):
+            document = quotation_document(quotation)
+        self.assertEqual(document["totals"], [("INR", "100.00"), ("USD", "10.00")])
+        self.assertEqual(document["converted_total"], "935.00")
+        path = default_storage.path("quotation.pdf")
+        render_quotation_pdf(document, path)
+        with open(path, "rb") as pdf:
+            self.assertIn(b"INR 935.00", zlib.decompress(pdf.read().split(b"stream\n")[1]))
+
+        FxRate.objects.all().delete()
+        self.assertIsNone(quotation_document(quotation)["converted_total"])
+
+    def test_quotation_totals_are_converted_in_sql(self):
+        self.load(self.RATES)
+        quotation = with_quotation_totals(
+            Quotation.objects.filter(pk=self.make_priced_quotation().pk), "INR").get()
+        self.assertEqual(quotation.total_amount, Decimal("935.00"))
+        self.assertTrue(quotation.total_complete)
+
+    def test_totals_without_a_rate_are_incomplete(self):
+        quotation = with_quotation_totals(
+            Quotation.objects.filter(pk=self.make_priced_quotation().pk), "INR").get()
+        self.assertEqual(quotation.total_amount, Decimal("100.00"))
+        self.assertFalse(quotation.total_complete)
+
+    def test_membership_list_totals(self):
+        self.load(self.RATES)
+        self.make_priced_quotation()
+        MembershipPayment.objects.create(membership=self.membership, amount="50.00",
+                                         currency="USD", method="upi", status="success")
+        MembershipPayment.objects.create(membership=self.membership, amount="999.00",
+                                         currency="INR", method="upi", status="failed")
+        client = api_client(self.user)
+        response = client.get("/api/memberships/?currency=inr")
+        self.assertEqual(response.status_code, 200)
+        data = response.data["data"][0]
+        self.assertEqual(Decimal(data["quoted_total"]), Decimal("935.00"))
+        self.assertEqual(Decimal(data["paid_total"]), Decimal("4175.00"))
+        self.assertTrue(data["totals_complete"])
+        self.assertEqual(client.get("/api/memberships/?currency=XYZ").status_code, 400)
+
+
+class QuotationVersionTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = make_user()
+        self.quotation = make_quotation(make_membership(self.user))
+        self.product = make_product()
+        self.staff = make_user("admin", is_staff=True)
+
+    def put(self, data):
+        return api_client(self.user).put(
+            f"/api/quotations/{self.quotation.id}/", data, format="json")
+
+    def change_status(self, status, version, user=None):
+        return api_client(user or self.staff).post(
+            f"/api/quotations/{self.quotation.id}/status/",
+            {"status": status, "version": version}, format="json")
+
+    def test_compare_and_save_bumps_the_version(self):
+        self.quotation.title = "Renamed"
+        self.quotation.compare_and_save(1, fields=["title"])
+        self.assertEqual(self.quotation.version, 2)
+        self.quotation.refresh_from_db()
+        self.assertEqual((self.quotation.title, self.quotation.version), ("Renamed", 2))
+
+    def test_compare_and_save_with_a_stale_version_writes_nothing(self):
+        Quotation.objects.filter(pk=self.quotation.pk).update(version=2)
+        self.quotation.title = "Lost update"
+        with self.assertRaises(StaleVersionError):
+            self.quotation.compare_and_save(1, fields=["title"])
+        self.quotation.refresh_from_db()
+        self.assertEqual((self.quotation.title, self.quotation.version),
+                         ("Registration dossier", 2))
+
+    def test_second_of_two_concurrent_edits_gets_409(self):
+        first = self.put({"version": 1, "title": "First"})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.data["data"]["version"], 2)
+
+        second = self.put({"version": 1, "title": "Second", "items": [
+            {"product": self.product.id, "quoted_price": "10.00"}]})
+        self.assertEqual(second.status_code, 409)
+        self.assertEqual(second.data["data"], {"version": 2, "status": "pending"})
+        self.quotation.refresh_from_db()
+        self.assertEqual(self.quotation.title, "First")
+        self.assertFalse(self.quotation.items.exists())
+
+    def test_put_needs_a_version_and_cannot_change_status(self):
+        self.assertIn("version", self.put({"title": "No version"}).data["errors"])
+        response = self.put({"version": 1, "status": "accepted"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("status", response.data["errors"])
+
+    def test_state_machine(self):
+        self.quotation.transition_to("under_review")
+        self.quotation.transition_to("sent")
+        self.quotation.transition_to("accepted")
+        self.assertEqual(self.quotation.allowed_transitions, [])
+        with self.assertRaises(InvalidStatusTransition):
+            self.quotation.transition_to("pending")
+        self.quotation.refresh_from_db()
+        self.assertEqual((self.quotation.status, self.quotation.version), ("accepted", 4))
+
+    def test_status_endpoint(self):
+        response = self.change_status("under_review", 1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"]["version"], 2)
+        self.assertEqual(response.data["data"]["allowed_transitions"],
+                         ["pending", "sent", "rejected"])
+
+        response = self.change_status("accepted", 2)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["data"]["allowed_transitions"],
+                         ["pending", "sent", "rejected"])
+
+        self.assertEqual(self.change_status("sent", 1).status_code, 409)
+        self.assertEqual(self.change_status("sent", 2, user=self.user).status_code, 403)
+        self.quotation.refresh_from_db()
+        self.assertEqual((self.quotation.status, self.quotation.version), ("under_review", 2))
+
+
+class PriceRollupTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.membership = make_membership(make_user())
+        self.product = make_product()
+        self.quotation = self.priced_quotation("India", [10, 20, 30, 40])
+
+    def priced_quotation(self, country, prices, currency="INR"):
+        quotation = Quotation.objects.create(
+            membership=self.membership, country=country, currency=currency, title="Quote")
+        QuotationItem.objects.bulk_create(
+            QuotationItem(quotation=quotation, product=self.product, quoted_price=price)
+            for price in prices)
+        return quotation
+
+    def refresh(self, *args):
+        call_command("refresh_price_rollups", *args, stdout=StringIO())
+
+    def rollups(self):
+        return {(rollup.country, rollup.currency): rollup
+                for rollup in QuotedPriceRollup.objects.all()}
+
+    def test_statistics(self):
+        self.refresh()
+        rollup = self.rollups()[("India", "INR")]
+        self.assertEqual(rollup.month, date.today().replace(day=1))
+        self.assertEqual(
+            (rollup.count, rollup.min_price, rollup.max_price, rollup.mean_price,
+             rollup.p25_price, rollup.median_price, rollup.p75_price, rollup.p90_price),
+            (4, Decimal("10.00"), Decimal("40.00"), Decimal("25.00"),
+             Decimal("17.50"), Decimal("25.00"), Decimal("32.50"), Decimal("37.00")))
+
+    @skipUnless(numpy, "NumPy is not installed")
+    def test_numpy_and_python_summaries_agree(self):
+        rows = [(1, "INR", Decimal(price)) for price in ("9.99", "120.50", "3", "77.25", "41")]
+        rows += [(2, "USD", Decimal("5.00")), (1, "USD", Decimal("1.10"))]
+        self.assertEqual(summarize_numpy(numpy, rows), summarize_python(rows))
+
+    def test_incremental_refresh_picks_up_new_and_edited_items(self):
+        self.refresh()
+        self.priced_quotation("Peru", [50], currency="USD")
+        QuotationItem.objects.filter(quotation=self.quotation, quoted_price=40).update(
+            quoted_price=400)
+        touch_quotation(self.quotation.id)
+        self.refresh()
+        rollups = self.rollups()
+        self.assertEqual(rollups[("India", "INR")].max_price, Decimal("400.00"))
+        self.assertEqual(rollups[("Peru", "USD")].count, 1)
+
+    def test_untouched_slices_are_not_recomputed(self):
+        self.refresh()
+        QuotationItem.objects.filter(quotation=self.quotation).update(quoted_price=1)
+        self.refresh()
+        self.assertEqual(self.rollups()[("India", "INR")].min_price, Decimal("10.00"))
+
+    def test_rebuild_drops_slices_of_deleted_quotations(self):
+        peru = self.priced_quotation("Peru", [50], currency="USD")
+        self.refresh()
+        peru.delete()
+        self.refresh()
+        self.assertIn(("Peru", "USD"), self.rollups())
+        self.refresh("--rebuild")
+        self.assertEqual(list(self.rollups()), [("India", "INR")])
+
+    def test_analytics_endpoint_is_staff_only(self):
+        self.refresh()
+        url = f"/api/analytics/quoted-prices/?product={self.product.id}&country=India"
+        self.assertEqual(api_client(self.membership.registration.user).get(url).status_code, 403)
+        response = api_client(make_user("admin", is_staff=True)).get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(response.data["data"][0]["month"], date.today().strftime("%Y-%m"))
+        response = api_client(make_user("root", is_staff=True)).get(
+            "/api/analytics/quoted-prices/?from=2024")
+        self.assertEqual(response.status_code, 400)
+
+
+class PriceSuggestionTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.membership = make_membership(make_user())
+        self.product = make_product()
+        self.india = self.priced_quotation("India", [10, 20, 30, 40])
+        self.peru = self.priced_quotation("Peru", [100])
+        self.index = PriceIndex()
+        patcher = patch("website.analytics.price_index", self.index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def priced_quotation(self, country, prices):
+        quotation = Quotation.objects.create(
+            membership=self.membership, country=country, currency="INR", title="Quote")
+        QuotationItem.objects.bulk_create(
+            QuotationItem(quotation=quotation, product=self.product, quoted_price=price)
+            for price in prices)
+        return quotation
+
+    def test_suggestion_for_a_country(self):
+        suggestion = suggest_price(self.product.id, "INR", "India")
+        self.assertEqual(suggestion, {
+            "count": 4, "scope": "country", "suggested_price": Decimal("25.00"),
+            "low_price": Decimal("17.50"), "high_price": Decimal("32.50"),
+            "min_price": Decimal("10.00"), "max_price": Decimal("40.00")})
+
+    def test_falls_back_to_every_country(self):
+        suggestion = suggest_price(self.product.id, "INR", "Kenya")
+        self.assertEqual((suggestion["scope"], suggestion["count"]), ("all_countries", 5))
+        self.assertEqual(suggestion["suggested_price"], Decimal("30.00"))
+        self.assertEqual(suggest_price(self.product.id, "USD")["count"], 0)
+
+    def test_suggestions_are_served_from_memory(self):
+        suggest_price(self.product.id, "INR", "India")
+        with self.assertNumQueries(0):
+            suggest_price(self.product.id, "INR", "Peru")
+
+    def test_refresh_picks_up_new_and_edited_items(self):
+        suggest_price(self.product.id, "INR")
+        QuotationItem.objects.create(quotation=self.peru, product=self.product, quoted_price=200)
+        QuotationItem.objects.filter(quotation=self.india, quoted_price=40).update(
+            quoted_price=45)
+        touch_quotation(self.india.id)
+        self.index.refresh()
+        self.assertEqual(self.index.suggest(self.product.id, "INR", "Peru")["count"], 2)
+        self.assertEqual(self.index.suggest(self.product.id, "INR", "India")["max_price"],
+                         Decimal("45.00"))
+
+    def test_rebuild_drops_deleted_quotations(self):
+        suggest_price(self.product.id, "INR")
+        self.peru.delete()
+        self.index.refresh()
+        suggestion = self.index.suggest(self.product.id, "INR", "Peru")
+        self.assertEqual((suggestion["scope"], suggestion["count"]), ("country", 1))
+        self.index.rebuild()
+        suggestion = self.index.suggest(self.product.id, "INR", "Peru")
+        self.assertEqual((suggestion["scope"], suggestion["count"]), ("all_countries", 4))
+
+    def test_endpoint(self):
+        url = f"/api/analytics/price-suggestion/?product={self.product.id}&country=India"
+        self.assertEqual(api_client(self.membership.registration.user).get(url).status_code, 403)
+        staff = api_client(make_user("admin", is_staff=True))
+        response = staff.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["data"]["currency"], "INR")
+        self.assertEqual(response.data["data"]["suggested_price"], Decimal("25.00"))
+        self.assertEqual(staff.get("/api/analytics/price-suggestion/").status_code, 400)
+
+
+class QuotationFanOutTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = make_user()
+        self.membership = make_membership(self.user)
+        self.product = make_product()
+
+    def fan_out(self, countries):
+        serializer = QuotationFanOutSerializer(data={
+            "membership": self.membership.id, "currency": "INR", "title": "Fan-out",
+            "countries": countries,
+            "items": [{"product": self.product.id, "quoted_price": "10.00"}],
+            "guideline_files": [{"file_name": "guide.pdf",
+                                 "file": SimpleUploadedFile("guide.pdf", PDF)}],
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        with self.captureOnCommitCallbacks(execute=True):
+            return serializer.save()
+
+    def test_quotations_share_one_stored_file(self):
+        quotations = self.fan_out(["India", "Peru", "india", "Kenya"])
+        self.assertEqual([q.country for q in quotations], ["India", "Peru", "Kenya"])
+        self.assertEqual(QuotationItem.objects.count(), 3)
+        names = set(QuotationGuidelineFile.objects.values_list("file", flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertEqual(dict(StoredBlob.objects.values_list("name", "ref_count")),
+                         {names.pop(): 3})
+
+    def test_deleting_one_quotation_leaves_the_file_to_the_others(self):
+        quotations = self.fan_out(["India", "Peru"])
+        name = QuotationGuidelineFile.objects.values_list("file", flat=True).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            quotations[0].delete()
+        self.assertEqual(StoredBlob.objects.get(name=name).ref_count, 1)
+        self.assertTrue(default_storage.exists(name))
+        with self.captureOnCommitCallbacks(execute=True):
+            quotations[1].delete()
+        self.assertFalse(StoredBlob.objects.filter(name=name).exists())
+        self.assertFalse(default_storage.exists(name))
+
+    def test_endpoint(self):
+        client = api_client(self.user)
+        response = client.post("/api/quotations/fan-out/", {
+            "currency": "INR", "title": "Fan-out", "countries": ["India", "Peru"],
+            "items": [{"product": self.product.id, "quoted_price": "10.00"}],
+        }, format="json")
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual([row["country"] for row in response.data["data"]], ["India", "Peru"])
+        self.assertEqual(response.data["items_count"], 1)
+
+        response = client.post("/api/quotations/fan-out/", {
+            "currency": "INR", "title": "Too many",
+            "countries": [f"Country {n}" for n in range(51)],
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("countries", response.data["errors"])
+        self.assertEqual(Quotation.objects.count(), 2)
+
+
+class QuotationPdfCacheTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.quotation = make_quotation(make_membership(make_user()))
+        self.item = QuotationItem.objects.create(
+            quotation=self.quotation, product=make_product(), quoted_price=10)
+        self.quotation.refresh_from_db()
+        self.render()
+
+    def render(self):
+        path = default_storage.path(pdf_name(self.quotation))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as pdf:
+            pdf.write(PDF)
+        self.assertIsNotNone(cached_pdf(self.quotation))
+
+    def assert_invalidated(self):
+        version = self.quotation.version
+        self.quotation.refresh_from_db()
+        self.assertIsNone(cached_pdf(self.quotation))
+        # Optimistic locking of API edits is not affected
+        self.assertEqual(self.quotation.version, version)
+
+    def test_item_save_and_delete_invalidate_the_pdf(self):
+        self.item.quoted_price = 12
+        self.item.save()
+        self.assert_invalidated()
+
+        self.render()
+        self.item.delete()
+        self.assert_invalidated()
+
+    def test_guideline_file_changes_invalidate_the_pdf(self):
+        guideline = QuotationGuidelineFile.objects.create(
+            quotation=self.quotation, file_name="guide.pdf",
+            file=ContentFile(PDF, name="guide.pdf"))
+        self.assert_invalidated()
+
+        self.render()
+        guideline.delete()
+        self.assert_invalidated()
+
+    def test_admin_bulk_delete_invalidates_the_pdf(self):
+        self.client.force_login(make_user("admin", is_staff=True, is_superuser=True))
+        response = self.client.post("/admin/website/quotationitem/", {
+            "action": "delete_selected", "_selected_action": [self.item.pk], "post": "yes"})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(QuotationItem.objects.exists())
+        self.assert_invalidated()
+
+
+class StructuredLoggingTests(MediaTestCase):
+
+    def make_record(self, level=logging.INFO, name="website.views", **fields):
+        record = logging.LogRecord(name, level, __file__, 1, "message %s", ("arg",), None)
+        record.__dict__.update(fields)
+        return record
+
+    def test_redacting_filter_masks_nested_keys_without_touching_the_data(self):
+        data = {"title": "Quote", "Password": "hunter2",
+                "items": [{"token": "abc", "price": 1}]}
+        record = self.make_record(data=data, secret="s3cret", user_id=1)
+        self.assertTrue(RedactingFilter(["password", "token", "secret"]).filter(record))
+        self.assertEqual(record.secret, REDACTED)
+        self.assertEqual(record.user_id, 1)
+        self.assertEqual(record.data, {"title": "Quote", "Password": REDACTED,
+                                       "items": [{"token": REDACTED, "price": 1}]})
+        self.assertEqual(data["Password"], "hunter2")
+
+    def test_sampling_filter_keeps_warnings_and_inherits_rates(self):
+        sampling = SamplingFilter({"website": 0, "website.search": 1})
+        self.assertFalse(sampling.filter(self.make_record()))
+        self.assertTrue(sampling.filter(self.make_record(level=logging.WARNING)))
+        self.assertTrue(sampling.filter(self.make_record(name="website.search.fts")))
+        self.assertTrue(sampling.filter(self.make_record(name="django.request")))
+
+    def test_json_formatter_writes_one_object_with_fields(self):
+        entry = json.loads(JsonFormatter().format(self.make_record(action="quotation_get")))
+        self.assertEqual(entry["message"], "message arg")
+        self.assertEqual((entry["level"], entry["logger"], entry["action"]),
+                         ("INFO", "website.views", "quotation_get"))
+
+    def test_full_queue_drops_and_counts_records(self):
+        handler = QueueHandler(capacity=1)
+        handler.pid = os.getpid()
+        handler.queue = queue.Queue(1)
+        for _ in range(3):
+            handler.emit(self.make_record())
+        self.assertEqual(handler.dropped, 2)
+        handler.queue.get_nowait()
+        handler.emit(self.make_record())
+        self.assertEqual(handler.queue.get_nowait().dropped_records, 2)
+        self.assertEqual(handler.dropped, 0)
+
+    def test_request_data_is_logged_with_secrets_masked(self):
+        website_logger = logging.getLogger("website")
+        handler = website_logger.handlers[0]
+        output = StringIO()
+        previous_stream = handler.target.setStream(output)
+        self.addCleanup(handler.target.setStream, previous_stream)
+        previous_level = website_logger.level
+        website_logger.setLevel(logging.DEBUG)
+        self.addCleanup(website_logger.setLevel, previous_level)
+
+        user = make_user()
+        make_membership(user)
+        api_client(user).post("/api/quotations/", {
+            "country": "Peru", "currency": "USD", "title": "Logged",
+            "token": "do-not-log", "document": SimpleUploadedFile("a.pdf", PDF),
+        })
+        handler.queue.join()
+
+        entries = [json.loads(line) for line in output.getvalue().splitlines()]
+        entry = next(entry for entry in entries if entry["message"] == "quotation_post")
+        self.assertEqual(entry["data"]["token"], REDACTED)
+        self.assertEqual(entry["data"]["document"], {"file": "a.pdf", "size": len(PDF)})
+        self.assertEqual(entry["user_id"], user.id)
+        self.assertNotIn("do-not-log", output.getvalue())
+
+
+class RequestProfilingTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.staff = make_user("admin", is_staff=True)
+        self.staff_token = Token.objects.create(user=self.staff).key
+        self.member = make_user()
+        make_membership(self.member)
+
+    def profiled_get(self, user_token, mode="1", path="/api/quotations/"):
+        return self.client.get(path, HTTP_AUTHORIZATION=f"Token {user_token}",
+                               HTTP_X_PROFILE=mode)
+
+    def fetch(self, url, user=None):
+        response = api_client(user or self.staff).get(url)
+        if response.streaming:
+            response.body = b"".join(response.streaming_content)
+        return response
+
+    def test_staff_request_is_profiled_and_stored(self):
+        response = self.profiled_get(self.staff_token)
+        self.assertEqual(response.status_code, 404)  # staff has no registration
+        profile_id = response["X-Profile-Id"]
+        self.assertEqual(response["X-Profile-URL"], f"/api/profiles/{profile_id}/")
+
+        report = json.loads(self.fetch(response["X-Profile-URL"]).body)
+        self.assertEqual((report["id"], report["path"], report["status"]),
+                         (profile_id, "/api/quotations/", 404))
+        self.assertEqual(report["query_count"], len(report["queries"]))
+        self.assertGreater(report["query_count"], 0)
+
+        stats = self.fetch(f"{response['X-Profile-URL']}?output=pstats")
+        self.assertTrue(marshal.loads(stats.body))
+
+    def test_session_staff_can_profile_with_the_query_flag(self):
+        self.client.force_login(self.staff)
+        response = self.client.get("/api/quotations/?_profile=1")
+        self.assertIn("X-Profile-Id", response)
+        self.assertNotIn("X-Profile-Id", self.client.get("/api/quotations/?_profile=0"))
+
+    def test_download_mode_returns_the_report(self):
+        response = self.profiled_get(self.staff_token, mode="download")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Disposition"].startswith("attachment;"))
+        self.assertEqual(json.loads(response.content)["status"], 404)
+        self.assertFalse(os.path.isdir(default_storage.path(settings.REQUEST_PROFILE_DIR)))
+
+    def test_members_are_not_profiled(self):
+        member_token = Token.objects.create(user=self.member).key
+        response = self.profiled_get(member_token)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Profile-Id", response)
+        response = self.profiled_get("not-a-token")
+        self.assertNotIn("X-Profile-Id", response)
+
+    def test_reports_are_staff_only(self):
+        url = self.profiled_get(self.staff_token)["X-Profile-URL"]
+        self.assertEqual(self.fetch(url, user=self.member).status_code, 403)
+        self.assertEqual(self.fetch("/api/profiles/..%2Fsettings/").status_code, 404)
+        self.assertEqual(self.fetch(f"{url}?output=html").status_code, 404)
+
+    @override_settings(REQUEST_PROFILE_KEEP=2)
+    def test_only_the_newest_reports_are_kept(self):
+        ids = [self.profiled_get(self.staff_token)["X-Profile-Id"] for _ in range(3)]
+        kept = sorted(os.listdir(default_storage.path(settings.REQUEST_PROFILE_DIR)))
+        self.assertEqual(len(kept), 4)
+        self.assertEqual({name.rsplit(".", 1)[0] for name in kept}, set(sorted(ids)[1:]))
+
+
+class MetricsTests(MediaTestCase):
+
+    def test_closed_without_a_token_by_default(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.assertEqual(self.client.get(
+            "/metrics", HTTP_AUTHORIZATION="Bearer None").status_code, 403)
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_token_grants_access(self):
+        self.assertEqual(self.client.get(
+            "/metrics", HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+        api_client().get("/api/products/")
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn("# TYPE http_request_duration_seconds histogram", body)
+        self.assertIn('http_responses_total{view="product-list",method="GET",status="2xx"}', body)
+
+    @override_settings(METRICS_ALLOWED_IPS=["10.0.0.5"])
+    def test_allowed_ips_are_matched_on_the_client_address(self):
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.0.0.5").status_code, 200)
+        self.assertEqual(self.client.get(
+            "/metrics", HTTP_X_FORWARDED_FOR="10.0.0.5").status_code, 403)
+
+    def test_flush_recreates_a_removed_directory(self):
+        flusher.ensure_started()
+        registry.inc("cache_requests_total", (("cache", "test"), ("result", "hit")))
+        shutil.rmtree(settings.METRICS_DIR)
+        flusher.flush()
+        self.assertTrue(os.path.exists(os.path.join(settings.METRICS_DIR, f"{os.getpid()}.json")))
+
+    def test_failed_writes_are_logged_and_do_not_stop_flushing(self):
+        flusher.ensure_started()
+        registry.inc("cache_requests_total", (("cache", "test"), ("result", "hit")))
+        with patch("website.metrics.write_json", side_effect=OSError("No space left")), \
+                self.assertLogs("website.metrics", "ERROR"):
+            flusher.flush_safely()
+        flusher.flush_safely()
+        self.assertTrue(os.path.exists(os.path.join(settings.METRICS_DIR, f"{os.getpid()}.json")))
@@ -0,0 +1,187 @@
+"""
+Streaming validation for multipart uploads.
+
+``UploadValidationMixin`` puts ``UploadValidationHandler`` ahead of
+Django's default upload handlers for the API views that accept membership
+documents, payment proofs and guideline files. It rejects a request whose Content-Length is over the limit before any of
+the body is read, and rejects each file as soon as it grows past
+``UPLOAD_MAX_FILE_SIZE`` or its first bytes don't match its extension. The
+rest of the body is never read, so a bad upload costs kilobytes of I/O.
+"""
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler
+from django.http import QueryDict
+from django.http.multipartparser import MultiPartParser as DjangoMultiPartParser
+from django.http.multipartparser import MultiPartParserError
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import DataAndFiles, MultiPartParser, get_encoding
+from rest_framework.response import Response
+
+from .uploads import size_limit_text
+
+# Bytes needed to recognise every supported type (PDFs may have up to 1 KB
+# of junk before the %PDF- marker)
+SNIFF_BYTES = 1024
+
+FILE_SIGNATURES = (
+    ("png", (b"\x89PNG\r\n\x1a\n",)),
+    ("jpeg", (b"\xff\xd8\xff",)),
+    ("gif", (b"GIF87a", b"GIF89a")),
+    # DOCX is a ZIP container
+    ("docx", (b"PK\x03\x04",)),
+    ("doc", (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1",)),
+)
+
+EXTENSION_TYPES = {
+    ".pdf": "pdf",
+    ".png": "png",
+    ".jpg": "jpeg",
+    ".jpeg": "jpeg",
+    ".gif": "gif",
+    ".docx": "docx",
+    ".doc": "doc",
+}
+
+
+def sniff_file_type(head):
+    """Return the file type recognised from the leading bytes, or None."""
+    for file_type, signatures in FILE_SIGNATURES:
+        if head.startswith(signatures):
+            return file_type
+    if b"%PDF-" in head[:SNIFF_BYTES]:
+        return "pdf"
+    return None
+
+
+def check_file_signature(file_name, head):
+    """
+    Return an error message if the leading bytes don't match the file's
+    extension, otherwise None. Unknown extensions are left to the
+    serializers' extension checks.
+    """
+    extension = "." + file_name.rsplit(".", 1)[-1].lower()
+    expected = EXTENSION_TYPES.get(extension)
+    if expected is None or sniff_file_type(head) == expected:
+        return None
+    return f"The file content does not match its {extension} extension. Please upload a valid {extension} file."
+
+
+def read_file_head(uploaded_file):
+    """Read the leading bytes of an uploaded file without moving its position."""
+    position = uploaded_file.tell()
+    uploaded_file.seek(0)
+    head = uploaded_file.read(SNIFF_BYTES)
+    uploaded_file.seek(position)
+    return head
+
+
+def copy_request_data(data):
+    """
+    Mutable copy of ``request.data``. ``QueryDict.copy()`` deep-copies
+    values, which fails for uploads large enough to be spooled to disk.
+    """
+    if isinstance(data, QueryDict):
+        copy = QueryDict(mutable=True)
+        for key, values in data.lists():
+            copy.setlist(key, list(values))
+        return copy
+    return data.copy()
+
+
+class UploadRejected(MultiPartParserError):
+    def __init__(self, message, field_name=None, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.message = message
+        self.field_name = field_name
+        self.status_code = status_code
+
+
+class UploadValidationHandler(FileUploadHandler):
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > settings.UPLOAD_MAX_REQUEST_SIZE:
+            raise UploadRejected(
+                "Upload is too large. Please keep the whole request under "
+                f"{size_limit_text(settings.UPLOAD_MAX_REQUEST_SIZE)}.",
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        return None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.head = b""
+        self.checked = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.UPLOAD_MAX_FILE_SIZE:
+            raise UploadRejected(
+                "File is too large. Please select a file smaller than "
+                f"{size_limit_text(settings.UPLOAD_MAX_FILE_SIZE)}.",
+                field_name=self.field_name,
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        if not self.checked:
+            self.head += raw_data[:SNIFF_BYTES - len(self.head)]
+            if len(self.head) >= SNIFF_BYTES:
+                self.check_head()
+
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not self.checked:
+            self.check_head()
+        # Let the next handler build the uploaded file
+        return None
+
+    def check_head(self):
+        self.checked = True
+        error = check_file_signature(self.file_name, self.head)
+        if error:
+            raise UploadRejected(error, field_name=self.field_name)
+
+
+class UploadValidatingMultiPartParser(MultiPartParser):
+    """
+    DRF multipart parser that lets ``UploadRejected`` through instead of
+    turning it into a generic parse error.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        request = parser_context['request']
+        meta = request.META.copy()
+        meta['CONTENT_TYPE'] = media_type
+
+        try:
+            parser = DjangoMultiPartParser(
+                meta, stream, request.upload_handlers, get_encoding(parser_context))
+            data, files = parser.parse()
+        except UploadRejected:
+            raise
+        except MultiPartParserError as exc:
+            raise ParseError('Multipart form parse error - %s' % str(exc))
+        return DataAndFiles(data, files)
+
+
+class UploadValidationMixin:
+    """
+    For views that accept file uploads: validate uploads while they stream
+    in, and parse multipart bodies after authentication but before the
+    handler runs, so a rejected upload gets a 400/413 response instead of
+    reaching the view's generic error handling.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        request.upload_handlers.insert(0, UploadValidationHandler(request._request))
+        super().initial(request, *args, **kwargs)
+        if request.content_type.startswith('multipart/form-data'):
+            request.data
+
+    def handle_exception(self, exc):
+        if isinstance(exc, UploadRejected):
+            errors = {exc.field_name: [exc.message]} if exc.field_name else {}
+            return Response({
+                "success": False,
+                "message": exc.message,
+                "errors": errors
+            }, status=exc.status_code)
+        return super().handle_exception(exc)
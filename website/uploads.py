@@ -0,0 +1,95 @@
+"""
+Helpers for resumable (chunked) uploads.
+
+Partial files live under ``UPLOAD_SESSION_DIR`` inside the default storage
+so a finished upload can be handed to the content-addressed storage without
+copying the bytes again.
+"""
+import os
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from .models import MembershipDocument, MembershipPayment, UploadSession
+
+# Model and file field each upload target attaches to
+UPLOAD_TARGETS = {
+    "membership_document": (MembershipDocument, "file"),
+    "membership_payment": (MembershipPayment, "payment_proof"),
+}
+
+
+def size_limit_text(size):
+    """A size limit in bytes as error messages show it, e.g. "10MB"."""
+    return f"{size / (1024 * 1024):g}MB"
+
+
+def part_path(session):
+    return default_storage.path(
+        f"{settings.UPLOAD_SESSION_DIR}{session.pk}.part")
+
+
+def write_chunk(session, stream, length):
+    """
+    Stream ``length`` bytes from ``stream`` into the session's part file,
+    starting at the session's current offset.
+
+    Returns the number of bytes written. If the client disconnects part way
+    through, whatever arrived is kept so the next chunk can resume from it.
+    Errors writing the part file (disk full...) are raised.
+    """
+    path = part_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    block_size = settings.UPLOAD_STREAM_BLOCK_SIZE
+    written = 0
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o644)
+    try:
+        with os.fdopen(fd, "wb") as part:
+            # Anything past the recorded offset is left over from an
+            # interrupted chunk and gets overwritten
+            part.seek(session.offset)
+            while written < length:
+                try:
+                    data = stream.read(min(block_size, length - written))
+                except OSError:
+                    # Client went away (UnreadablePostError and the like)
+                    break
+                if not data:
+                    break
+                part.write(data)
+                written += len(data)
+            part.truncate()
+    finally:
+        if written:
+            UploadSession.objects.filter(
+                pk=session.pk, offset=session.offset
+            ).update(offset=session.offset + written)
+            session.offset += written
+
+    return written
+
+
+def read_head(session, size):
+    """Return the first ``size`` bytes of the uploaded data."""
+    with open(part_path(session), "rb") as part:
+        return part.read(size)
+
+
+def attach_part_file(session):
+    """
+    Hand the completed part file to the target field's storage and return
+    the storage name to assign to the FileField. The part file is left in
+    place: remove it with ``discard_part_file()`` once the row that uses the
+    name has been committed.
+    """
+    model, field_name = UPLOAD_TARGETS[session.target]
+    field = model._meta.get_field(field_name)
+    return field.storage.adopt(part_path(session), session.file_name)
+
+
+def discard_part_file(session):
+    try:
+        os.unlink(part_path(session))
+    except FileNotFoundError:
+        pass
@@ -31,10 +31,14 @@ urlpatterns = [
          views.MembershipDocumentListView.as_view(), name='membership-documents'),
     path('memberships/<int:membership_id>/payments/',
          views.MembershipPaymentListView.as_view(), name='membership-payments'),
+    path('memberships/<int:membership_id>/dossier/',
+         views.MembershipDossierView.as_view(), name='membership-dossier'),
 
     # Dedicated Membership Document API endpoints
     path('membership-documents/', views.MembershipDocumentAPIView.as_view(),
          name='membership-document-api'),
+    path('membership-documents/bulk-verify/', views.MembershipDocumentBulkVerifyView.as_view(),
+         name='membership-document-bulk-verify'),
     path('membership-documents/<int:document_id>/', views.MembershipDocumentAPIView.as_view(),
          name='membership-document-detail'),
     path('membership-documents/by-membership/<int:membership_id>/',
@@ -43,16 +47,46 @@ urlpatterns = [
     # Dedicated Membership Payment API endpoints
     path('membership-payments/', views.MembershipPaymentAPIView.as_view(),
          name='membership-payment-api'),
+    path('membership-payments/bulk-verify/', views.MembershipPaymentBulkVerifyView.as_view(),
+         name='membership-payment-bulk-verify'),
     path('membership-payments/<int:payment_id>/', views.MembershipPaymentAPIView.as_view(),
          name='membership-payment-detail'),
     path('membership-payments/by-membership/<int:membership_id>/',
          views.MembershipPaymentByMembershipView.as_view(), name='membership-payments-by-membership'),
 
+    # Resumable upload endpoints
+    path('uploads/', views.UploadSessionAPIView.as_view(), name='upload-session-api'),
+    path('uploads/<uuid:session_id>/', views.UploadSessionDetailView.as_view(),
+         name='upload-session-detail'),
+    path('uploads/<uuid:session_id>/complete/', views.UploadSessionCompleteView.as_view(),
+         name='upload-session-complete'),
+
+    # Signed file downloads (URLs come from the serializers)
+    path('files/<path:name>', views.serve_signed_file, name='signed-file'),
+
     # Dedicated Quotation API endpoints
     path('quotations/', views.QuotationAPIView.as_view(),
          name='quotation-api'),
+    path('quotations/fan-out/', views.QuotationFanOutView.as_view(),
+         name='quotation-fan-out'),
     path('quotations/<int:quotation_id>/', views.QuotationAPIView.as_view(),
          name='quotation-detail'),
+    path('quotations/<int:quotation_id>/pdf/', views.QuotationPDFView.as_view(),
+         name='quotation-pdf'),
+    path('quotations/<int:quotation_id>/status/', views.QuotationStatusView.as_view(),
+         name='quotation-status'),
     path('quotations/by-membership/<int:membership_id>/',
          views.QuotationByMembershipView.as_view(), name='quotations-by-membership'),
+    path('quotations/guidelines/search/',
+         views.QuotationGuidelineSearchView.as_view(), name='quotation-guideline-search'),
+
+    # Analytics endpoints
+    path('analytics/quoted-prices/', views.QuotedPriceAnalyticsView.as_view(),
+         name='quoted-price-analytics'),
+    path('analytics/price-suggestion/', views.QuotedPriceSuggestionView.as_view(),
+         name='price-suggestion'),
+
+    # Request profiles (staff)
+    path('profiles/<str:profile_id>/', views.RequestProfileView.as_view(),
+         name='request-profile'),
 ]
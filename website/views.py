@@ -1,21 +1,80 @@
+import hmac
+import logging
+import os
+import time
+from datetime import date
+from functools import partial
+from urllib.parse import quote
+
 from django.shortcuts import render
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_safe
 from django.db import transaction
 from django.contrib.auth import authenticate
 from django.contrib.auth.tokens import default_token_generator
 from django.core.mail import send_mail
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
 from django.conf import settings
 from rest_framework import generics, status
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.authtoken.models import Token
 from django.contrib.auth.models import User
-from .models import Registration, Product, ProductDocument, ProductRegistration, Membership, MembershipDocument, MembershipPayment, Quotation, QuotationItem, QuotationGuidelineFile
+from .models import Registration, Product, ProductDocument, ProductRegistration, Membership, MembershipDocument, MembershipPayment, Quotation, QuotationItem, QuotationGuidelineFile, UploadSession, StaleVersionError, InvalidStatusTransition, QuotedPriceRollup
 from .serializers import (
     UserSerializer, RegistrationSerializer, ChangePasswordSerializer,
     ForgotPasswordSerializer, ResetPasswordSerializer, ProductSerializer,
     ProductDocumentSerializer, ProductRegistrationSerializer, MembershipSerializer,
-    MembershipDocumentSerializer, MembershipPaymentSerializer, QuotationSerializer, QuotationItemSerializer, QuotationGuidelineFileSerializer
+    MembershipDocumentSerializer, MembershipPaymentSerializer, QuotationSerializer, QuotationItemSerializer, QuotationGuidelineFileSerializer,
+    BulkVerificationSerializer, UploadSessionSerializer, upload_metadata_serializer,
+    QuotationStatusSerializer, QuotationFanOutSerializer
 )
+from .uploads import UPLOAD_TARGETS, write_chunk, read_head, attach_part_file, discard_part_file
+from .upload_handlers import UploadValidationMixin, SNIFF_BYTES, check_file_signature, copy_request_data
+from .signing import verify_signed_file
+from .search import search_pages
+from .dossier import dossier_entries, stream_dossier
+from .quotation_pdf import cached_pdf, queue_pdf
+from .fx import currency_codes, with_membership_totals, with_quotation_totals
+from .analytics import suggest_price
+from .profiling import PROFILE_ID, profile_name
+from .metrics import exposition
+
+logger = logging.getLogger(__name__)
+
+
+def log_request(request, action, with_data=False, **fields):
+    """
+    One structured record per API call. With ``with_data``, a summary of
+    the request data (uploads as name and size) is added at DEBUG level;
+    passwords and tokens are masked by the logging config.
+    """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    extra = {
+        "action": action,
+        "method": request.method,
+        "path": request.path,
+        "user_id": request.user.id,
+        **fields
+    }
+    if with_data and logger.isEnabledFor(logging.DEBUG):
+        extra["data"] = {key: logged_value(value) for key, value in request.data.items()}
+    logger.info(action, extra=extra)
+
+
+def logged_value(value):
+    if hasattr(value, 'read') and hasattr(value, 'size'):
+        return {"file": value.name, "size": value.size}
+    if isinstance(value, (list, tuple)):
+        return [logged_value(item) for item in value[:20]]
+    if isinstance(value, dict):
+        return {key: logged_value(item) for key, item in value.items()}
+    return value
+
 
 # Create your views here.
 
@@ -94,45 +153,26 @@ class RegistrationView(generics.CreateAPIView):
 
     def post(self, request):
         try:
-            # Print request data to terminal
-            print("\n" + "="*50)
-            print("📤 REGISTRATION POST REQUEST")
-            print("="*50)
-            print(f"🔗 URL: {request.get_full_path()}")
-            print(f"📋 Method: {request.method}")
-            print(f"📦 Content-Type: {request.content_type}")
-            print("\n📊 REQUEST DATA:")
-            print("-" * 30)
-
-            # Print form data
-            if hasattr(request, 'data'):
-                for key, value in request.data.items():
-                    if key == 'password' or key == 'confirm_password':
-                        print(f"  {key}: {'*' * len(str(value))}")
-                    else:
-                        print(f"  {key}: {value}")
-
-            print("="*50)
+            log_request(request, "registration_post", with_data=True)
 
             serializer = RegistrationSerializer(data=request.data)
             if serializer.is_valid():
                 registration = serializer.save()
-                print(
-                    f"✅ Registration created successfully with ID: {registration.id}")
+                logger.debug("Registration created successfully with ID: %s", registration.id)
                 return Response({
                     "success": True,
                     "message": "Registration completed successfully!",
                     "data": serializer.data
                 }, status=status.HTTP_201_CREATED)
             else:
-                print(f"❌ Validation errors: {serializer.errors}")
+                logger.info("Validation errors", extra={"errors": serializer.errors})
                 return Response({
                     "success": False,
                     "message": "Please correct the errors below and try again.",
                     "errors": serializer.errors
                 }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
-            print(f"💥 Server error: {str(e)}")
+            logger.exception("Server error")
             return Response({
                 "success": False,
                 "message": "An unexpected error occurred. Please try again later.",
@@ -396,44 +436,43 @@ class MembershipListView(generics.ListCreateAPIView):
 
     def get(self, request):
         try:
-            # Print request info for debugging
-            print("\n" + "="*50)
-            print("📤 MEMBERSHIP LIST GET REQUEST")
-            print("="*50)
-            print(f"🔗 URL: {request.get_full_path()}")
-            print(f"🔐 User: {request.user}")
-            print(f"📋 Method: {request.method}")
-            print("="*50)
+            log_request(request, "membership_list_get")
 
             # Get user's registration
             try:
                 user_registration = Registration.objects.get(user=request.user)
-                print(f"👤 User Registration ID: {user_registration.id}")
+                logger.debug("User Registration ID: %s", user_registration.id)
 
                 # Filter memberships by user's registration
                 memberships = Membership.objects.filter(
                     registration=user_registration)
-                print(f"📊 Found {memberships.count()} memberships for user")
 
             except Registration.DoesNotExist:
-                print("❌ User has no registration")
+                logger.info("User has no registration")
                 return Response({
                     "success": False,
                     "message": "User registration not found. Please complete your registration first.",
                 }, status=status.HTTP_404_NOT_FOUND)
 
+            currency = requested_currency(request)
+            if currency is None:
+                return invalid_currency_response()
+            # Totals are computed in the same query as the memberships
+            memberships = list(with_membership_totals(
+                memberships.prefetch_related('documents', 'payments'), currency))
+
             serializer = MembershipSerializer(memberships, many=True)
-            print(f"✅ Returning {len(serializer.data)} memberships")
+            logger.debug("Returning %s memberships", len(serializer.data))
 
             return Response({
                 "success": True,
                 "data": serializer.data,
-                "count": memberships.count(),
+                "count": len(memberships),
                 "user_registration_id": user_registration.id
             }, status=status.HTTP_200_OK)
 
         except Exception as e:
-            print(f"💥 Server error: {str(e)}")
+            logger.exception("Server error")
             return Response({
                 "success": False,
                 "message": "Failed to retrieve memberships.",
@@ -474,41 +513,33 @@ class MembershipDetailView(generics.RetrieveUpdateAPIView):
 
     def get(self, request, pk):
         try:
-            # Print request info for debugging
-            print("\n" + "="*50)
-            print("📤 MEMBERSHIP DETAIL GET REQUEST")
-            print("="*50)
-            print(f"🔗 URL: {request.get_full_path()}")
-            print(f"🔐 User: {request.user}")
-            print(f"📋 Method: {request.method}")
-            print(f"🆔 Requested Membership ID: {pk}")
-            print("="*50)
+            log_request(request, "membership_detail_get", pk=pk)
 
             # Get user's registration
             try:
                 user_registration = Registration.objects.get(user=request.user)
-                print(f"👤 User Registration ID: {user_registration.id}")
+                logger.debug("User Registration ID: %s", user_registration.id)
 
                 # Get membership and verify it belongs to the user
                 membership = Membership.objects.get(
                     pk=pk, registration=user_registration)
-                print(f"✅ Membership {pk} belongs to user")
+                logger.debug("Membership %s belongs to user", pk)
 
             except Registration.DoesNotExist:
-                print("❌ User has no registration")
+                logger.info("User has no registration")
                 return Response({
                     "success": False,
                     "message": "User registration not found. Please complete your registration first.",
                 }, status=status.HTTP_404_NOT_FOUND)
             except Membership.DoesNotExist:
-                print(f"❌ Membership {pk} not found or doesn't belong to user")
+                logger.info("Membership %s not found or doesn't belong to user", pk)
                 return Response({
                     "success": False,
                     "message": "Membership not found or you don't have permission to access it."
                 }, status=status.HTTP_404_NOT_FOUND)
 
             serializer = MembershipSerializer(membership)
-            print(f"✅ Returning membership data")
+            logger.debug("Returning membership data")
 
             return Response({
                 "success": True,
@@ -516,7 +547,7 @@ class MembershipDetailView(generics.RetrieveUpdateAPIView):
             }, status=status.HTTP_200_OK)
 
         except Exception as e:
-            print(f"💥 Server error: {str(e)}")
+            logger.exception("Server error")
             return Response({
                 "success": False,
                 "message": "Failed to retrieve membership.",
@@ -525,34 +556,26 @@ class MembershipDetailView(generics.RetrieveUpdateAPIView):
 
     def put(self, request, pk):
         try:
-            # Print request info for debugging
-            print("\n" + "="*50)
-            print("📤 MEMBERSHIP UPDATE PUT REQUEST")
-            print("="*50)
-            print(f"🔗 URL: {request.get_full_path()}")
-            print(f"🔐 User: {request.user}")
-            print(f"📋 Method: {request.method}")
-            print(f"🆔 Requested Membership ID: {pk}")
-            print("="*50)
+            log_request(request, "membership_update_put", pk=pk)
 
             # Get user's registration
             try:
                 user_registration = Registration.objects.get(user=request.user)
-                print(f"👤 User Registration ID: {user_registration.id}")
+                logger.debug("User Registration ID: %s", user_registration.id)
 
                 # Get membership and verify it belongs to the user
                 membership = Membership.objects.get(
                     pk=pk, registration=user_registration)
-                print(f"✅ Membership {pk} belongs to user")
+                logger.debug("Membership %s belongs to user", pk)
 
             except Registration.DoesNotExist:
-                print("❌ User has no registration")
+                logger.info("User has no registration")
                 return Response({
                     "success": False,
                     "message": "User registration not found. Please complete your registration first.",
                 }, status=status.HTTP_404_NOT_FOUND)
             except Membership.DoesNotExist:
-                print(f"❌ Membership {pk} not found or doesn't belong to user")
+                logger.info("Membership %s not found or doesn't belong to user", pk)
                 return Response({
                     "success": False,
                     "message": "Membership not found or you don't have permission to update it."
@@ -562,14 +585,14 @@ class MembershipDetailView(generics.RetrieveUpdateAPIView):
                 membership, data=request.data, partial=True)
             if serializer.is_valid():
                 serializer.save()
-                print(f"✅ Membership {pk} updated successfully")
+                logger.debug("Membership %s updated successfully", pk)
                 return Response({
                     "success": True,
                     "message": "Membership updated successfully!",
                     "data": serializer.data
                 }, status=status.HTTP_200_OK)
             else:
-                print(f"❌ Validation errors: {serializer.errors}")
+                logger.info("Validation errors", extra={"errors": serializer.errors})
                 return Response({
                     "success": False,
                     "message": "Please correct the errors below and try again.",
@@ -577,7 +600,7 @@ class MembershipDetailView(generics.RetrieveUpdateAPIView):
                 }, status=status.HTTP_400_BAD_REQUEST)
 
         except Exception as e:
-            print(f"💥 Server error: {str(e)}")
+            logger.exception("Server error")
             return Response({
                 "success": False,
                 "message": "An unexpected error occurred. Please try again later.",
@@ -585,7 +608,7 @@ class MembershipDetailView(generics.RetrieveUpdateAPIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class MembershipDocumentListView(generics.ListCreateAPIView):
+class MembershipDocumentListView(UploadValidationMixin, generics.ListCreateAPIView):
     """
     Get all documents for a specific membership or create a new document
     """
@@ -618,7 +641,7 @@ class MembershipDocumentListView(generics.ListCreateAPIView):
     def post(self, request, membership_id):
         try:
             membership = Membership.objects.get(pk=membership_id)
-            data = request.data.copy()
+            data = copy_request_data(request.data)
             data['membership'] = membership.id
 
             serializer = MembershipDocumentSerializer(data=data)
@@ -648,7 +671,7 @@ class MembershipDocumentListView(generics.ListCreateAPIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class MembershipPaymentListView(generics.ListCreateAPIView):
+class MembershipPaymentListView(UploadValidationMixin, generics.ListCreateAPIView):
     """
     Get all payments for a specific membership or create a new payment
     """
@@ -680,7 +703,7 @@ class MembershipPaymentListView(generics.ListCreateAPIView):
     def post(self, request, membership_id):
         try:
             membership = Membership.objects.get(pk=membership_id)
-            data = request.data.copy()
+            data = copy_request_data(request.data)
             data['membership'] = membership.id
 
             serializer = MembershipPaymentSerializer(data=data)
@@ -714,7 +737,7 @@ class MembershipPaymentListView(generics.ListCreateAPIView):
 # MEMBERSHIP DOCUMENT API - Dedicated endpoints for membership documents
 # ------------------------------------------------------------
 
-class MembershipDocumentAPIView(generics.GenericAPIView):
+class MembershipDocumentAPIView(UploadValidationMixin, generics.GenericAPIView):
     """
     Dedicated API for MembershipDocument with POST, GET, PUT operations
     """
@@ -726,49 +749,22 @@ class MembershipDocumentAPIView(generics.GenericAPIView):
         Create a new membership document - automatically determines membership from token
         """
         try:
-            # Print request data to terminal
-            print("\n" + "="*50)
-            print("📤 MEMBERSHIP DOCUMENT POST REQUEST")
-            print("="*50)
-            print(f"🔗 URL: {request.get_full_path()}")
-            print(f"🔐 User: {request.user}")
-            print(f"📋 Method: {request.method}")
-            print(f"📦 Content-Type: {request.content_type}")
-            print("\n📊 REQUEST DATA:")
-            print("-" * 30)
-
-            # Print form data
-            if hasattr(request, 'data'):
-                for key, value in request.data.items():
-                    if key == 'file' and hasattr(value, 'name'):
-                        print(f"  {key}: {value.name} ({value.size} bytes)")
-                    else:
-                        print(f"  {key}: {value}")
-
-            # Print files
-            if hasattr(request, 'FILES') and request.FILES:
-                print("\n📁 FILES:")
-                print("-" * 30)
-                for key, file in request.FILES.items():
-                    print(
-                        f"  {key}: {file.name} ({file.size} bytes, {file.content_type})")
-
-            print("="*50)
+            log_request(request, "membership_document_post", with_data=True)
 
             # Get user's registration and membership
             try:
                 user_registration = Registration.objects.get(user=request.user)
-                print(f"👤 User Registration ID: {user_registration.id}")
+                logger.debug("User Registration ID: %s", user_registration.id)
 
                 # Get user's membership (assuming one membership per user for now)
                 try:
                     user_membership = Membership.objects.get(
                         registration=user_registration)
-                    print(f"🏢 User Membership ID: {user_membership.id}")
-                    print(f"🏢 Company Name: {user_membership.company_name}")
+                    logger.debug("User Membership ID: %s", user_membership.id)
+                    logger.debug("Company Name: %s", user_membership.company_name)
 
                 except Membership.DoesNotExist:
-                    print("❌ User has no membership")
+                    logger.info("User has no membership")
                     return Response({
                         "success": False,
                         "message": "No membership found. Please create a membership first.",
@@ -777,26 +773,25 @@ class MembershipDocumentAPIView(generics.GenericAPIView):
                     # If user has multiple memberships, get the first one
                     user_membership = Membership.objects.filter(
                         registration=user_registration).first()
-                    print(
-                        f"⚠️ Multiple memberships found, using first one: {user_membership.id}")
+                    logger.info("Multiple memberships found, using first one: %s",
+                                user_membership.id)
 
             except Registration.DoesNotExist:
-                print("❌ User has no registration")
+                logger.info("User has no registration")
                 return Response({
                     "success": False,
                     "message": "User registration not found. Please complete your registration first.",
                 }, status=status.HTTP_404_NOT_FOUND)
 
             # Prepare data with automatically determined membership ID
-            data = request.data.copy()
+            data = copy_request_data(request.data)
             data['membership'] = user_membership.id
-            print(f"🔧 Auto-assigned membership ID: {user_membership.id}")
+            logger.debug("Auto-assigned membership ID: %s", user_membership.id)
 
             serializer = MembershipDocumentSerializer(data=data)
             if serializer.is_valid():
                 document = serializer.save()
-                print(
-                    f"✅ Document created successfully with ID: {document.id}")
+                logger.debug("Document created successfully with ID: %s", document.id)
                 return Response({
                     "success": True,
                     "message": "Membership document created successfully!",
@@ -805,14 +800,14 @@ class MembershipDocumentAPIView(generics.GenericAPIView):
                     "membership_company": user_membership.company_name
                 }, status=status.HTTP_201_CREATED)
             else:
-                print(f"❌ Validation errors: {serializer.errors}")
+                logger.info("Validation errors", extra={"errors": serializer.errors})
                 return Response({
                     "success": False,
                     "message": "Please correct the errors below and try again.",
                     "errors": serializer.errors
                 }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
-            print(f"💥 Server error: {str(e)}")
+            logger.exception("Server error")
             return Response({
                 "success": False,
                 "message": "An unexpected error occurred. Please try again later.",
@@ -824,24 +819,15 @@ class MembershipDocumentAPIView(generics.GenericAPIView):
         Get a specific membership document by ID, or get all user's documents if no ID provided
         """
         try:
-            # Print request info for debugging
-            print("\n" + "="*50)
-            print("📤 MEMBERSHIP DOCUMENT GET REQUEST")
-            print("="*50)
-            print(f"🔗 URL: {request.get_full_path()}")
-            print(f"🔐 User: {request.user}")
-            print(f"📋 Method: {request.method}")
-            if document_id:
-                print(f"🆔 Requested Document ID: {document_id}")
-            print("="*50)
+            log_request(request, "membership_document_get", document_id=document_id)
 
             # Get user's registration
             try:
                 user_registration = Registration.objects.get(user=request.user)
-                print(f"👤 User Registration ID: {user_registration.id}")
+                logger.debug("User Registration ID: %s", user_registration.id)
 
             except Registration.DoesNotExist:
-                print("❌ User has no registration")
+                logger.info("User has no registration")
                 return Response({
                     "success": False,
                     "message": "User registration not found. Please complete your registration first.",
@@ -854,15 +840,14 @@ class MembershipDocumentAPIView(generics.GenericAPIView):
                         pk=document_id,
                         membership__registration=user_registration
                     )
-                    print(f"✅ Document {document_id} belongs to user")
+                    logger.debug("Document %s belongs to user", document_id)
                     serializer = MembershipDocumentSerializer(document)
                     return Response({
                         "success": True,
                         "data": serializer.data
                     }, status=status.HTTP_200_OK)
                 except MembershipDocument.DoesNotExist:
-                    print(
-                        f"❌ Document {document_id} not found or doesn't belong to user")
+                    logger.info("Document %s not found or doesn't belong to user", document_id)
                     return Response({
                         "success": False,
                         "message": "Membership document not found or you don't have permission to access it."
@@ -872,7 +857,6 @@ class MembershipDocumentAPIView(generics.GenericAPIView):
                 documents = MembershipDocument.objects.filter(
                     membership__registration=user_registration
                 )
-                print(f"📊 Found {documents.count()} documents for user")
                 serializer = MembershipDocumentSerializer(documents, many=True)
                 return Response({
                     "success": True,
@@ -882,7 +866,7 @@ class MembershipDocumentAPIView(generics.GenericAPIView):
                 }, status=status.HTTP_200_OK)
 
         except Exception as e:
-            print(f"💥 Server error: {str(e)}")
+            logger.exception("Server error")
             return Response({
                 "success": False,
                 "message": "Failed to retrieve membership document(s).",
@@ -894,43 +878,15 @@ class MembershipDocumentAPIView(generics.GenericAPIView):
         Update a specific membership document
         """
         try:
-            # Print request data to terminal
-            print("\n" + "="*50)
-            print("📤 MEMBERSHIP DOCUMENT PUT REQUEST")
-            print("="*50)
-            print(f"🔗 URL: {request.get_full_path()}")
-            print(f"🔐 User: {request.user}")
-            print(f"📋 Method: {request.method}")
-            print(f"🆔 Requested Document ID: {document_id}")
-            print(f"📦 Content-Type: {request.content_type}")
-            print("\n📊 REQUEST DATA:")
-            print("-" * 30)
-
-            # Print form data
-            if hasattr(request, 'data'):
-                for key, value in request.data.items():
-                    if key == 'file' and hasattr(value, 'name'):
-                        print(f"  {key}: {value.name} ({value.size} bytes)")
-                    else:
-                        print(f"  {key}: {value}")
-
-            # Print files
-            if hasattr(request, 'FILES') and request.FILES:
-                print("\n📁 FILES:")
-                print("-" * 30)
-                for key, file in request.FILES.items():
-                    print(
-                        f"  {key}: {file.name} ({file.size} bytes, {file.content_type})")
-
-            print("="*50)
+            log_request(request, "membership_document_put", with_data=True, document_id=document_id)
 
             # Get user's registration
             try:
                 user_registration = Registration.objects.get(user=request.user)
-                print(f"👤 User Registration ID: {user_registration.id}")
+                logger.debug("User Registration ID: %s", user_registration.id)
 
             except Registration.DoesNotExist:
-                print("❌ User has no registration")
+                logger.info("User has no registration")
                 return Response({
                     "success": False,
                     "message": "User registration not found. Please complete your registration first.",
@@ -942,11 +898,10 @@ class MembershipDocumentAPIView(generics.GenericAPIView):
                     pk=document_id,
                     membership__registration=user_registration
                 )
-                print(f"✅ Document {document_id} belongs to user")
+                logger.debug("Document %s belongs to user", document_id)
 
             except MembershipDocument.DoesNotExist:
-                print(
-                    f"❌ Document {document_id} not found or doesn't belong to user")
+                logger.info("Document %s not found or doesn't belong to user", document_id)
                 return Response({
                     "success": False,
                     "message": "Membership document not found or you don't have permission to update it."
@@ -956,14 +911,14 @@ class MembershipDocumentAPIView(generics.GenericAPIView):
                 document, data=request.data, partial=True)
             if serializer.is_valid():
                 serializer.save()
-                print(f"✅ Document {document_id} updated successfully")
+                logger.debug("Document %s updated successfully", document_id)
                 return Response({
                     "success": True,
                     "message": "Membership document updated successfully!",
                     "data": serializer.data
                 }, status=status.HTTP_200_OK)
             else:
-                print(f"❌ Validation errors: {serializer.errors}")
+                logger.info("Validation errors", extra={"errors": serializer.errors})
                 return Response({
                     "success": False,
                     "message": "Please correct the errors below and try again.",
@@ -971,7 +926,7 @@ class MembershipDocumentAPIView(generics.GenericAPIView):
                 }, status=status.HTTP_400_BAD_REQUEST)
 
         except Exception as e:
-            print(f"💥 Server error: {str(e)}")
+            logger.exception("Server error")
             return Response({
                 "success": False,
                 "message": "An unexpected error occurred. Please try again later.",
@@ -983,7 +938,7 @@ class MembershipDocumentAPIView(generics.GenericAPIView):
 # MEMBERSHIP PAYMENT API - Dedicated endpoints for membership payments
 # ------------------------------------------------------------
 
-class MembershipPaymentAPIView(generics.GenericAPIView):
+class MembershipPaymentAPIView(UploadValidationMixin, generics.GenericAPIView):
     """
     Dedicated API for MembershipPayment with POST, GET, PUT operations
     """
@@ -995,49 +950,22 @@ class MembershipPaymentAPIView(generics.GenericAPIView):
         Create a new membership payment - automatically determines membership from token
         """
         try:
-            # Print request data to terminal
-            print("\n" + "="*50)
-            print("📤 MEMBERSHIP PAYMENT POST REQUEST")
-            print("="*50)
-            print(f"🔗 URL: {request.get_full_path()}")
-            print(f"🔐 User: {request.user}")
-            print(f"📋 Method: {request.method}")
-            print(f"📦 Content-Type: {request.content_type}")
-            print("\n📊 REQUEST DATA:")
-            print("-" * 30)
-
-            # Print form data
-            if hasattr(request, 'data'):
-                for key, value in request.data.items():
-                    if key == 'payment_proof' and hasattr(value, 'name'):
-                        print(f"  {key}: {value.name} ({value.size} bytes)")
-                    else:
-                        print(f"  {key}: {value}")
-
-            # Print files
-            if hasattr(request, 'FILES') and request.FILES:
-                print("\n📁 FILES:")
-                print("-" * 30)
-                for key, file in request.FILES.items():
-                    print(
-                        f"  {key}: {file.name} ({file.size} bytes, {file.content_type})")
-
-            print("="*50)
+            log_request(request, "membership_payment_post", with_data=True)
 
             # Get user's registration and membership
             try:
                 user_registration = Registration.objects.get(user=request.user)
-                print(f"👤 User Registration ID: {user_registration.id}")
+                logger.debug("User Registration ID: %s", user_registration.id)
 
                 # Get user's membership (assuming one membership per user for now)
                 try:
                     user_membership = Membership.objects.get(
                         registration=user_registration)
-                    print(f"🏢 User Membership ID: {user_membership.id}")
-                    print(f"🏢 Company Name: {user_membership.company_name}")
+                    logger.debug("User Membership ID: %s", user_membership.id)
+                    logger.debug("Company Name: %s", user_membership.company_name)
 
                 except Membership.DoesNotExist:
-                    print("❌ User has no membership")
+                    logger.info("User has no membership")
                     return Response({
                         "success": False,
                         "message": "No membership found. Please create a membership first.",
@@ -1046,25 +974,25 @@ class MembershipPaymentAPIView(generics.GenericAPIView):
                     # If user has multiple memberships, get the first one
                     user_membership = Membership.objects.filter(
                         registration=user_registration).first()
-                    print(
-                        f"⚠️ Multiple memberships found, using first one: {user_membership.id}")
+                    logger.info("Multiple memberships found, using first one: %s",
+                                user_membership.id)
 
             except Registration.DoesNotExist:
-                print("❌ User has no registration")
+                logger.info("User has no registration")
                 return Response({
                     "success": False,
                     "message": "User registration not found. Please complete your registration first.",
                 }, status=status.HTTP_404_NOT_FOUND)
 
             # Prepare data with automatically determined membership ID
-            data = request.data.copy()
+            data = copy_request_data(request.data)
             data['membership'] = user_membership.id
-            print(f"🔧 Auto-assigned membership ID: {user_membership.id}")
+            logger.debug("Auto-assigned membership ID: %s", user_membership.id)
 
             serializer = MembershipPaymentSerializer(data=data)
             if serializer.is_valid():
                 payment = serializer.save()
-                print(f"✅ Payment created successfully with ID: {payment.id}")
+                logger.debug("Payment created successfully with ID: %s", payment.id)
                 return Response({
                     "success": True,
                     "message": "Membership payment recorded successfully!",
@@ -1073,14 +1001,14 @@ class MembershipPaymentAPIView(generics.GenericAPIView):
                     "membership_company": user_membership.company_name
                 }, status=status.HTTP_201_CREATED)
             else:
-                print(f"❌ Validation errors: {serializer.errors}")
+                logger.info("Validation errors", extra={"errors": serializer.errors})
                 return Response({
                     "success": False,
                     "message": "Please correct the errors below and try again.",
                     "errors": serializer.errors
                 }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
-            print(f"💥 Server error: {str(e)}")
+            logger.exception("Server error")
             return Response({
                 "success": False,
                 "message": "An unexpected error occurred. Please try again later.",
@@ -1092,24 +1020,15 @@ class MembershipPaymentAPIView(generics.GenericAPIView):
         Get a specific membership payment by ID, or get all user's payments if no ID provided
         """
         try:
-            # Print request info for debugging
-            print("\n" + "="*50)
-            print("📤 MEMBERSHIP PAYMENT GET REQUEST")
-            print("="*50)
-            print(f"🔗 URL: {request.get_full_path()}")
-            print(f"🔐 User: {request.user}")
-            print(f"📋 Method: {request.method}")
-            if payment_id:
-                print(f"🆔 Requested Payment ID: {payment_id}")
-            print("="*50)
+            log_request(request, "membership_payment_get", payment_id=payment_id)
 
             # Get user's registration
             try:
                 user_registration = Registration.objects.get(user=request.user)
-                print(f"👤 User Registration ID: {user_registration.id}")
+                logger.debug("User Registration ID: %s", user_registration.id)
 
             except Registration.DoesNotExist:
-                print("❌ User has no registration")
+                logger.info("User has no registration")
                 return Response({
                     "success": False,
                     "message": "User registration not found. Please complete your registration first.",
@@ -1122,15 +1041,14 @@ class MembershipPaymentAPIView(generics.GenericAPIView):
                         pk=payment_id,
                         membership__registration=user_registration
                     )
-                    print(f"✅ Payment {payment_id} belongs to user")
+                    logger.debug("Payment %s belongs to user", payment_id)
                     serializer = MembershipPaymentSerializer(payment)
                     return Response({
                         "success": True,
                         "data": serializer.data
                     }, status=status.HTTP_200_OK)
                 except MembershipPayment.DoesNotExist:
-                    print(
-                        f"❌ Payment {payment_id} not found or doesn't belong to user")
+                    logger.info("Payment %s not found or doesn't belong to user", payment_id)
                     return Response({
                         "success": False,
                         "message": "Membership payment not found or you don't have permission to access it."
@@ -1140,7 +1058,6 @@ class MembershipPaymentAPIView(generics.GenericAPIView):
                 payments = MembershipPayment.objects.filter(
                     membership__registration=user_registration
                 )
-                print(f"📊 Found {payments.count()} payments for user")
                 serializer = MembershipPaymentSerializer(payments, many=True)
                 return Response({
                     "success": True,
@@ -1150,7 +1067,7 @@ class MembershipPaymentAPIView(generics.GenericAPIView):
                 }, status=status.HTTP_200_OK)
 
         except Exception as e:
-            print(f"💥 Server error: {str(e)}")
+            logger.exception("Server error")
             return Response({
                 "success": False,
                 "message": "Failed to retrieve membership payment(s).",
@@ -1162,43 +1079,15 @@ class MembershipPaymentAPIView(generics.GenericAPIView):
         Update a specific membership payment
         """
         try:
-            # Print request data to terminal
-            print("\n" + "="*50)
-            print("📤 MEMBERSHIP PAYMENT PUT REQUEST")
-            print("="*50)
-            print(f"🔗 URL: {request.get_full_path()}")
-            print(f"🔐 User: {request.user}")
-            print(f"📋 Method: {request.method}")
-            print(f"🆔 Requested Payment ID: {payment_id}")
-            print(f"📦 Content-Type: {request.content_type}")
-            print("\n📊 REQUEST DATA:")
-            print("-" * 30)
-
-            # Print form data
-            if hasattr(request, 'data'):
-                for key, value in request.data.items():
-                    if key == 'payment_proof' and hasattr(value, 'name'):
-                        print(f"  {key}: {value.name} ({value.size} bytes)")
-                    else:
-                        print(f"  {key}: {value}")
-
-            # Print files
-            if hasattr(request, 'FILES') and request.FILES:
-                print("\n📁 FILES:")
-                print("-" * 30)
-                for key, file in request.FILES.items():
-                    print(
-                        f"  {key}: {file.name} ({file.size} bytes, {file.content_type})")
-
-            print("="*50)
+            log_request(request, "membership_payment_put", with_data=True, payment_id=payment_id)
 
             # Get user's registration
             try:
                 user_registration = Registration.objects.get(user=request.user)
-                print(f"👤 User Registration ID: {user_registration.id}")
+                logger.debug("User Registration ID: %s", user_registration.id)
 
             except Registration.DoesNotExist:
-                print("❌ User has no registration")
+                logger.info("User has no registration")
                 return Response({
                     "success": False,
                     "message": "User registration not found. Please complete your registration first.",
@@ -1210,11 +1099,10 @@ class MembershipPaymentAPIView(generics.GenericAPIView):
                     pk=payment_id,
                     membership__registration=user_registration
                 )
-                print(f"✅ Payment {payment_id} belongs to user")
+                logger.debug("Payment %s belongs to user", payment_id)
 
             except MembershipPayment.DoesNotExist:
-                print(
-                    f"❌ Payment {payment_id} not found or doesn't belong to user")
+                logger.info("Payment %s not found or doesn't belong to user", payment_id)
                 return Response({
                     "success": False,
                     "message": "Membership payment not found or you don't have permission to update it."
@@ -1224,14 +1112,14 @@ class MembershipPaymentAPIView(generics.GenericAPIView):
                 payment, data=request.data, partial=True)
             if serializer.is_valid():
                 serializer.save()
-                print(f"✅ Payment {payment_id} updated successfully")
+                logger.debug("Payment %s updated successfully", payment_id)
                 return Response({
                     "success": True,
                     "message": "Membership payment updated successfully!",
                     "data": serializer.data
                 }, status=status.HTTP_200_OK)
             else:
-                print(f"❌ Validation errors: {serializer.errors}")
+                logger.info("Validation errors", extra={"errors": serializer.errors})
                 return Response({
                     "success": False,
                     "message": "Please correct the errors below and try again.",
@@ -1239,7 +1127,7 @@ class MembershipPaymentAPIView(generics.GenericAPIView):
                 }, status=status.HTTP_400_BAD_REQUEST)
 
         except Exception as e:
-            print(f"💥 Server error: {str(e)}")
+            logger.exception("Server error")
             return Response({
                 "success": False,
                 "message": "An unexpected error occurred. Please try again later.",
@@ -1259,23 +1147,15 @@ class MembershipPaymentByMembershipView(generics.GenericAPIView):
         Get all payments for a specific membership (user's own membership only)
         """
         try:
-            # Print request info for debugging
-            print("\n" + "="*50)
-            print("📤 MEMBERSHIP PAYMENTS BY MEMBERSHIP GET REQUEST")
-            print("="*50)
-            print(f"🔗 URL: {request.get_full_path()}")
-            print(f"🔐 User: {request.user}")
-            print(f"📋 Method: {request.method}")
-            print(f"🆔 Requested Membership ID: {membership_id}")
-            print("="*50)
+            log_request(request, "membership_payments_by_membership_get", membership_id=membership_id)
 
             # Get user's registration
             try:
                 user_registration = Registration.objects.get(user=request.user)
-                print(f"👤 User Registration ID: {user_registration.id}")
+                logger.debug("User Registration ID: %s", user_registration.id)
 
             except Registration.DoesNotExist:
-                print("❌ User has no registration")
+                logger.info("User has no registration")
                 return Response({
                     "success": False,
                     "message": "User registration not found. Please complete your registration first.",
@@ -1287,11 +1167,10 @@ class MembershipPaymentByMembershipView(generics.GenericAPIView):
                     pk=membership_id,
                     registration=user_registration
                 )
-                print(f"✅ Membership {membership_id} belongs to user")
+                logger.debug("Membership %s belongs to user", membership_id)
 
             except Membership.DoesNotExist:
-                print(
-                    f"❌ Membership {membership_id} not found or doesn't belong to user")
+                logger.info("Membership %s not found or doesn't belong to user", membership_id)
                 return Response({
                     "success": False,
                     "message": "Membership not found or you don't have permission to access it."
@@ -1299,8 +1178,6 @@ class MembershipPaymentByMembershipView(generics.GenericAPIView):
 
             # Get payments for this membership
             payments = MembershipPayment.objects.filter(membership=membership)
-            print(
-                f"📊 Found {payments.count()} payments for membership {membership_id}")
 
             serializer = MembershipPaymentSerializer(payments, many=True)
             return Response({
@@ -1313,7 +1190,7 @@ class MembershipPaymentByMembershipView(generics.GenericAPIView):
             }, status=status.HTTP_200_OK)
 
         except Exception as e:
-            print(f"💥 Server error: {str(e)}")
+            logger.exception("Server error")
             return Response({
                 "success": False,
                 "message": "Failed to retrieve membership payments.",
@@ -1321,13 +1198,369 @@ class MembershipPaymentByMembershipView(generics.GenericAPIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+# ------------------------------------------------------------
+# BULK VERIFICATION API - Verify / reject many uploads at once
+# ------------------------------------------------------------
+
+class BulkVerificationAPIView(generics.GenericAPIView):
+    """
+    Base view for staff bulk verification of documents or payments
+    """
+    serializer_class = BulkVerificationSerializer
+    permission_classes = [IsAdminUser]
+    model = None
+
+    def post(self, request):
+        try:
+            serializer = BulkVerificationSerializer(
+                data=request.data, context={'request': request, 'model': self.model})
+            if not serializer.is_valid():
+                return Response({
+                    "success": False,
+                    "message": "Please correct the errors below and try again.",
+                    "errors": serializer.errors
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            results = serializer.save()
+            updated_count = sum(1 for result in results if result['success'])
+            return Response({
+                "success": True,
+                "message": f"{updated_count} of {len(results)} items updated successfully!",
+                "data": results,
+                "updated_count": updated_count
+            }, status=status.HTTP_200_OK)
+        except Exception as e:
+            return Response({
+                "success": False,
+                "message": "An unexpected error occurred. Please try again later.",
+                "error": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class MembershipDocumentBulkVerifyView(BulkVerificationAPIView):
+    """
+    Verify or reject many membership documents in one request
+    """
+    model = MembershipDocument
+
+
+class MembershipPaymentBulkVerifyView(BulkVerificationAPIView):
+    """
+    Verify or reject many membership payments in one request
+    """
+    model = MembershipPayment
+
+
+# ------------------------------------------------------------
+# RESUMABLE UPLOAD API - Chunked uploads for documents and payment proofs
+# ------------------------------------------------------------
+
+def get_user_membership(user):
+    """
+    Return the user's membership (the first one if there are several), or
+    None if the user has no registration or membership.
+    """
+    return Membership.objects.filter(registration__user=user).order_by('pk').first()
+
+
+class UploadSessionAPIView(generics.GenericAPIView):
+    """
+    Start a resumable upload. The client then PATCHes chunks to the
+    returned session and finally POSTs to its complete/ endpoint.
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        try:
+            membership = get_user_membership(request.user)
+            if membership is None:
+                return Response({
+                    "success": False,
+                    "message": "No membership found. Please create a membership first.",
+                }, status=status.HTTP_404_NOT_FOUND)
+
+            serializer = UploadSessionSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response({
+                    "success": False,
+                    "message": "Please correct the errors below and try again.",
+                    "errors": serializer.errors
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            # Validate the document / payment details before any bytes are sent
+            metadata_serializer = upload_metadata_serializer(
+                serializer.validated_data['target'],
+                serializer.validated_data.get('metadata'),
+                membership)
+            if not metadata_serializer.is_valid():
+                return Response({
+                    "success": False,
+                    "message": "Please correct the errors below and try again.",
+                    "errors": metadata_serializer.errors
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            session = serializer.save(user=request.user)
+            return Response({
+                "success": True,
+                "message": "Upload started. Please send the file in chunks.",
+                "data": UploadSessionSerializer(session).data
+            }, status=status.HTTP_201_CREATED, headers={"Upload-Offset": str(session.offset)})
+        except Exception as e:
+            return Response({
+                "success": False,
+                "message": "An unexpected error occurred. Please try again later.",
+                "error": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class UploadSessionDetailView(generics.GenericAPIView):
+    """
+    Get the current offset of a resumable upload, append a chunk (PATCH with
+    an Upload-Offset header and the raw bytes as the body) or cancel it.
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_session(self, request, session_id):
+        try:
+            return UploadSession.objects.get(pk=session_id, user=request.user)
+        except UploadSession.DoesNotExist:
+            return None
+
+    def get(self, request, session_id):
+        session = self.get_session(request, session_id)
+        if session is None:
+            return Response({
+                "success": False,
+                "message": "Upload not found or you don't have permission to access it."
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({
+            "success": True,
+            "data": UploadSessionSerializer(session).data
+        }, status=status.HTTP_200_OK, headers={"Upload-Offset": str(session.offset)})
+
+    def patch(self, request, session_id):
+        try:
+            session = self.get_session(request, session_id)
+            if session is None:
+                return Response({
+                    "success": False,
+                    "message": "Upload not found or you don't have permission to access it."
+                }, status=status.HTTP_404_NOT_FOUND)
+
+            if session.status != "uploading":
+                return Response({
+                    "success": False,
+                    "message": "This upload has already been completed."
+                }, status=status.HTTP_409_CONFLICT)
+
+            try:
+                offset = int(request.headers.get('Upload-Offset', ''))
+                length = int(request.headers.get('Content-Length', ''))
+            except ValueError:
+                return Response({
+                    "success": False,
+                    "message": "Upload-Offset and Content-Length headers are required."
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            if offset != session.offset:
+                return Response({
+                    "success": False,
+                    "message": "Upload offset does not match. Please resume from the returned offset.",
+                    "data": {"offset": session.offset}
+                }, status=status.HTTP_409_CONFLICT, headers={"Upload-Offset": str(session.offset)})
+
+            if length > session.total_size - session.offset:
+                return Response({
+                    "success": False,
+                    "message": "This chunk goes past the end of the file."
+                }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+            start = session.offset
+            write_chunk(session, request.stream, length)
+
+            # Reject a mismatched file as soon as its first bytes arrive
+            if start < SNIFF_BYTES <= session.offset:
+                signature_error = check_file_signature(
+                    session.file_name, read_head(session, SNIFF_BYTES))
+                if signature_error:
+                    discard_part_file(session)
+                    session.delete()
+                    return Response({
+                        "success": False,
+                        "message": signature_error
+                    }, status=status.HTTP_400_BAD_REQUEST)
+
+            return Response({
+                "success": True,
+                "data": {
+                    "offset": session.offset,
+                    "total_size": session.total_size,
+                    "complete": session.offset == session.total_size
+                }
+            }, status=status.HTTP_200_OK, headers={"Upload-Offset": str(session.offset)})
+        except Exception as e:
+            logger.exception("Server error")
+            return Response({
+                "success": False,
+                "message": "An unexpected error occurred. Please try again later.",
+                "error": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def delete(self, request, session_id):
+        session = self.get_session(request, session_id)
+        if session is None:
+            return Response({
+                "success": False,
+                "message": "Upload not found or you don't have permission to access it."
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        if session.status == "uploading":
+            discard_part_file(session)
+        session.delete()
+        return Response({
+            "success": True,
+            "message": "Upload cancelled."
+        }, status=status.HTTP_200_OK)
+
+
+class UploadSessionCompleteView(generics.GenericAPIView):
+    """
+    Finish a resumable upload and create the membership document / payment
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, session_id):
+        try:
+            try:
+                session = UploadSession.objects.get(
+                    pk=session_id, user=request.user)
+            except UploadSession.DoesNotExist:
+                return Response({
+                    "success": False,
+                    "message": "Upload not found or you don't have permission to access it."
+                }, status=status.HTTP_404_NOT_FOUND)
+
+            model, field_name = UPLOAD_TARGETS[session.target]
+            result_serializer = {
+                "membership_document": MembershipDocumentSerializer,
+                "membership_payment": MembershipPaymentSerializer,
+            }[session.target]
+
+            if session.status == "completed":
+                instance = model.objects.get(pk=session.object_id)
+                return Response({
+                    "success": True,
+                    "message": "Upload already completed.",
+                    "data": result_serializer(instance).data
+                }, status=status.HTTP_200_OK)
+
+            if session.offset != session.total_size:
+                return Response({
+                    "success": False,
+                    "message": "The upload is not finished yet. Please send the remaining chunks.",
+                    "data": {"offset": session.offset, "total_size": session.total_size}
+                }, status=status.HTTP_409_CONFLICT, headers={"Upload-Offset": str(session.offset)})
+
+            signature_error = check_file_signature(
+                session.file_name, read_head(session, SNIFF_BYTES))
+            if signature_error:
+                discard_part_file(session)
+                session.delete()
+                return Response({
+                    "success": False,
+                    "message": signature_error
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            membership = get_user_membership(request.user)
+            if membership is None:
+                return Response({
+                    "success": False,
+                    "message": "No membership found. Please create a membership first.",
+                }, status=status.HTTP_404_NOT_FOUND)
+
+            metadata_serializer = upload_metadata_serializer(
+                session.target, session.metadata, membership)
+            if not metadata_serializer.is_valid():
+                return Response({
+                    "success": False,
+                    "message": "Please correct the errors below and try again.",
+                    "errors": metadata_serializer.errors
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            with transaction.atomic():
+                # Lock the session so two concurrent completes can't both
+                # create a row, and re-check its status under the lock
+                session = UploadSession.objects.select_for_update().get(pk=session.pk)
+                already_completed = session.status == "completed"
+                if not already_completed:
+                    instance = metadata_serializer.save(
+                        **{field_name: attach_part_file(session)})
+                    session.status = "completed"
+                    session.object_id = instance.id
+                    session.save(update_fields=['status', 'object_id', 'updated_at'])
+                    # Kept until the commit so a failed save can be retried
+                    transaction.on_commit(partial(discard_part_file, session))
+
+            if already_completed:
+                instance = model.objects.get(pk=session.object_id)
+                return Response({
+                    "success": True,
+                    "message": "Upload already completed.",
+                    "data": result_serializer(instance).data
+                }, status=status.HTTP_200_OK)
+
+            return Response({
+                "success": True,
+                "message": "File uploaded successfully!",
+                "data": result_serializer(instance).data,
+                "auto_assigned_membership_id": membership.id,
+                "membership_company": membership.company_name
+            }, status=status.HTTP_201_CREATED)
+        except Exception as e:
+            return Response({
+                "success": False,
+                "message": "An unexpected error occurred. Please try again later.",
+                "error": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 # ------------------------------------------------------------
 # QUOTATION API - Dedicated endpoints for quotations
 # ------------------------------------------------------------
 
-class QuotationAPIView(generics.GenericAPIView):
+def requested_currency(request):
     """
-    Dedicated API for Quotation with POST, GET operations
+    Currency for totals: ``?currency=`` or FX_REPORTING_CURRENCY.
+    None if the requested currency isn't supported.
+    """
+    currency = request.query_params.get(
+        'currency', settings.FX_REPORTING_CURRENCY).upper()
+    return currency if currency in currency_codes() else None
+
+
+def stale_quotation_response(quotation_id):
+    current = Quotation.objects.filter(pk=quotation_id).values('version', 'status').first()
+    return Response({
+        "success": False,
+        "message": "This quotation was changed by someone else. Please reload it and try again.",
+        "data": current
+    }, status=status.HTTP_409_CONFLICT)
+
+
+def invalid_currency_response():
+    return Response({
+        "success": False,
+        "message": f"Please select a valid currency. Available options: {', '.join(currency_codes())}",
+    }, status=status.HTTP_400_BAD_REQUEST)
+
+
+class QuotationAPIView(UploadValidationMixin, generics.GenericAPIView):
+    """
+    Dedicated API for Quotation with POST, GET, PUT operations
     """
     serializer_class = QuotationSerializer
     permission_classes = [IsAuthenticated]
@@ -1337,53 +1570,22 @@ class QuotationAPIView(generics.GenericAPIView):
         Create a new quotation - automatically determines membership from token
         """
         try:
-            # Print request data to terminal
-            print("\n" + "="*50)
-            print("📤 QUOTATION POST REQUEST")
-            print("="*50)
-            print(f"🔗 URL: {request.get_full_path()}")
-            print(f"🔐 User: {request.user}")
-            print(f"📋 Method: {request.method}")
-            print(f"📦 Content-Type: {request.content_type}")
-            print("\n📊 REQUEST DATA:")
-            print("-" * 30)
-
-            # Print form data
-            if hasattr(request, 'data'):
-                for key, value in request.data.items():
-                    if key == 'guideline_files' and isinstance(value, list):
-                        print(f"  {key}: {len(value)} files")
-                        for i, file_data in enumerate(value):
-                            if isinstance(file_data, dict):
-                                print(
-                                    f"    File {i+1}: {file_data.get('file_name', 'No name')} - {type(file_data.get('file', 'No file'))}")
-                            else:
-                                print(f"    File {i+1}: {type(value)}")
-                    elif key == 'items' and isinstance(value, list):
-                        print(f"  {key}: {len(value)} items")
-                        for i, item in enumerate(value):
-                            if isinstance(item, dict):
-                                print(
-                                    f"    Item {i+1}: Product {item.get('product', 'N/A')} - ₹{item.get('quoted_price', 'N/A')}")
-                    else:
-                        print(f"  {key}: {value}")
-
-            print("="*50)
+            log_request(request, "quotation_post", with_data=True)
 
             # Get user's registration and membership
             try:
                 user_registration = Registration.objects.get(user=request.user)
-                print(f"👤 User Registration ID: {user_registration.id}")
+                logger.debug("User Registration ID: %s", user_registration.id)
 
                 # Get user's membership (assuming one membership per user for now)
                 try:
                     user_membership = Membership.objects.get(
                         registration=user_registration)
-                    print(f"🏢 User Membership ID: {user_membership.id}")
-                    print(f"🏢 Company Name: {user_membership.company_name}")
+                    logger.debug("User Membership ID: %s", user_membership.id)
+                    logger.debug("Company Name: %s", user_membership.company_name)
 
                 except Membership.DoesNotExist:
-                    print("❌ User has no membership")
+                    logger.info("User has no membership")
                     return Response({
                         "success": False,
                         "message": "No membership found. Please create a membership first.",
@@ -1392,55 +1594,55 @@ class QuotationAPIView(generics.GenericAPIView):
                     # If user has multiple memberships, get the first one
                     user_membership = Membership.objects.filter(
                         registration=user_registration).first()
-                    print(
-                        f"⚠️ Multiple memberships found, using first one: {user_membership.id}")
+                    logger.info("Multiple memberships found, using first one: %s",
+                                user_membership.id)
 
             except Registration.DoesNotExist:
-                print("❌ User has no registration")
+                logger.info("User has no registration")
                 return Response({
                     "success": False,
                     "message": "User registration not found. Please complete your registration first.",
                 }, status=status.HTTP_404_NOT_FOUND)
 
             # Prepare data with automatically determined membership ID
-            data = request.data.copy()
+            data = copy_request_data(request.data)
             data['membership'] = user_membership.id
-            print(f"🔧 Auto-assigned membership ID: {user_membership.id}")
+            logger.debug("Auto-assigned membership ID: %s", user_membership.id)
 
             serializer = QuotationSerializer(data=data)
             if serializer.is_valid():
                 try:
                     quotation = serializer.save()
-                    print(
-                        f"✅ Quotation created successfully with ID: {quotation.id}")
-                    print(f"📦 Items created: {quotation.items.count()}")
-                    print(
-                        f"📁 Files uploaded: {quotation.guideline_files.count()}")
+                    # Built from the created objects, no re-fetching
+                    quotation_data = serializer.data
+                    logger.debug("Quotation created successfully with ID: %s", quotation.id)
+                    logger.debug("Items created: %s", len(quotation_data['items']))
+                    logger.debug("Files uploaded: %s", len(quotation_data['guideline_files']))
                     return Response({
                         "success": True,
                         "message": "Quotation created successfully with all items and files!",
-                        "data": QuotationSerializer(quotation).data,
+                        "data": quotation_data,
                         "auto_assigned_membership_id": user_membership.id,
                         "membership_company": user_membership.company_name,
-                        "items_count": quotation.items.count(),
-                        "files_count": quotation.guideline_files.count()
+                        "items_count": len(quotation_data['items']),
+                        "files_count": len(quotation_data['guideline_files'])
                     }, status=status.HTTP_201_CREATED)
                 except Exception as e:
-                    print(f"💥 Transaction failed: {str(e)}")
+                    logger.exception("Transaction failed")
                     return Response({
                         "success": False,
                         "message": "Failed to create quotation. All changes have been rolled back.",
                         "error": str(e)
                     }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
             else:
-                print(f"❌ Validation errors: {serializer.errors}")
+                logger.info("Validation errors", extra={"errors": serializer.errors})
                 return Response({
                     "success": False,
                     "message": "Please correct the errors below and try again.",
                     "errors": serializer.errors
                 }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
-            print(f"💥 Server error: {str(e)}")
+            logger.exception("Server error")
             return Response({
                 "success": False,
                 "message": "An unexpected error occurred. Please try again later.",
@@ -1452,65 +1654,61 @@ class QuotationAPIView(generics.GenericAPIView):
         Get a specific quotation by ID, or get all user's quotations if no ID provided
         """
         try:
-            # Print request info for debugging
-            print("\n" + "="*50)
-            print("📤 QUOTATION GET REQUEST")
-            print("="*50)
-            print(f"🔗 URL: {request.get_full_path()}")
-            print(f"🔐 User: {request.user}")
-            print(f"📋 Method: {request.method}")
-            if quotation_id:
-                print(f"🆔 Requested Quotation ID: {quotation_id}")
-            print("="*50)
+            log_request(request, "quotation_get", quotation_id=quotation_id)
 
             # Get user's registration
             try:
                 user_registration = Registration.objects.get(user=request.user)
-                print(f"👤 User Registration ID: {user_registration.id}")
+                logger.debug("User Registration ID: %s", user_registration.id)
 
             except Registration.DoesNotExist:
-                print("❌ User has no registration")
+                logger.info("User has no registration")
                 return Response({
                     "success": False,
                     "message": "User registration not found. Please complete your registration first.",
                 }, status=status.HTTP_404_NOT_FOUND)
 
+            currency = requested_currency(request)
+            if currency is None:
+                return invalid_currency_response()
+            quotations = with_quotation_totals(
+                QuotationSerializer.eager_load(Quotation.objects.all()), currency)
+
             if quotation_id:
                 # Get specific quotation and verify it belongs to user
                 try:
-                    quotation = Quotation.objects.get(
+                    quotation = quotations.get(
                         pk=quotation_id,
                         membership__registration=user_registration
                     )
-                    print(f"✅ Quotation {quotation_id} belongs to user")
+                    logger.debug("Quotation %s belongs to user", quotation_id)
                     serializer = QuotationSerializer(quotation)
                     return Response({
                         "success": True,
                         "data": serializer.data
                     }, status=status.HTTP_200_OK)
                 except Quotation.DoesNotExist:
-                    print(
-                        f"❌ Quotation {quotation_id} not found or doesn't belong to user")
+                    logger.info("Quotation %s not found or doesn't belong to user", quotation_id)
                     return Response({
                         "success": False,
                         "message": "Quotation not found or you don't have permission to access it."
                     }, status=status.HTTP_404_NOT_FOUND)
             else:
                 # Get all user's quotations
-                quotations = Quotation.objects.filter(
+                quotations = list(quotations.filter(
                     membership__registration=user_registration
-                )
-                print(f"📊 Found {quotations.count()} quotations for user")
+                ))
+                logger.debug("Found %s quotations for user", len(quotations))
                 serializer = QuotationSerializer(quotations, many=True)
                 return Response({
                     "success": True,
                     "data": serializer.data,
-                    "count": quotations.count(),
+                    "count": len(quotations),
                     "user_registration_id": user_registration.id
                 }, status=status.HTTP_200_OK)
 
         except Exception as e:
-            print(f"💥 Server error: {str(e)}")
+            logger.exception("Server error")
             return Response({
                 "success": False,
                 "message": "Failed to retrieve quotation(s).",
@@ -1518,6 +1716,262 @@ class QuotationAPIView(generics.GenericAPIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+    def put(self, request, quotation_id):
+        """
+        Update a quotation. Items and guideline files are matched to the
+        existing ones (by id, items also by product) and only the
+        differences are written; leave a list out to keep it unchanged.
+        Send the ``version`` you loaded: if the quotation changed since,
+        nothing is saved and 409 is returned.
+        """
+        try:
+            log_request(request, "quotation_put", quotation_id=quotation_id)
+
+            # Get user's registration
+            try:
+                user_registration = Registration.objects.get(user=request.user)
+                logger.debug("User Registration ID: %s", user_registration.id)
+
+            except Registration.DoesNotExist:
+                logger.info("User has no registration")
+                return Response({
+                    "success": False,
+                    "message": "User registration not found. Please complete your registration first.",
+                }, status=status.HTTP_404_NOT_FOUND)
+
+            # Get quotation and verify it belongs to user
+            try:
+                quotation = Quotation.objects.get(
+                    pk=quotation_id,
+                    membership__registration=user_registration
+                )
+                logger.debug("Quotation %s belongs to user", quotation_id)
+
+            except Quotation.DoesNotExist:
+                logger.info("Quotation %s not found or doesn't belong to user", quotation_id)
+                return Response({
+                    "success": False,
+                    "message": "Quotation not found or you don't have permission to update it."
+                }, status=status.HTTP_404_NOT_FOUND)
+
+            # The quotation stays with its membership
+            data = copy_request_data(request.data)
+            data['membership'] = quotation.membership_id
+
+            serializer = QuotationSerializer(quotation, data=data, partial=True)
+            if serializer.is_valid():
+                try:
+                    serializer.save()
+                    logger.debug("Quotation %s updated successfully", quotation_id)
+                    quotation = QuotationSerializer.eager_load(
+                        Quotation.objects).get(pk=quotation_id)
+                    return Response({
+                        "success": True,
+                        "message": "Quotation updated successfully!",
+                        "data": QuotationSerializer(quotation).data
+                    }, status=status.HTTP_200_OK)
+                except StaleVersionError:
+                    logger.info("Quotation %s was changed by someone else", quotation_id)
+                    return stale_quotation_response(quotation_id)
+                except Exception as e:
+                    logger.exception("Transaction failed")
+                    return Response({
+                        "success": False,
+                        "message": "Failed to update quotation. All changes have been rolled back.",
+                        "error": str(e)
+                    }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            else:
+                logger.info("Validation errors", extra={"errors": serializer.errors})
+                return Response({
+                    "success": False,
+                    "message": "Please correct the errors below and try again.",
+                    "errors": serializer.errors
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+        except Exception as e:
+            logger.exception("Server error")
+            return Response({
+                "success": False,
+                "message": "An unexpected error occurred. Please try again later.",
+                "error": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class QuotationFanOutView(UploadValidationMixin, generics.GenericAPIView):
+    """
+    Create the same quotation for several countries in one request: send
+    the usual quotation fields with ``countries`` instead of ``country``.
+    Items are copied to every quotation; each guideline file is uploaded
+    and stored once and shared by all of them.
+    """
+    serializer_class = QuotationFanOutSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        try:
+            log_request(request, "quotation_fan_out", with_data=True)
+
+            membership = Membership.objects.filter(
+                registration__user=request.user).order_by('id').first()
+            if membership is None:
+                logger.info("User has no membership")
+                return Response({
+                    "success": False,
+                    "message": "No membership found. Please create a membership first.",
+                }, status=status.HTTP_404_NOT_FOUND)
+
+            data = copy_request_data(request.data)
+            data['membership'] = membership.id
+
+            serializer = QuotationFanOutSerializer(data=data)
+            if not serializer.is_valid():
+                logger.info("Validation errors", extra={"errors": serializer.errors})
+                return Response({
+                    "success": False,
+                    "message": "Please correct the errors below and try again.",
+                    "errors": serializer.errors
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            quotations = serializer.save()
+            items_count = len(serializer.validated_data.get('items', []))
+            files_count = len(serializer.validated_data.get('guideline_files', []))
+            logger.debug("Created %s quotations: %s", len(quotations), [q.id for q in quotations])
+            return Response({
+                "success": True,
+                "message": f"{len(quotations)} quotations created successfully with all items and files!",
+                "data": [
+                    {"id": quotation.id, "country": quotation.country}
+                    for quotation in quotations
+                ],
+                "quotation_ids": [quotation.id for quotation in quotations],
+                "auto_assigned_membership_id": membership.id,
+                "membership_company": membership.company_name,
+                "items_count": items_count,
+                "files_count": files_count
+            }, status=status.HTTP_201_CREATED)
+
+        except Exception as e:
+            logger.exception("Transaction failed")
+            return Response({
+                "success": False,
+                "message": "Failed to create the quotations. All changes have been rolled back.",
+                "error": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class QuotationStatusView(generics.GenericAPIView):
+    """
+    Move a quotation to another status (staff only). Only the transitions
+    in ``Quotation.STATUS_TRANSITIONS`` are allowed, and the change is one
+    conditional UPDATE on the version the client saw (409 if it is stale).
+    """
+    serializer_class = QuotationStatusSerializer
+    permission_classes = [IsAdminUser]
+
+    def post(self, request, quotation_id):
+        try:
+            log_request(request, "quotation_status_post", with_data=True,
+                        quotation_id=quotation_id)
+            serializer = QuotationStatusSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response({
+                    "success": False,
+                    "message": "Please correct the errors below and try again.",
+                    "errors": serializer.errors
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            try:
+                quotation = Quotation.objects.only(
+                    'id', 'status', 'version', 'updated_at').get(pk=quotation_id)
+            except Quotation.DoesNotExist:
+                return Response({
+                    "success": False,
+                    "message": "Quotation not found."
+                }, status=status.HTTP_404_NOT_FOUND)
+
+            try:
+                quotation.transition_to(
+                    serializer.validated_data['status'],
+                    expected_version=serializer.validated_data['version'])
+            except StaleVersionError:
+                return stale_quotation_response(quotation_id)
+            except InvalidStatusTransition as e:
+                return Response({
+                    "success": False,
+                    "message": str(e),
+                    "errors": {"status": [str(e)]},
+                    "data": {"allowed_transitions": quotation.allowed_transitions}
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            return Response({
+                "success": True,
+                "message": f"Quotation is now {quotation.get_status_display()}.",
+                "data": {
+                    "id": quotation.id,
+                    "status": quotation.status,
+                    "version": quotation.version,
+                    "allowed_transitions": quotation.allowed_transitions,
+                    "updated_at": quotation.updated_at
+                }
+            }, status=status.HTTP_200_OK)
+
+        except Exception as e:
+            logger.exception("Server error")
+            return Response({
+                "success": False,
+                "message": "Failed to change the quotation status.",
+                "error": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class QuotationPDFView(generics.GenericAPIView):
+    """
+    Download a quotation as PDF. The first request for a version queues
+    the rendering and answers 202; once it is ready the cached file is
+    served. Staff can download any quotation; members only their own.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, quotation_id):
+        try:
+            quotations = QuotationSerializer.eager_load(Quotation.objects.all())
+            if not request.user.is_staff:
+                quotations = quotations.filter(
+                    membership__registration__user=request.user)
+            try:
+                quotation = quotations.get(pk=quotation_id)
+            except Quotation.DoesNotExist:
+                return Response({
+                    "success": False,
+                    "message": "Quotation not found or you don't have permission to access it."
+                }, status=status.HTTP_404_NOT_FOUND)
+
+            name = cached_pdf(quotation)
+            if name is not None:
+                try:
+                    return stored_file_response(
+                        name, download_name=f"quotation_{quotation.id}.pdf")
+                except Http404:
+                    pass  # Removed since the check; render it again
+
+            queue_pdf(quotation)
+            response = Response({
+                "success": True,
+                "message": "The PDF is being prepared. Please try again in a few seconds.",
+                "data": {"status": "rendering"}
+            }, status=status.HTTP_202_ACCEPTED)
+            response['Retry-After'] = '2'
+            return response
+
+        except Exception as e:
+            logger.exception("Server error")
+            return Response({
+                "success": False,
+                "message": "Failed to prepare the quotation PDF.",
+                "error": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class QuotationByMembershipView(generics.GenericAPIView):
     """
     Get all quotations for a specific membership
@@ -1530,23 +1984,15 @@ class QuotationByMembershipView(generics.GenericAPIView):
         Get all quotations for a specific membership (user's own membership only)
         """
         try:
-            # Print request info for debugging
-            print("\n" + "="*50)
-            print("📤 QUOTATIONS BY MEMBERSHIP GET REQUEST")
-            print("="*50)
-            print(f"🔗 URL: {request.get_full_path()}")
-            print(f"🔐 User: {request.user}")
-            print(f"📋 Method: {request.method}")
-            print(f"🆔 Requested Membership ID: {membership_id}")
-            print("="*50)
+            log_request(request, "quotations_by_membership_get", membership_id=membership_id)
 
             # Get user's registration
             try:
                 user_registration = Registration.objects.get(user=request.user)
-                print(f"👤 User Registration ID: {user_registration.id}")
+                logger.debug("User Registration ID: %s", user_registration.id)
 
             except Registration.DoesNotExist:
-                print("❌ User has no registration")
+                logger.info("User has no registration")
                 return Response({
                     "success": False,
                     "message": "User registration not found. Please complete your registration first.",
@@ -1558,33 +2004,37 @@ class QuotationByMembershipView(generics.GenericAPIView):
                     pk=membership_id,
                     registration=user_registration
                 )
-                print(f"✅ Membership {membership_id} belongs to user")
+                logger.debug("Membership %s belongs to user", membership_id)
 
             except Membership.DoesNotExist:
-                print(
-                    f"❌ Membership {membership_id} not found or doesn't belong to user")
+                logger.info("Membership %s not found or doesn't belong to user", membership_id)
                 return Response({
                     "success": False,
                     "message": "Membership not found or you don't have permission to access it."
                 }, status=status.HTTP_404_NOT_FOUND)
 
             # Get quotations for this membership
-            quotations = Quotation.objects.filter(membership=membership)
-            print(
-                f"📊 Found {quotations.count()} quotations for membership {membership_id}")
+            currency = requested_currency(request)
+            if currency is None:
+                return invalid_currency_response()
+            quotations = list(with_quotation_totals(
+                QuotationSerializer.eager_load(
+                    Quotation.objects.filter(membership=membership)),
+                currency))
+            logger.debug("Found %s quotations for membership %s", len(quotations), membership_id)
 
             serializer = QuotationSerializer(quotations, many=True)
             return Response({
                 "success": True,
                 "data": serializer.data,
-                "count": quotations.count(),
+                "count": len(quotations),
                 "membership_id": membership_id,
                 "membership_company": membership.company_name,
                 "user_registration_id": user_registration.id
             }, status=status.HTTP_200_OK)
 
         except Exception as e:
-            print(f"💥 Server error: {str(e)}")
+            logger.exception("Server error")
             return Response({
                 "success": False,
                 "message": "Failed to retrieve quotations.",
@@ -1592,6 +2042,78 @@ class QuotationByMembershipView(generics.GenericAPIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class QuotationGuidelineSearchView(generics.GenericAPIView):
+    """
+    Full-text search over quotation guideline files. Returns the matching
+    quotations with the files and page numbers where the terms appear.
+    Staff search every quotation; members search their own.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if len(query) < 2:
+            return Response({
+                "success": False,
+                "message": "Please enter at least 2 characters to search."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            files = QuotationGuidelineFile.objects.all()
+            if not request.user.is_staff:
+                files = files.filter(
+                    quotation__membership__registration__user=request.user)
+
+            hits = search_pages(query, files=None if request.user.is_staff else files)
+            files = files.filter(
+                file__in={name for name, _, _ in hits}
+            ).select_related('quotation')
+
+            files_by_name = {}
+            for guideline in files:
+                files_by_name.setdefault(guideline.file.name, []).append(guideline)
+
+            # Keep the ranking order of the first hit in each quotation
+            results = {}
+            for name, page, snippet in hits:
+                for guideline in files_by_name.get(name, []):
+                    quotation = guideline.quotation
+                    entry = results.setdefault(quotation.id, {
+                        "quotation_id": quotation.id,
+                        "title": quotation.title,
+                        "country": quotation.country,
+                        "status": quotation.status,
+                        "files": {},
+                    })
+                    file_entry = entry["files"].setdefault(guideline.id, {
+                        "guideline_file_id": guideline.id,
+                        "file_name": guideline.file_name,
+                        "pages": [],
+                    })
+                    file_entry["pages"].append(
+                        {"page": page, "snippet": snippet})
+
+            data = []
+            for entry in results.values():
+                entry["files"] = list(entry["files"].values())
+                data.append(entry)
+
+            return Response({
+                "success": True,
+                "data": data,
+                "count": len(data),
+                "query": query
+            }, status=status.HTTP_200_OK)
+
+        except Exception as e:
+            logger.exception("Server error")
+            return Response({
+                "success": False,
+                "message": "Failed to search guidelines.",
+                "error": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class MembershipDocumentByMembershipView(generics.GenericAPIView):
     """
     Get all membership documents for a specific membership
@@ -1604,23 +2126,15 @@ class MembershipDocumentByMembershipView(generics.GenericAPIView):
         Get all documents for a specific membership (user's own membership only)
         """
         try:
-            # Print request info for debugging
-            print("\n" + "="*50)
-            print("📤 MEMBERSHIP DOCUMENTS BY MEMBERSHIP GET REQUEST")
-            print("="*50)
-            print(f"🔗 URL: {request.get_full_path()}")
-            print(f"🔐 User: {request.user}")
-            print(f"📋 Method: {request.method}")
-            print(f"🆔 Requested Membership ID: {membership_id}")
-            print("="*50)
+            log_request(request, "membership_documents_by_membership_get", membership_id=membership_id)
 
             # Get user's registration
             try:
                 user_registration = Registration.objects.get(user=request.user)
-                print(f"👤 User Registration ID: {user_registration.id}")
+                logger.debug("User Registration ID: %s", user_registration.id)
 
             except Registration.DoesNotExist:
-                print("❌ User has no registration")
+                logger.info("User has no registration")
                 return Response({
                     "success": False,
                     "message": "User registration not found. Please complete your registration first.",
@@ -1632,11 +2146,10 @@ class MembershipDocumentByMembershipView(generics.GenericAPIView):
                     pk=membership_id,
                     registration=user_registration
                 )
-                print(f"✅ Membership {membership_id} belongs to user")
+                logger.debug("Membership %s belongs to user", membership_id)
 
             except Membership.DoesNotExist:
-                print(
-                    f"❌ Membership {membership_id} not found or doesn't belong to user")
+                logger.info("Membership %s not found or doesn't belong to user", membership_id)
                 return Response({
                     "success": False,
                     "message": "Membership not found or you don't have permission to access it."
@@ -1645,8 +2158,6 @@ class MembershipDocumentByMembershipView(generics.GenericAPIView):
             # Get documents for this membership
             documents = MembershipDocument.objects.filter(
                 membership=membership)
-            print(
-                f"📊 Found {documents.count()} documents for membership {membership_id}")
 
             serializer = MembershipDocumentSerializer(documents, many=True)
             return Response({
@@ -1659,9 +2170,250 @@ class MembershipDocumentByMembershipView(generics.GenericAPIView):
             }, status=status.HTTP_200_OK)
 
         except Exception as e:
-            print(f"💥 Server error: {str(e)}")
+            logger.exception("Server error")
             return Response({
                 "success": False,
                 "message": "Failed to retrieve membership documents.",
                 "error": str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class MembershipDossierView(generics.GenericAPIView):
+    """
+    Download every document and payment proof of a membership as one
+    streamed ZIP with a manifest. Staff can download any membership;
+    members only their own.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, membership_id):
+        try:
+            memberships = Membership.objects.all()
+            if not request.user.is_staff:
+                memberships = memberships.filter(
+                    registration__user=request.user)
+            try:
+                membership = memberships.get(pk=membership_id)
+            except Membership.DoesNotExist:
+                return Response({
+                    "success": False,
+                    "message": "Membership not found or you don't have permission to access it."
+                }, status=status.HTTP_404_NOT_FOUND)
+
+            entries = dossier_entries(membership)
+            response = StreamingHttpResponse(
+                stream_dossier(membership, entries),
+                content_type='application/zip')
+            response['Content-Disposition'] = (
+                f'attachment; filename="membership_{membership.id}_dossier.zip"')
+            return response
+
+        except Exception as e:
+            logger.exception("Server error")
+            return Response({
+                "success": False,
+                "message": "Failed to prepare the membership dossier.",
+                "error": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# ------------------------------------------------------------
+# ANALYTICS API - Precomputed quoted price statistics
+# ------------------------------------------------------------
+
+class QuotedPriceAnalyticsView(generics.GenericAPIView):
+    """
+    Quoted price statistics per product, country, currency and month, read
+    from the rollups kept by ``manage.py refresh_price_rollups`` (staff only).
+
+    Filters: ``product`` (id), ``country``, ``currency``, ``from`` and
+    ``to`` (YYYY-MM, inclusive).
+    """
+    permission_classes = [IsAdminUser]
+    MAX_ROWS = 5000
+
+    def get(self, request):
+        try:
+            rollups = QuotedPriceRollup.objects.all()
+            params = request.query_params
+            try:
+                if params.get('product'):
+                    rollups = rollups.filter(product_id=int(params['product']))
+                if params.get('from'):
+                    rollups = rollups.filter(
+                        month__gte=date.fromisoformat(f"{params['from']}-01"))
+                if params.get('to'):
+                    rollups = rollups.filter(
+                        month__lte=date.fromisoformat(f"{params['to']}-01"))
+            except ValueError:
+                return Response({
+                    "success": False,
+                    "message": "Please use a numeric product id and months as YYYY-MM."
+                }, status=status.HTTP_400_BAD_REQUEST)
+            if params.get('country'):
+                rollups = rollups.filter(country=params['country'])
+            if params.get('currency'):
+                rollups = rollups.filter(currency=params['currency'].upper())
+
+            rows = list(
+                rollups.order_by('product_id', 'country', 'currency', 'month')
+                .values('product_id', 'product__product_name', 'country', 'currency',
+                        'month', 'count', 'min_price', 'max_price', 'mean_price',
+                        'p25_price', 'median_price', 'p75_price', 'p90_price',
+                        'updated_at')[:self.MAX_ROWS + 1]
+            )
+            truncated = len(rows) > self.MAX_ROWS
+            rows = rows[:self.MAX_ROWS]
+            for row in rows:
+                row['product_name'] = row.pop('product__product_name')
+                row['month'] = row['month'].strftime('%Y-%m')
+
+            return Response({
+                "success": True,
+                "data": rows,
+                "count": len(rows),
+                "truncated": truncated
+            }, status=status.HTTP_200_OK)
+
+        except Exception as e:
+            logger.exception("Server error")
+            return Response({
+                "success": False,
+                "message": "Failed to load quoted price analytics.",
+                "error": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class QuotedPriceSuggestionView(generics.GenericAPIView):
+    """
+    Suggested ``quoted_price`` for a new quotation item (staff only): the
+    median of past quotes for the product in the currency, with the p25-p75
+    band, from the in-process price index so it can be called as staff type.
+
+    Query params: ``product`` (id, required), ``currency`` (defaults to
+    FX_REPORTING_CURRENCY) and ``country`` (falls back to every country when
+    it has no past quotes).
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        try:
+            try:
+                product_id = int(request.query_params.get('product', ''))
+            except ValueError:
+                return Response({
+                    "success": False,
+                    "message": "Please provide a numeric product id."
+                }, status=status.HTTP_400_BAD_REQUEST)
+            currency = requested_currency(request)
+            if currency is None:
+                return invalid_currency_response()
+            country = request.query_params.get('country') or None
+
+            suggestion = suggest_price(product_id, currency, country)
+            return Response({
+                "success": True,
+                "data": {
+                    "product_id": product_id,
+                    "country": country,
+                    "currency": currency,
+                    **suggestion
+                }
+            }, status=status.HTTP_200_OK)
+
+        except Exception as e:
+            logger.exception("Server error")
+            return Response({
+                "success": False,
+                "message": "Failed to suggest a price.",
+                "error": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# ------------------------------------------------------------
+# REQUEST PROFILES - reports of requests profiled with "X-Profile: 1"
+# ------------------------------------------------------------
+
+class RequestProfileView(generics.GenericAPIView):
+    """
+    Download a stored request profile (staff only): the JSON report, or
+    the raw cProfile stats with ``?output=pstats``.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, profile_id):
+        output = request.query_params.get('output', 'json')
+        if not PROFILE_ID.match(profile_id) or output not in ('json', 'pstats'):
+            raise Http404
+        name = profile_name(profile_id, output)
+        return stored_file_response(name, download_name=f"profile-{os.path.basename(name)}")
+
+
+# ------------------------------------------------------------
+# METRICS - Prometheus scrape endpoint
+# ------------------------------------------------------------
+
+@require_safe
+def metrics(request):
+    """
+    Request, database, upload and cache metrics of all worker processes in
+    the Prometheus text format, for METRICS_TOKEN (or METRICS_ALLOWED_IPS,
+    see settings).
+    """
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    allowed = (request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+               or (token and hmac.compare_digest(
+                   authorization.encode(), f"Bearer {token}".encode())))
+    if not allowed:
+        return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+    return HttpResponse(exposition(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# ------------------------------------------------------------
+# SIGNED FILE DOWNLOADS - verified from the URL alone, no database access
+# ------------------------------------------------------------
+
+@require_safe
+def serve_signed_file(request, name):
+    """
+    Serve an uploaded file for a URL produced by ``signing.signed_file_url``.
+    """
+    expires = request.GET.get('expires')
+    if not verify_signed_file(name, expires, request.GET.get('kid'), request.GET.get('sig')):
+        return JsonResponse({
+            "success": False,
+            "message": "This download link is invalid or has expired."
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    response = stored_file_response(name)
+    max_age = max(0, int(expires) - int(time.time()))
+    response['Cache-Control'] = f"private, max-age={max_age}"
+    return response
+
+
+def stored_file_response(name, download_name=None):
+    """
+    Response sending the stored file ``name``, through the web server when
+    FILE_SERVE_ACCEL_REDIRECT is set. Raises Http404 if it doesn't exist.
+    """
+    try:
+        path = default_storage.path(name)
+    except SuspiciousFileOperation:
+        raise Http404
+
+    if settings.FILE_SERVE_ACCEL_REDIRECT:
+        # The web server streams the file; let it set the content type
+        response = HttpResponse()
+        del response['Content-Type']
+        response['X-Accel-Redirect'] = settings.FILE_SERVE_ACCEL_REDIRECT + quote(name)
+        if download_name:
+            response['Content-Disposition'] = f'attachment; filename="{download_name}"'
+    else:
+        try:
+            response = FileResponse(
+                open(path, 'rb'), as_attachment=bool(download_name),
+                filename=download_name)
+        except (FileNotFoundError, IsADirectoryError):
+            raise Http404
+    return response